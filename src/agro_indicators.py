@@ -0,0 +1,323 @@
+import numpy as np
+import pandas as pd
+
+from weather_aggregation import aggregate_hourly_to_daily, HOURS_PER_DAY
+
+
+# Température de base (°C) pour le calcul des degrés-jours de croissance
+BASE_TEMPERATURES = {'Ble': 0.0, 'Mais': 10.0, 'Tournesol': 6.0}
+
+# Coefficients culturaux (Kc) appliqués à l'évapotranspiration de référence
+CROP_COEFFICIENTS = {'Ble': 1.0, 'Mais': 1.1, 'Tournesol': 0.9, 'sol_nu': 0.3}
+
+# Réserve utile maximale (mm) d'un sol dont capacite_retention_eau vaut 1
+RESERVE_UTILE_MAX_MM = 200.0
+
+# Altitude moyenne des parcelles (m), utilisée pour la pression atmosphérique (FAO-56)
+ALTITUDE_M = 500.0
+
+INDICATOR_COLUMNS = [
+    'parcelle_id', 'date', 'culture', 'saison_id', 'gdd', 'gdd_cumul', 'pluie',
+    'pluie_cumulee', 'et0', 'etc', 'reserve_hydrique', 'stress_hydrique',
+]
+
+
+def _saturation_vapour_pressure(temperature):
+    return 0.6108 * np.exp(17.27 * temperature / (temperature + 237.3))
+
+
+def reference_evapotranspiration(daily, latitude):
+    """
+    Évapotranspiration de référence journalière (mm/j) selon Penman-Monteith FAO-56.
+
+    `daily` contient les agrégats journaliers de `aggregate_hourly_to_daily`
+    (une ligne par jour) et `latitude` les latitudes des parcelles (degrés).
+    Le résultat a la forme (jours, parcelles).
+    """
+    t_mean = daily['temperature'].to_numpy()[:, None]
+    t_min = daily['temperature_min'].to_numpy()[:, None]
+    t_max = daily['temperature_max'].to_numpy()[:, None]
+    humidity = daily['humidite'].to_numpy()[:, None]
+    wind = daily['vitesse_vent'].to_numpy()[:, None]
+    # Rayonnement moyen en W/m² converti en MJ/m²/j
+    solar = daily['rayonnement_solaire'].to_numpy()[:, None] * 0.0864
+    day_of_year = pd.DatetimeIndex(daily['date']).dayofyear.to_numpy()[:, None]
+    phi = np.radians(np.asarray(latitude, dtype=float))[None, :]
+
+    # Rayonnement extraterrestre (Ra) et rayonnement par ciel clair (Rso)
+    dr = 1 + 0.033 * np.cos(2 * np.pi * day_of_year / 365)
+    delta = 0.409 * np.sin(2 * np.pi * day_of_year / 365 - 1.39)
+    ws = np.arccos(np.clip(-np.tan(phi) * np.tan(delta), -1, 1))
+    ra = 24 * 60 / np.pi * 0.0820 * dr * (ws * np.sin(phi) * np.sin(delta) + np.cos(phi) * np.cos(delta) * np.sin(ws))
+    rso = (0.75 + 2e-5 * ALTITUDE_M) * ra
+
+    es = (_saturation_vapour_pressure(t_max) + _saturation_vapour_pressure(t_min)) / 2
+    ea = es * humidity / 100
+    relative_solar = np.clip(np.divide(solar, rso, out=np.zeros_like(ra), where=rso > 0), 0, 1)
+    rnl = 4.903e-9 * ((t_max + 273.16) ** 4 + (t_min + 273.16) ** 4) / 2 \
+        * (0.34 - 0.14 * np.sqrt(ea)) * (1.35 * relative_solar - 0.35)
+    rn = 0.77 * solar - rnl
+
+    pressure = 101.3 * ((293 - 0.0065 * ALTITUDE_M) / 293) ** 5.26
+    gamma = 0.000665 * pressure
+    slope = 4098 * _saturation_vapour_pressure(t_mean) / (t_mean + 237.3) ** 2
+
+    et0 = (0.408 * slope * rn + gamma * 900 / (t_mean + 273) * wind * (es - ea)) / (slope + gamma * (1 + 0.34 * wind))
+    return np.clip(et0, 0, None)
+
+
+def water_stress(reserve, capacities):
+    """
+    Stress hydrique 1 - réserve / réserve utile ; un sol sans réserve utile est en stress total.
+    """
+    filled = np.divide(reserve, capacities, out=np.zeros(np.shape(reserve)), where=capacities > 0)
+    return 1 - filled
+
+
+class AgroClimaticIndicators:
+    """
+    Moteur d'indicateurs agro-climatiques par parcelle et par saison culturale :
+    degrés-jours de croissance, cumul de pluie, évapotranspiration et bilan hydrique.
+
+    `compute` traite l'historique complet ; `update` intègre ensuite les nouvelles
+    mesures météo horaires et les nouveaux relevés, une ligne par relevé
+    (parcelle, jour) dont la journée météo est complète, comme `compute`.
+    """
+
+    def __init__(self, soil_data):
+        soil = soil_data.drop_duplicates(subset='parcelle_id').sort_values(by='parcelle_id')
+        self.parcels = soil['parcelle_id'].to_numpy()
+        self.latitudes = soil['latitude'].to_numpy(dtype=float)
+        self.capacities = soil['capacite_retention_eau'].to_numpy(dtype=float) * RESERVE_UTILE_MAX_MM
+
+        # État courant par parcelle (même ordre que self.parcels)
+        n_parcels = len(self.parcels)
+        self.cultures = np.full(n_parcels, 'sol_nu', dtype=object)
+        self.season_ids = np.arange(n_parcels, dtype=np.int64)
+        self.next_season_id = n_parcels
+        self.gdd_cumul = np.zeros(n_parcels)
+        self.rain_cumul = np.zeros(n_parcels)
+        self.reserve = self.capacities.copy()
+        self.last_observed = np.full(n_parcels, np.datetime64('NaT'), dtype='datetime64[ns]')
+        self.last_date = None
+        self.hourly_buffer = None
+        # Journées météo complètes et relevés en attente de leur journée
+        self.daily = None
+        self.pending = pd.DataFrame(columns=['parcelle_id', 'date', 'culture'])
+        self.indicators = pd.DataFrame(columns=INDICATOR_COLUMNS)
+
+    @staticmethod
+    def _split_closed_days(hourly_weather):
+        """
+        Agrège les heures en journées et sépare la dernière journée si elle est
+        encore incomplète : ses heures restent en attente pour la prochaine mise à jour.
+        """
+        daily = aggregate_hourly_to_daily(hourly_weather)
+        # Journée incomplète : moins de 24 heures reçues, mesurées ou non
+        if len(daily) and (hourly_weather['date'] >= daily['date'].iloc[-1]).sum() < HOURS_PER_DAY:
+            pending_day = daily['date'].iloc[-1]
+            return daily.iloc[:-1].reset_index(drop=True), hourly_weather[hourly_weather['date'] >= pending_day]
+        return daily, hourly_weather.iloc[0:0]
+
+    def _parcel_positions(self, parcels):
+        positions = np.searchsorted(self.parcels, parcels)
+        positions = np.clip(positions, 0, len(self.parcels) - 1)
+        if not np.all(self.parcels[positions] == parcels):
+            raise KeyError("Parcelles absentes des données de sol.")
+        return positions
+
+    def compute(self, monitoring_data, hourly_weather):
+        """
+        Calcule les indicateurs sur tout l'historique, pour chaque ligne
+        (parcelle, jour) du monitoring, et initialise l'état incrémental.
+        """
+        try:
+            # La dernière journée, si elle est en cours, reste en attente
+            daily, self.hourly_buffer = self._split_closed_days(hourly_weather)
+
+            rows = (
+                monitoring_data[['parcelle_id', 'date', 'culture']]
+                .sort_values(by=['parcelle_id', 'date'], kind='mergesort')
+                .reset_index(drop=True)
+            )
+            # Relevés postérieurs à la dernière journée complète : en attente de leur journée
+            waiting = rows['date'] > daily['date'].max() if len(daily) else np.ones(len(rows), dtype=bool)
+            self.pending = rows[waiting].reset_index(drop=True)
+            rows = rows[rows['date'].isin(daily['date'])].reset_index(drop=True)
+            positions = self._parcel_positions(rows['parcelle_id'].to_numpy())
+            day_positions = np.searchsorted(daily['date'].to_numpy(), rows['date'].to_numpy())
+
+            cultures = rows['culture'].to_numpy()
+            t_mean = daily['temperature'].to_numpy()[day_positions]
+            base = rows['culture'].map(BASE_TEMPERATURES).to_numpy(dtype=float)
+            gdd = np.where(np.isnan(base), 0.0, np.clip(t_mean - np.nan_to_num(base), 0, None))
+            rain = np.nan_to_num(daily['precipitation_sum'].to_numpy()[day_positions])
+            et0 = reference_evapotranspiration(daily, self.latitudes)[day_positions, positions]
+            kc = rows['culture'].map(CROP_COEFFICIENTS).fillna(CROP_COEFFICIENTS['sol_nu']).to_numpy()
+            etc = kc * et0
+
+            # Une saison commence à chaque changement de parcelle ou de culture
+            new_season = np.ones(len(rows), dtype=bool)
+            new_season[1:] = (positions[1:] != positions[:-1]) | (cultures[1:] != cultures[:-1])
+            season_ids = np.cumsum(new_season) - 1
+            season_starts = np.flatnonzero(new_season)
+
+            # Cumuls par saison : cumul global moins le cumul au début de la saison
+            def season_cumsum(values):
+                totals = np.cumsum(values)
+                offsets = totals[season_starts] - values[season_starts]
+                return totals - offsets[season_ids]
+
+            gdd_cumul = season_cumsum(gdd)
+            rain_cumul = season_cumsum(rain)
+
+            # Bilan hydrique : réservoir borné [0, réserve utile], vectorisé sur les parcelles
+            n_days, n_parcels = len(daily), len(self.parcels)
+            inflow = np.zeros((n_days, n_parcels))
+            inflow[day_positions, positions] = rain - etc
+            observed = np.zeros((n_days, n_parcels), dtype=bool)
+            observed[day_positions, positions] = True
+            reserve = self.capacities.copy()
+            reserves = np.empty((n_days, n_parcels))
+            for day in range(n_days):
+                updated = np.clip(reserve + inflow[day], 0, self.capacities)
+                reserve = np.where(observed[day], updated, reserve)
+                reserves[day] = reserve
+            reserve_rows = reserves[day_positions, positions]
+
+            self.indicators = pd.DataFrame({
+                'parcelle_id': rows['parcelle_id'].to_numpy(),
+                'date': rows['date'].to_numpy(),
+                'culture': cultures,
+                'saison_id': season_ids,
+                'gdd': gdd,
+                'gdd_cumul': gdd_cumul,
+                'pluie': rain,
+                'pluie_cumulee': rain_cumul,
+                'et0': et0,
+                'etc': etc,
+                'reserve_hydrique': reserve_rows,
+                'stress_hydrique': water_stress(reserve_rows, self.capacities[positions]),
+            })
+
+            # État final par parcelle pour les mises à jour incrémentales
+            last = np.r_[np.flatnonzero(np.diff(positions)), len(rows) - 1] if len(rows) else np.array([], dtype=int)
+            self.last_observed[positions[last]] = rows['date'].to_numpy(dtype='datetime64[ns]')[last]
+            self.cultures[positions[last]] = cultures[last]
+            self.season_ids[positions[last]] = season_ids[last]
+            self.next_season_id = int(season_ids.max()) + 1 if len(rows) else self.next_season_id
+            self.gdd_cumul[positions[last]] = gdd_cumul[last]
+            self.rain_cumul[positions[last]] = rain_cumul[last]
+            self.reserve = reserve
+            self.daily = daily
+            self.last_date = daily['date'].max() if n_days else None
+
+            return self.indicators
+
+        except Exception as e:
+            print(f"Erreur lors du calcul des indicateurs agro-climatiques : {e}")
+            return None
+
+    def update(self, hourly_rows, monitoring_rows=None):
+        """
+        Intègre de nouvelles mesures météo horaires et de nouveaux relevés de
+        monitoring sans retraiter l'historique. Comme dans `compute`, une ligne est
+        produite pour chaque relevé (parcelle, jour) dont la journée est complète,
+        et les cumuls et la réserve d'une parcelle n'avancent qu'à ses jours observés ;
+        un changement de culture ouvre une nouvelle saison. Les relevés d'une journée
+        encore incomplète restent en attente. Retourne les nouvelles lignes d'indicateurs.
+        """
+        try:
+            buffer = hourly_rows if self.hourly_buffer is None else pd.concat([self.hourly_buffer, hourly_rows])
+            if self.last_date is not None:
+                buffer = buffer[buffer['date'] >= self.last_date + pd.Timedelta(days=1)]
+            complete_days, self.hourly_buffer = self._split_closed_days(buffer)
+            if len(complete_days):
+                self.daily = complete_days if self.daily is None else pd.concat([self.daily, complete_days], ignore_index=True)
+                self.last_date = self.daily['date'].max()
+
+            observations = self.pending
+            if monitoring_rows is not None and len(monitoring_rows):
+                new_observations = monitoring_rows[['parcelle_id', 'date', 'culture']]
+                observations = pd.concat([observations, new_observations], ignore_index=True) if len(observations) else new_observations
+            if self.daily is None or observations.empty:
+                self.pending = observations
+                return self.indicators.iloc[0:0]
+
+            # Relevés de journées encore incomplètes : en attente
+            self.pending = observations[observations['date'] > self.last_date].reset_index(drop=True)
+            rows = (
+                observations[observations['date'].isin(self.daily['date'])]
+                .drop_duplicates(subset=['parcelle_id', 'date'], keep='last')
+                .sort_values(by=['date', 'parcelle_id'], kind='mergesort')
+                .reset_index(drop=True)
+            )
+            positions = self._parcel_positions(rows['parcelle_id'].to_numpy())
+            dates = rows['date'].to_numpy(dtype='datetime64[ns]')
+            # Relevés déjà intégrés (jour antérieur ou égal au dernier jour observé de la parcelle)
+            fresh = ~(dates <= self.last_observed[positions])
+            rows, positions, dates = rows[fresh].reset_index(drop=True), positions[fresh], dates[fresh]
+            if rows.empty:
+                return self.indicators.iloc[0:0]
+
+            days = self.daily[self.daily['date'].isin(rows['date'])].reset_index(drop=True)
+            day_positions = np.searchsorted(days['date'].to_numpy(dtype='datetime64[ns]'), dates)
+            et0_days = reference_evapotranspiration(days, self.latitudes)
+            cultures = rows['culture'].to_numpy()
+            base = rows['culture'].map(BASE_TEMPERATURES).to_numpy(dtype=float)
+            kc = rows['culture'].map(CROP_COEFFICIENTS).fillna(CROP_COEFFICIENTS['sol_nu']).to_numpy()
+
+            columns = {column: np.empty(len(rows)) for column in ['gdd', 'gdd_cumul', 'pluie', 'pluie_cumulee', 'et0', 'etc', 'reserve_hydrique']}
+            season_ids = np.empty(len(rows), dtype=np.int64)
+            # Un jour à la fois (lignes triées par date) : les parcelles observées ce jour-là avancent ensemble
+            bounds = np.r_[0, np.flatnonzero(np.diff(day_positions)) + 1, len(rows)]
+            for low, high in zip(bounds[:-1], bounds[1:]):
+                day, day_rows = day_positions[low], slice(low, high)
+                parcels = positions[day_rows]
+                changed = self.cultures[parcels] != cultures[day_rows]
+                self.season_ids[parcels[changed]] = self.next_season_id + np.arange(changed.sum())
+                self.next_season_id += int(changed.sum())
+                self.gdd_cumul[parcels[changed]] = 0.0
+                self.rain_cumul[parcels[changed]] = 0.0
+                self.cultures[parcels] = cultures[day_rows]
+
+                t_mean = days['temperature'].iloc[day]
+                rain = np.nan_to_num(days['precipitation_sum'].iloc[day])
+                gdd = np.where(np.isnan(base[day_rows]), 0.0, np.clip(t_mean - np.nan_to_num(base[day_rows]), 0, None))
+                et0 = et0_days[day, parcels]
+                etc = kc[day_rows] * et0
+                self.gdd_cumul[parcels] += gdd
+                self.rain_cumul[parcels] += rain
+                self.reserve[parcels] = np.clip(self.reserve[parcels] + rain - etc, 0, self.capacities[parcels])
+                self.last_observed[parcels] = dates[day_rows]
+
+                season_ids[day_rows] = self.season_ids[parcels]
+                columns['gdd'][day_rows] = gdd
+                columns['gdd_cumul'][day_rows] = self.gdd_cumul[parcels]
+                columns['pluie'][day_rows] = rain
+                columns['pluie_cumulee'][day_rows] = self.rain_cumul[parcels]
+                columns['et0'][day_rows] = et0
+                columns['etc'][day_rows] = etc
+                columns['reserve_hydrique'][day_rows] = self.reserve[parcels]
+
+            new_rows = pd.DataFrame({
+                'parcelle_id': rows['parcelle_id'].to_numpy(),
+                'date': rows['date'].to_numpy(),
+                'culture': cultures,
+                'saison_id': season_ids,
+                'gdd': columns['gdd'],
+                'gdd_cumul': columns['gdd_cumul'],
+                'pluie': columns['pluie'],
+                'pluie_cumulee': columns['pluie_cumulee'],
+                'et0': columns['et0'],
+                'etc': columns['etc'],
+                'reserve_hydrique': columns['reserve_hydrique'],
+                'stress_hydrique': water_stress(columns['reserve_hydrique'], self.capacities[positions]),
+            }).sort_values(by=['parcelle_id', 'date'], kind='mergesort').reset_index(drop=True)
+
+            self.indicators = pd.concat([self.indicators, new_rows], ignore_index=True)
+            return new_rows
+
+        except Exception as e:
+            print(f"Erreur lors de la mise à jour des indicateurs agro-climatiques : {e}")
+            return None
@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import json
+import math
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import tornado.ioloop
+import tornado.web
+
+from data_manager import AgriculturalDataManager
+
+
+# Gestionnaire de données du processus courant (renseigné dans chaque worker)
+_WORKER = {}
+
+
+def to_json(value):
+    """
+    Convertit les résultats d'analyse (DataFrame, Series, scalaires numpy,
+    dates, NaN) en structures sérialisables en JSON.
+    """
+    if isinstance(value, dict):
+        return {str(key): to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    if isinstance(value, pd.DataFrame):
+        return [to_json(record) for record in value.to_dict(orient="records")]
+    if isinstance(value, pd.Series):
+        index = [to_json(item) for item in value.index]
+        return {"index": index, "values": [to_json(item) for item in value.to_numpy()]}
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _init_worker(data_dir, snapshot_root, snapshot_version):
+    """
+    Initialise un worker : gestionnaire propre, attaché sans copie à l'instantané partagé.
+    """
+    manager = AgriculturalDataManager(data_dir=data_dir)
+    manager.attach_snapshot(root=snapshot_root, version=snapshot_version)
+    _WORKER['manager'] = manager
+    _WORKER['root'] = snapshot_root
+
+
+def _parcels(manager):
+    return sorted(manager.features['parcelle_id'].unique())
+
+
+def _summary(manager, parcelle_id):
+    return to_json(manager.get_parcel_summary(parcelle_id))
+
+
+def _temporal_patterns(manager, parcelle_id):
+    history, trend = manager.get_temporal_patterns(parcelle_id)
+    return None if history is None else to_json({"historique": history, "tendance": trend})
+
+
+def _risk_metrics(manager):
+    # Copie superficielle : le calcul ajoute des colonnes sans toucher aux données partagées ;
+    # lecture seule, sans publication d'artefact
+    metrics = manager.calculate_risk_metrics(manager.features.copy(deep=False), publish=False)
+    return None if metrics is None else to_json(metrics)
+
+
+def _yield_trend(manager, parcelle_id):
+    return to_json(manager.analyze_yield_patterns(parcelle_id))
+
+
+# Analyses exécutables dans les workers (nom -> fonction(gestionnaire, *arguments))
+ANALYSES = {
+    "parcels": _parcels,
+    "summary": _summary,
+    "patterns": _temporal_patterns,
+    "risk": _risk_metrics,
+    "yield_trend": _yield_trend,
+}
+
+
+def run_analysis(snapshot_version, name, args):
+    """
+    Exécute l'analyse `name` dans un worker, sur la version `snapshot_version` de
+    l'instantané (le worker s'y rattache si le service a changé de version).
+    """
+    manager = _WORKER['manager']
+    if manager.snapshot_version != snapshot_version:
+        manager.attach_snapshot(root=_WORKER['root'], version=snapshot_version)
+    return ANALYSES[name](manager, *args)
+
+
+class RequestCoalescer:
+    """
+    Regroupe les requêtes identiques simultanées : une seule exécution est
+    lancée par clé, et tous les appelants en attente reçoivent son résultat.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def run(self, key, factory):
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+
+class AnalyticsService:
+    """
+    Analyses du gestionnaire de données exposées de façon asynchrone.
+
+    Les calculs s'exécutent dans un pool borné de processus, chacun avec son
+    propre gestionnaire attaché sans copie à l'instantané partagé des données
+    préparées (publié au démarrage si nécessaire). Les requêtes identiques en
+    cours sont regroupées et les résultats sont mis en cache pour la version
+    courante de l'instantané ; une nouvelle version publiée est reprise à la
+    requête suivante.
+    """
+
+    def __init__(self, data_manager, max_workers=4, cache_size=256):
+        self.data_manager = data_manager
+        if data_manager.snapshot_version is None:
+            if data_manager.features is None:
+                data_manager.run_pipeline(targets=['features'])
+            data_manager.publish_snapshot()
+        initargs = (data_manager.data_dir, data_manager._snapshot_root(), data_manager.snapshot_version)
+        self.executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=initargs)
+        self.coalescer = RequestCoalescer()
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def _data_version(self):
+        """
+        Version des données servies : la dernière version publiée de l'instantané partagé.
+        """
+        self.data_manager.refresh_snapshot()
+        return self.data_manager.snapshot_version
+
+    async def call(self, name, *args):
+        """
+        Exécute l'analyse `name` dans le pool, avec regroupement et cache par version des données.
+        """
+        version = self._data_version()
+        key = (version, name, args)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        loop = asyncio.get_running_loop()
+        result = await self.coalescer.run(key, lambda: loop.run_in_executor(self.executor, run_analysis, version, name, args))
+        self._cache[key] = result
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    async def parcels(self):
+        return await self.call("parcels")
+
+    async def parcel_summary(self, parcelle_id):
+        return await self.call("summary", parcelle_id)
+
+    async def temporal_patterns(self, parcelle_id):
+        return await self.call("patterns", parcelle_id)
+
+    async def risk_metrics(self):
+        return await self.call("risk")
+
+    async def yield_trend(self, parcelle_id):
+        return await self.call("yield_trend", parcelle_id)
+
+
+class AnalyticsHandler(tornado.web.RequestHandler):
+    """
+    Gestionnaire de base : sérialisation JSON et 404 pour les résultats absents.
+    """
+
+    def initialize(self, service):
+        self.service = service
+
+    def respond(self, result):
+        if result is None:
+            raise tornado.web.HTTPError(404)
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.write(json.dumps(result, ensure_ascii=False))
+
+
+class ParcelsHandler(AnalyticsHandler):
+    async def get(self):
+        self.respond(await self.service.parcels())
+
+
+class SummaryHandler(AnalyticsHandler):
+    async def get(self, parcelle_id):
+        self.respond(await self.service.parcel_summary(parcelle_id))
+
+
+class PatternsHandler(AnalyticsHandler):
+    async def get(self, parcelle_id):
+        self.respond(await self.service.temporal_patterns(parcelle_id))
+
+
+class YieldTrendHandler(AnalyticsHandler):
+    async def get(self, parcelle_id):
+        self.respond(await self.service.yield_trend(parcelle_id))
+
+
+class RiskHandler(AnalyticsHandler):
+    async def get(self):
+        self.respond(await self.service.risk_metrics())
+
+
+def make_app(service):
+    """
+    Routes HTTP du service d'analyse.
+    """
+    routes = [
+        (r"/parcels", ParcelsHandler),
+        (r"/parcels/([^/]+)/summary", SummaryHandler),
+        (r"/parcels/([^/]+)/patterns", PatternsHandler),
+        (r"/parcels/([^/]+)/yield-trend", YieldTrendHandler),
+        (r"/risk", RiskHandler),
+    ]
+    return tornado.web.Application([(pattern, handler, dict(service=service)) for pattern, handler in routes])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Service HTTP d'analyse des données agricoles.")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--data-dir", default="../data")
+    args = parser.parse_args()
+
+    # Données partagées si un instantané est publié, sinon pipeline (étapes en cache reprises)
+    data_manager = AgriculturalDataManager(data_dir=args.data_dir)
+    if data_manager.attach_snapshot() is None:
+        data_manager.run_pipeline(targets=['features'])
+
+    app = make_app(AnalyticsService(data_manager, max_workers=args.workers))
+    app.listen(args.port)
+    print(f"Service d'analyse disponible sur http://localhost:{args.port}")
+    tornado.ioloop.IOLoop.current().start()
@@ -0,0 +1,199 @@
+import os
+import tempfile
+import time
+import uuid
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from hashing import data_version
+
+
+# Fichier désignant la version courante d'un artefact ; remplacé atomiquement
+LATEST_POINTER = "LATEST"
+
+# Répertoire des baux de lecture et durée (s) après laquelle un bail non renouvelé est ignoré
+PINS_DIRECTORY = "pins"
+PIN_TTL = 24 * 3600
+
+
+class ArtifactStore:
+    """
+    Sorties du pipeline versionnées par leur contenu.
+
+    Chaque artefact est un répertoire `root/<nom>/` contenant une version par
+    fichier `<empreinte>.parquet` et un pointeur LATEST. Les fichiers sont écrits
+    sous un nom temporaire unique puis renommés, et ne sont jamais modifiés :
+    un lecteur qui a retenu une version la relit à l'identique, même pendant
+    qu'un autre pipeline en publie une nouvelle.
+
+    Un lecteur d'un autre processus protège sa version par un bail (`pin`) : un
+    fichier `<nom>/pins/<empreinte>.<jeton>` que le nettoyage des anciennes
+    versions respecte tant qu'il a moins de PIN_TTL secondes (un bail est
+    renouvelé par `renew`, libéré par `unpin`).
+
+    Une version peut être accompagnée de fichiers annexes `<empreinte>.<suffixe>`
+    (par exemple l'état d'un calcul incrémental), publiés et supprimés avec elle.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, name, version):
+        return os.path.join(self.root, name, f"{version}.parquet")
+
+    def sidecar_path(self, name, version, suffix):
+        return os.path.join(self.root, name, f"{version}.{suffix}")
+
+    def _atomic_write(self, directory, final_path, write):
+        """
+        Appelle `write(chemin_temporaire)` puis renomme le fichier vers `final_path`.
+        """
+        os.makedirs(directory, exist_ok=True)
+        handle, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        os.close(handle)
+        try:
+            write(tmp_path)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def latest(self, name):
+        """
+        Version courante de l'artefact `name`, ou None s'il n'a jamais été publié.
+        """
+        try:
+            with open(os.path.join(self.root, name, LATEST_POINTER)) as pointer:
+                return pointer.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def versions(self, name):
+        """
+        Versions disponibles de `name`, de la plus ancienne à la plus récente.
+        """
+        directory = os.path.join(self.root, name)
+        if not os.path.isdir(directory):
+            return []
+        files = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith(".parquet"):
+                try:
+                    files.append((entry.stat().st_mtime, entry.name[:-len(".parquet")]))
+                except FileNotFoundError:
+                    # Supprimée entre-temps par le nettoyage d'un autre pipeline
+                    continue
+        return [version for _, version in sorted(files)]
+
+    def _pins_directory(self, name):
+        return os.path.join(self.root, name, PINS_DIRECTORY)
+
+    def pin(self, name, version):
+        """
+        Prend un bail sur la version `version` de `name` et retourne son jeton.
+        """
+        directory = self._pins_directory(name)
+        os.makedirs(directory, exist_ok=True)
+        token = f"{version}.{uuid.uuid4().hex}"
+        open(os.path.join(directory, token), "w").close()
+        return token
+
+    def renew(self, name, token):
+        """
+        Renouvelle le bail `token` ; le recrée s'il a été supprimé.
+        """
+        path = os.path.join(self._pins_directory(name), token)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            os.makedirs(self._pins_directory(name), exist_ok=True)
+            open(path, "w").close()
+
+    def unpin(self, name, token):
+        """
+        Libère le bail `token`.
+        """
+        try:
+            os.remove(os.path.join(self._pins_directory(name), token))
+        except FileNotFoundError:
+            pass
+
+    def pinned(self, name, ttl=PIN_TTL):
+        """
+        Versions de `name` protégées par au moins un bail de moins de `ttl` secondes.
+        """
+        directory = self._pins_directory(name)
+        if not os.path.isdir(directory):
+            return set()
+        now = time.time()
+        versions = set()
+        for entry in os.scandir(directory):
+            try:
+                if now - entry.stat().st_mtime < ttl:
+                    versions.add(entry.name.split(".", 1)[0])
+            except FileNotFoundError:
+                continue
+        return versions
+
+    def publish(self, name, frame, keep=3, sidecars=None):
+        """
+        Publie `frame` comme nouvelle version de `name` et retourne son empreinte.
+        Un contenu identique à une version existante n'est pas réécrit. Seules les
+        `keep` versions les plus récentes sont conservées (la courante et les
+        versions sous bail toujours). `sidecars` associe un suffixe à une fonction
+        `write(chemin_temporaire)` écrivant un fichier annexe de la version, avant
+        que celle-ci ne devienne visible.
+        """
+        version = data_version(frame, list(frame.columns))
+        directory = os.path.join(self.root, name)
+
+        for suffix, write in (sidecars or {}).items():
+            self._atomic_write(directory, self.sidecar_path(name, version, suffix), write)
+
+        if not os.path.exists(self.path(name, version)):
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            self._atomic_write(directory, self.path(name, version), lambda tmp: pq.write_table(table, tmp))
+        else:
+            # Rafraîchit la date pour que le nettoyage la considère comme récente
+            os.utime(self.path(name, version))
+
+        def write_pointer(tmp_path):
+            with open(tmp_path, "w") as pointer:
+                pointer.write(version)
+        self._atomic_write(directory, os.path.join(directory, LATEST_POINTER), write_pointer)
+
+        if keep:
+            current = {version, self.latest(name)} | self.pinned(name)
+            for old in self.versions(name)[:-keep]:
+                if old not in current:
+                    self._remove_version(name, old)
+        return version
+
+    def _remove_version(self, name, version):
+        """
+        Supprime une version et ses fichiers annexes (le Parquet d'abord : la version
+        disparaît de `versions` avant ses annexes).
+        """
+        directory = os.path.join(self.root, name)
+        paths = [self.path(name, version)] + [
+            os.path.join(directory, entry) for entry in os.listdir(directory)
+            if entry.startswith(f"{version}.") and not entry.endswith(".parquet")
+        ]
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def read(self, name, version=None, columns=None, filters=None):
+        """
+        Lit une version de `name` (la plus récente par défaut). Colonnes et
+        filtres au format pyarrow, par exemple [('parcelle_id', '==', 'P001')].
+        """
+        version = version or self.latest(name)
+        if version is None:
+            raise FileNotFoundError(f"No version of artifact '{name}' in {self.root}")
+        return pq.read_table(self.path(name, version), columns=columns, filters=filters).to_pandas()
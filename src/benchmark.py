@@ -0,0 +1,693 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import folium
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+
+from data_manager import AgriculturalDataManager, DATASET_SCHEMAS, GAP_FILLING, VALIDATION_RULES, read_dataset
+from agro_indicators import AgroClimaticIndicators
+from gap_filling import fill_gaps
+from synthetic_data import generate_synthetic_dataset, generate_parcel_polygons
+from weather_aggregation import aggregate_hourly_to_daily
+from season_curves import fit_growth_curves
+from ndvi_anomaly import NDVIAnomalyDetector
+from correlation_analysis import lagged_cross_correlation
+from shared_snapshot import publish_snapshot, attach_snapshot
+from parcel_geometry import ParcelGeometry, simplify_ring
+from spatial_index import GridIndex, haversine_km
+from validation import validate
+from similarity import SimilarityIndex, SOIL_PROFILE, TREND_PROFILE
+import kernels as kernels_module
+from kernels import NUMBA_AVAILABLE, binned_counts, group_bounds, grouped_linear_trend, grouped_mean_mode, grouped_rolling_mean
+from yield_model import YieldPredictor, WEATHER_FEATURES, CROP_FEATURES, SOIL_FEATURES
+
+
+SYNTHETIC_DIR = "../data/synthetic"
+
+
+def _timeit(func, repeat=3):
+    """
+    Retourne le meilleur temps d'exécution (en secondes) de `func` sur `repeat` essais.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _ensure_synthetic_dataset(data_dir, n_parcels):
+    if not os.path.exists(os.path.join(data_dir, "monitoring_cultures.csv")):
+        generate_synthetic_dataset(data_dir, n_parcels=n_parcels)
+
+
+def benchmark_loading(data_dir=SYNTHETIC_DIR, n_parcels=1000):
+    """
+    Compare le chargement séquentiel historique (moteur C, inférence des dates)
+    au chargement concurrent avec schéma explicite de `load_data`.
+    Les trois fusions de `load_data` sont incluses dans chaque mesure.
+    """
+    _ensure_synthetic_dataset(data_dir, n_parcels)
+
+    def sequential_baseline():
+        files = {attribute: os.path.join(data_dir, schema['file']) for attribute, schema in DATASET_SCHEMAS.items()}
+        monitoring = pd.read_csv(files['monitoring_data'], parse_dates=["date"])
+        weather = pd.read_csv(files['weather_data'], parse_dates=["date"])
+        soil = pd.read_csv(files['soil_data'])
+        yield_history = pd.read_csv(files['yield_history'], parse_dates=["date"])
+        data = pd.merge(monitoring, weather, on="date", how="left")
+        data = pd.merge(data, soil, on="parcelle_id", how="left")
+        pd.merge(data, yield_history, on=["parcelle_id", "date"], how="left")
+
+    def read_only(parallel):
+        manager = AgriculturalDataManager(data_dir=data_dir)
+        return lambda: manager.load_data(parallel=parallel)
+
+    baseline = _timeit(sequential_baseline)
+    sequential = _timeit(read_only(parallel=False))
+    concurrent = _timeit(read_only(parallel=True))
+
+    print("========= chargement des données =========")
+    print(f"Séquentiel (référence, inférence) : {baseline:.3f} s")
+    print(f"Séquentiel (schéma explicite)     : {sequential:.3f} s")
+    print(f"Concurrent (schéma explicite)     : {concurrent:.3f} s  (x{baseline / concurrent:.1f})")
+    return {'baseline': baseline, 'sequential': sequential, 'concurrent': concurrent}
+
+
+def benchmark_daily_aggregation(data_dir=SYNTHETIC_DIR, n_parcels=1000):
+    """
+    Compare `resample('D')` (moyenne seule, puis moyenne/min/max/somme)
+    au moteur d'agrégation journalière à cadence fixe. Vérifie que `nb_heures`
+    ne compte que les heures mesurées.
+    """
+    _ensure_synthetic_dataset(data_dir, n_parcels)
+    weather = read_dataset(os.path.join(data_dir, DATASET_SCHEMAS['weather_data']['file']), DATASET_SCHEMAS['weather_data'])
+
+    resample_mean = _timeit(lambda: weather.set_index('date').resample('D').mean())
+    resample_stats = _timeit(lambda: weather.set_index('date').resample('D').agg(['mean', 'min', 'max', 'sum']))
+    engine = _timeit(lambda: aggregate_hourly_to_daily(weather))
+    irregular = weather.drop(index=weather.index[::97])
+    engine_fallback = _timeit(lambda: aggregate_hourly_to_daily(irregular))
+
+    # Heures sans aucune mesure : non comptées dans nb_heures, sur les deux chemins
+    blank = weather.copy()
+    blank.loc[blank.index[:5], blank.columns.drop('date')] = np.nan
+    for frame in (blank, blank.drop(index=blank.index[[10]])):
+        hours = aggregate_hourly_to_daily(frame)['nb_heures'].iloc[0]
+        assert hours == 24 - 5 - (len(frame) < len(blank)), f"nb_heures counts unobserved hours: {hours}"
+
+    print("========= agrégation horaire -> journalière =========")
+    print(f"resample('D').mean()               : {resample_mean * 1000:.1f} ms")
+    print(f"resample('D').agg(mean/min/max/sum): {resample_stats * 1000:.1f} ms")
+    print(f"Moteur (cadence régulière)         : {engine * 1000:.1f} ms  (x{resample_stats / engine:.1f})")
+    print(f"Moteur (repli, heures manquantes)  : {engine_fallback * 1000:.1f} ms")
+    return {'resample_mean': resample_mean, 'resample_stats': resample_stats, 'engine': engine, 'fallback': engine_fallback}
+
+
+def benchmark_gap_filling(data_dir=SYNTHETIC_DIR, n_parcels=1000, missing_share=0.05, seed=0):
+    """
+    Comblement des trous de la météo horaire et du suivi des cultures dont une
+    part `missing_share` des relevés a été retirée. Vérifie que le cumul des
+    précipitations, non interpolées, n'est pas modifié par les lignes réinsérées,
+    et qu'un relevé hors grille ne prive de régularisation que sa parcelle.
+    """
+    _ensure_synthetic_dataset(data_dir, n_parcels)
+    rng = np.random.default_rng(seed)
+    frames = {}
+    for attribute in ('weather_data', 'monitoring_data'):
+        frame = read_dataset(os.path.join(data_dir, DATASET_SCHEMAS[attribute]['file']), DATASET_SCHEMAS[attribute])
+        frames[attribute] = frame[rng.random(len(frame)) >= missing_share].reset_index(drop=True)
+
+    print(f"========= comblement des trous ({missing_share:.0%} des relevés retirés) =========")
+    results = {}
+    for attribute, frame in frames.items():
+        elapsed = _timeit(lambda: fill_gaps(frame, **GAP_FILLING[attribute]))
+        filled = fill_gaps(frame, **GAP_FILLING[attribute])
+        results[attribute] = elapsed
+        print(f"{attribute:<33}: {elapsed:.2f} s ({len(frame)} -> {len(filled)} lignes)")
+        if 'precipitation' in frame.columns:
+            before, after = frame['precipitation'].sum(), filled['precipitation'].sum()
+            assert np.isclose(before, after), f"precipitation total changed by fill_gaps: {before} -> {after}"
+            print(f"Cumul des précipitations inchangé : {before:.2f} mm")
+
+    # Un relevé hors grille ne laisse que sa parcelle sans régularisation
+    monitoring = frames['monitoring_data'].copy()
+    parcel = monitoring.loc[1, 'parcelle_id']
+    monitoring.loc[1, 'date'] += pd.Timedelta(hours=6)
+    filled = fill_gaps(frames['monitoring_data'], **GAP_FILLING['monitoring_data'])
+    shifted = fill_gaps(monitoring, **GAP_FILLING['monitoring_data'])
+    others = lambda frame: frame[frame['parcelle_id'] != parcel].reset_index(drop=True)
+    pd.testing.assert_frame_equal(others(filled), others(shifted))
+    assert (shifted['parcelle_id'] == parcel).sum() == (monitoring['parcelle_id'] == parcel).sum()
+    print(f"Relevé hors grille : seule la série de {parcel} reste sans régularisation")
+    return results
+
+
+def benchmark_agro_indicators(data_dir=SYNTHETIC_DIR, n_parcels=1000, update_days=30):
+    """
+    Calcul complet des indicateurs agro-climatiques contre l'intégration des
+    `update_days` derniers jours par mises à jour quotidiennes (météo horaire et
+    relevés). Vérifie que les lignes produites sont celles du calcul complet,
+    y compris pour une parcelle sans réserve utile.
+    """
+    _ensure_synthetic_dataset(data_dir, n_parcels)
+    frames = {
+        attribute: read_dataset(os.path.join(data_dir, DATASET_SCHEMAS[attribute]['file']), DATASET_SCHEMAS[attribute])
+        for attribute in ('weather_data', 'monitoring_data', 'soil_data')
+    }
+    hourly, monitoring, soil = frames['weather_data'], frames['monitoring_data'], frames['soil_data']
+    soil.loc[0, 'capacite_retention_eau'] = 0.0
+
+    start = time.perf_counter()
+    full = AgroClimaticIndicators(soil).compute(monitoring, hourly)
+    compute = time.perf_counter() - start
+
+    cut = hourly['date'].max().normalize() - pd.Timedelta(days=update_days - 1)
+    engine = AgroClimaticIndicators(soil)
+    engine.compute(monitoring[monitoring['date'] < cut], hourly[hourly['date'] < cut])
+    start = time.perf_counter()
+    updates = [
+        engine.update(hourly[hourly['date'].dt.normalize() == day], monitoring[monitoring['date'] == day])
+        for day in pd.date_range(cut, periods=update_days)
+    ]
+    update = (time.perf_counter() - start) / update_days
+
+    incremental = pd.concat(updates, ignore_index=True).sort_values(by=['parcelle_id', 'date'], kind='mergesort').reset_index(drop=True)
+    expected = full[full['date'] >= cut].reset_index(drop=True)
+    columns = ['parcelle_id', 'date', 'culture', 'gdd', 'gdd_cumul', 'pluie', 'pluie_cumulee', 'et0', 'etc', 'reserve_hydrique', 'stress_hydrique']
+    pd.testing.assert_frame_equal(incremental[columns], expected[columns], check_exact=False, rtol=1e-9)
+    assert np.isfinite(full['stress_hydrique']).all(), "stress_hydrique must stay finite without water capacity"
+
+    print(f"========= indicateurs agro-climatiques ({len(full)} lignes) =========")
+    print(f"Calcul complet                   : {compute:.2f} s")
+    print(f"Mise à jour d'une journée        : {update * 1000:.1f} ms ({len(incremental) // update_days} lignes)")
+    return {'compute': compute, 'update': update}
+
+
+def _synthetic_feature_frame(n_parcels, rows_per_parcel, seed=0):
+    """
+    Table de caractéristiques synthétique au format de prepare_features
+    (une ligne par parcelle et par mois).
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = n_parcels * rows_per_parcel
+    columns = {column: rng.normal(size=n_rows) for column in WEATHER_FEATURES + CROP_FEATURES + SOIL_FEATURES}
+    frame = pd.DataFrame(columns)
+    frame['parcelle_id'] = np.repeat([f"P{i:05d}" for i in range(n_parcels)], rows_per_parcel)
+    frame['date'] = np.tile(pd.date_range("2020-01-31", periods=rows_per_parcel, freq="ME"), n_parcels)
+    frame['culture'] = rng.choice(['Ble', 'Mais', 'Tournesol'], n_rows)
+    frame['rendement_estime'] = 5 + 2 * frame['ndvi'] + frame['ph'] + rng.normal(0, 0.5, n_rows)
+    return frame
+
+
+def benchmark_yield_prediction(n_parcels=10000, rows_per_parcel=60):
+    """
+    Latence d'entraînement et de prédiction par lot du modèle de rendement.
+    """
+    features = _synthetic_feature_frame(n_parcels, rows_per_parcel)
+    predictor = YieldPredictor()
+
+    fit = _timeit(lambda: predictor.fit(features))
+    predict = _timeit(lambda: (predictor._cache.clear(), predictor.predict(features)))
+    cached = _timeit(lambda: predictor.predict(features))
+
+    print(f"========= prédiction des rendements ({n_parcels} parcelles, {len(features)} lignes) =========")
+    print(f"Entraînement              : {fit:.3f} s")
+    print(f"Prédiction (lot complet)  : {predict * 1000:.1f} ms")
+    print(f"Prédiction (cache)        : {cached * 1000:.1f} ms")
+    return {'fit': fit, 'predict': predict, 'cached': cached}
+
+
+def benchmark_season_curves(n_seasons=50000, n_months=12, seed=0):
+    """
+    Ajustement simultané de courbes logistiques sur des dizaines de milliers de saisons.
+    """
+    rng = np.random.default_rng(seed)
+    months = np.arange(n_months)
+    final = rng.uniform(2, 12, (n_seasons, 1))
+    rate = rng.uniform(0.4, 1.2, (n_seasons, 1))
+    inflexion = rng.uniform(2, 6, (n_seasons, 1))
+    values = final / (1 + np.exp(-rate * (months - inflexion))) + rng.normal(0, 0.2, (n_seasons, n_months))
+    values[rng.random(values.shape) < 0.05] = np.nan
+
+    elapsed = _timeit(lambda: fit_growth_curves(values), repeat=1)
+    fit = fit_growth_curves(values)
+    error = np.nanmedian(np.abs(fit['K'] - final[:, 0]) / final[:, 0])
+    assert np.isfinite(fit['K'][fit['converged']]).all(), "converged fits must have finite parameters"
+
+    # Saisons de bruit sans croissance logistique : certains ajustements se bloquent
+    noise_fit = fit_growth_curves(rng.normal(5, 3, (5000, n_months)))
+    stalled = np.isnan(noise_fit['K'])
+    assert not (stalled & noise_fit['converged']).any(), "stalled fits must not be reported converged"
+
+    # Saisons de moins de 3 observations : aucune estimation
+    short = values[:100].copy()
+    short[:, 2:] = np.nan
+    short_fit = fit_growth_curves(short)
+    assert np.isnan(short_fit['K']).all() and not short_fit['converged'].any(), "short seasons must have no estimate"
+
+    print(f"========= courbes de croissance ({n_seasons} saisons x {n_months} mois) =========")
+    print(f"Gauss-Newton par lot : {elapsed:.2f} s, convergence {fit['converged'].mean():.1%}, erreur médiane sur K {error:.1%}")
+    print(f"Saisons de bruit     : {stalled.sum()} ajustements bloqués, non convergés et sans paramètres")
+    return {'batched': elapsed}
+
+
+def benchmark_ndvi_anomalies(n_parcels=10000, n_days=365, seed=0):
+    """
+    Latence du détecteur d'anomalies NDVI sur le relevé journalier d'une exploitation.
+    Vérifie qu'une observation sans culture est comparée à l'attente globale.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2023-01-01", periods=n_days, freq="D")
+    parcels = np.array([f"P{i:05d}" for i in range(n_parcels)], dtype=object)
+    cultures = rng.choice(['Ble', 'Mais', 'Tournesol'], n_parcels)
+    seasonal = 0.5 + 0.3 * np.sin(2 * np.pi * (dates.dayofyear.to_numpy() - 80) / 365)
+
+    history = pd.DataFrame({
+        'parcelle_id': np.repeat(parcels, n_days),
+        'date': np.tile(dates, n_parcels),
+        'culture': np.repeat(cultures, n_days),
+        'ndvi': np.tile(seasonal, n_parcels) + rng.normal(0, 0.05, n_parcels * n_days),
+    })
+    detector = NDVIAnomalyDetector().fit_expectation(history)
+    warmup = _timeit(lambda: NDVIAnomalyDetector().fit_expectation(history).update(history), repeat=1)
+    detector.update(history)
+
+    day = pd.Timestamp(dates[-1]) + pd.Timedelta(days=1)
+    batches = [
+        pd.DataFrame({'parcelle_id': parcels, 'date': day + pd.Timedelta(days=i), 'culture': cultures,
+                      'ndvi': seasonal[-1] + rng.normal(0, 0.05, n_parcels)})
+        for i in range(3)
+    ]
+    daily = _timeit(lambda: detector.update(batches.pop(0)), repeat=3)
+
+    # Culture manquante : attente globale, pas celle d'une autre culture du lot
+    scored = detector.update(pd.DataFrame({
+        'parcelle_id': parcels[:2], 'date': day + pd.Timedelta(days=3), 'culture': [np.nan, 'Ble'], 'ndvi': [0.5, 0.5],
+    }))
+    assert np.isclose(scored['ndvi_attendu'].iloc[0], np.nanmean(detector.expectation)), "missing cultures must use the global expectation"
+
+    print(f"========= anomalies NDVI ({n_parcels} parcelles) =========")
+    print(f"Initialisation ({n_days} jours d'historique) : {warmup:.2f} s")
+    print(f"Lot journalier                        : {daily * 1000:.1f} ms")
+    return {'warmup': warmup, 'daily': daily}
+
+
+def benchmark_weather_correlations(n_parcels=2000, n_variables=7, n_days=1827, max_lag=60, seed=0):
+    """
+    Corrélations décalées météo / NDVI par FFT sur des milliers de parcelles.
+    """
+    rng = np.random.default_rng(seed)
+    weather = rng.normal(size=(n_parcels, n_variables, n_days))
+    ndvi = np.roll(weather[:, 0], 20, axis=-1) + rng.normal(size=(n_parcels, n_days))
+    weather[rng.random(weather.shape) < 0.02] = np.nan
+
+    elapsed = _timeit(lambda: lagged_cross_correlation(weather, ndvi, max_lag=max_lag), repeat=1)
+
+    print(f"========= corrélations décalées ({n_parcels} parcelles x {n_variables} variables x {max_lag + 1} décalages) =========")
+    print(f"FFT par lot : {elapsed:.2f} s")
+    return {'fft': elapsed}
+
+
+def benchmark_snapshot(n_parcels=10000, rows_per_parcel=60, root=os.path.join(SYNTHETIC_DIR, "snapshots")):
+    """
+    Publication d'un instantané partagé et attachement sans copie depuis une session.
+    """
+    features = _synthetic_feature_frame(n_parcels, rows_per_parcel)
+    publish = _timeit(lambda: publish_snapshot({'features': features}, root), repeat=1)
+    attach = _timeit(lambda: attach_snapshot(root))
+    copy = _timeit(lambda: features.copy())
+
+    print(f"========= instantané partagé ({len(features)} lignes, {features.memory_usage(deep=True).sum() / 1e6:.0f} Mo) =========")
+    print(f"Publication          : {publish:.2f} s")
+    print(f"Attachement          : {attach * 1000:.1f} ms")
+    print(f"Copie en mémoire     : {copy * 1000:.1f} ms")
+    return {'publish': publish, 'attach': attach, 'copy': copy}
+
+
+def benchmark_parcel_polygons(n_parcels=10000, vertices=200, path=os.path.join(SYNTHETIC_DIR, "parcelles.geojson")):
+    """
+    Taille de la carte Folium avec les contours de `n_parcels` parcelles : pleine
+    résolution contre les versions simplifiées et quantifiées par niveau de zoom.
+    """
+    if not os.path.exists(path):
+        rng = np.random.default_rng(0)
+        soil = pd.DataFrame({
+            'parcelle_id': [f"P{i:05d}" for i in range(1, n_parcels + 1)],
+            'latitude': 33.85 + rng.normal(0, 0.05, n_parcels),
+            'longitude': -5.54 + rng.normal(0, 0.05, n_parcels),
+            'surface_ha': rng.uniform(1, 20, n_parcels),
+        })
+        generate_parcel_polygons(soil, path, vertices=vertices)
+
+    geometry = ParcelGeometry.from_geojson(path)
+    start = time.perf_counter()
+    geometry.precompute()
+    precompute = time.perf_counter() - start
+
+    def html_size(zoom):
+        parcel_map = folium.Map(location=[33.85, -5.54], zoom_start=zoom or 16)
+        folium.GeoJson(geometry.feature_collection(zoom=zoom)).add_to(parcel_map)
+        return len(parcel_map.get_root().render().encode())
+
+    sizes = {'complet': (geometry.vertex_count(), html_size(None))}
+    for zoom in geometry.levels:
+        sizes[f"zoom {zoom}"] = (geometry.vertex_count(zoom), html_size(zoom))
+
+    # Anneaux dégénérés : sommets confondus (inchangé), alignés ou plus petits que la tolérance
+    identical = np.tile([[-5.54, 33.85]], (6, 1))
+    assert np.array_equal(simplify_ring(identical, 1e-3), identical)
+    for ring in (np.column_stack([np.linspace(0, 1, 8), np.zeros(8)]), 1e-6 * np.array([[0, 0], [1, 0], [1, 1], [0, 1], [0, 0.5]])):
+        simplified = simplify_ring(np.vstack([ring, ring[:1]]), 1e-3)
+        assert len(simplified) == 4 and np.array_equal(simplified[0], simplified[-1])
+
+    print(f"========= contours de parcelles ({len(geometry.parcels)} polygones) =========")
+    print(f"Précalcul des niveaux : {precompute:.2f} s")
+    for level, (vertices_count, size) in sizes.items():
+        print(f"{level:<10}: {vertices_count:>9} sommets, carte HTML {size / 1e6:7.2f} Mo")
+    return {'precompute': precompute, 'sizes': sizes}
+
+
+def benchmark_spatial_index(n_parcels=100000, n_queries=1000, viewport=0.02, radius_km=5.0, seed=0):
+    """
+    Requêtes d'emprise et de rayon sur l'index en grille contre un parcours complet des parcelles.
+    Vérifie les requêtes de rayon près des pôles et de l'antiméridien.
+    """
+    rng = np.random.default_rng(seed)
+    ids = np.array([f"P{i:06d}" for i in range(n_parcels)], dtype=object)
+    latitudes = 33.85 + rng.normal(0, 0.3, n_parcels)
+    longitudes = -5.54 + rng.normal(0, 0.3, n_parcels)
+    centers = np.column_stack([33.85 + rng.normal(0, 0.3, n_queries), -5.54 + rng.normal(0, 0.3, n_queries)])
+
+    build = _timeit(lambda: GridIndex(ids, latitudes, longitudes), repeat=1)
+    index = GridIndex(ids, latitudes, longitudes)
+
+    def bbox_queries():
+        for lat, lon in centers:
+            index.query_bbox(lat - viewport, lon - viewport, lat + viewport, lon + viewport)
+
+    def bbox_scans():
+        for lat, lon in centers:
+            ids[(latitudes >= lat - viewport) & (latitudes <= lat + viewport) & (longitudes >= lon - viewport) & (longitudes <= lon + viewport)]
+
+    def radius_queries():
+        for lat, lon in centers:
+            index.query_radius(lat, lon, radius_km)
+
+    def radius_scans():
+        for lat, lon in centers:
+            ids[haversine_km(lat, lon, latitudes, longitudes) <= radius_km]
+
+    timings = {
+        'bbox': _timeit(bbox_queries) / n_queries,
+        'bbox_scan': _timeit(bbox_scans, repeat=1) / n_queries,
+        'radius': _timeit(radius_queries) / n_queries,
+        'radius_scan': _timeit(radius_scans, repeat=1) / n_queries,
+    }
+    found = np.mean([len(index.query_radius(lat, lon, radius_km)[0]) for lat, lon in centers])
+
+    # Points sur tout le globe : grands rayons en haute latitude et à cheval sur l'antiméridien
+    world_latitudes = np.degrees(np.arcsin(rng.uniform(-1, 1, 20000)))
+    world_longitudes = rng.uniform(-180, 180, 20000)
+    world = GridIndex(np.arange(20000), world_latitudes, world_longitudes)
+    for lat, lon, radius in [(70, 10, 2000), (0, 179.5, 500), (-60, -179, 3000), (89, 0, 300)]:
+        expected = np.flatnonzero(haversine_km(lat, lon, world_latitudes, world_longitudes) <= radius)
+        assert set(world.query_radius(lat, lon, radius)[0]) == set(expected), f"radius query misses points around ({lat}, {lon})"
+
+    print(f"========= index spatial ({n_parcels} parcelles, {n_queries} requêtes) =========")
+    print(f"Construction                    : {build * 1000:.1f} ms")
+    print(f"Emprise {2 * viewport:.2f}° (index / parcours) : {timings['bbox'] * 1000:.3f} ms / {timings['bbox_scan'] * 1000:.3f} ms")
+    print(f"Rayon {radius_km:g} km (index / parcours)  : {timings['radius'] * 1000:.3f} ms / {timings['radius_scan'] * 1000:.3f} ms ({found:.0f} parcelles en moyenne)")
+    return {'build': build, **timings}
+
+
+def benchmark_partitioned_loading(data_dir=SYNTHETIC_DIR, n_parcels=1000):
+    """
+    Chargement complet depuis les CSV contre la lecture élaguée des partitions
+    par année et région, pour une saison et pour une saison d'une zone.
+    """
+    _ensure_synthetic_dataset(data_dir, n_parcels)
+    csv_manager = AgriculturalDataManager(data_dir=data_dir)
+    csv_manager.partitions.root = os.path.join(data_dir, "absent")
+
+    manager = AgriculturalDataManager(data_dir=data_dir)
+    partition = _timeit(manager.partition_sources, repeat=1)
+    manager.load_data()
+    year = manager.monitoring_data['date'].dt.year.max()
+    start, end = f"{year}-01-01", f"{year}-12-31"
+    latitude, longitude = manager.soil_data[['latitude', 'longitude']].median()
+    zone = manager.parcels_within(latitude, longitude, 2.0).index.to_numpy()
+
+    def load(target, **query):
+        return lambda: target.load_data(**query)
+
+    timings = {
+        'csv': _timeit(load(csv_manager)),
+        'csv_slice': _timeit(load(csv_manager, start=start, end=end, parcels=zone)),
+        'all': _timeit(load(manager)),
+        'season': _timeit(load(manager, start=start, end=end)),
+        'season_zone': _timeit(load(manager, start=start, end=end, parcels=zone)),
+    }
+    read = len(manager.partitions.partitions('monitoring_data', start, end, zone))
+    total = len(manager.partitions.partitions('monitoring_data'))
+
+    print(f"========= chargement partitionné ({n_parcels} parcelles) =========")
+    print(f"Partitionnement des sources           : {partition:.2f} s")
+    print(f"CSV, tout l'historique                : {timings['csv']:.3f} s")
+    print(f"CSV puis filtre, saison {year} / {len(zone)} parcelles : {timings['csv_slice']:.3f} s")
+    print(f"Partitions, tout l'historique         : {timings['all']:.3f} s")
+    print(f"Partitions, saison {year}               : {timings['season']:.3f} s")
+    print(f"Partitions, saison {year} / {len(zone)} parcelles : {timings['season_zone']:.3f} s ({read}/{total} partitions de suivi lues)")
+    return {'partition': partition, **timings}
+
+
+def benchmark_validation(n_parcels=10000, n_days=1000, n_bad=1000, seed=0):
+    """
+    Validation en une passe d'un relevé de suivi de n_parcels x n_days lignes
+    (avec quelques lignes invalides), comparée au tri et à la copie du même relevé.
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = n_parcels * n_days
+    parcels = np.array([f"P{i:05d}" for i in range(n_parcels)], dtype=object)
+    monitoring = pd.DataFrame({
+        'date': np.tile(pd.date_range("2020-01-01", periods=n_days, freq="D").values, n_parcels),
+        'parcelle_id': np.repeat(parcels, n_days),
+        'latitude': np.repeat(33.85 + rng.normal(0, 0.05, n_parcels), n_days),
+        'longitude': np.repeat(-5.54 + rng.normal(0, 0.05, n_parcels), n_days),
+        'ndvi': rng.uniform(0.1, 0.9, n_rows),
+        'lai': rng.uniform(0.5, 4, n_rows),
+        'stress_hydrique': rng.uniform(0, 0.5, n_rows),
+        'biomasse_estimee': rng.uniform(2, 20, n_rows),
+    })
+    bad = rng.choice(n_rows, n_bad, replace=False)
+    monitoring.loc[bad[: n_bad // 2], 'ndvi'] = 1.5
+    monitoring.loc[bad[n_bad // 2:], 'latitude'] = np.inf
+    soil = pd.DataFrame({'parcelle_id': parcels[1:]})
+
+    frames = {'monitoring_data': monitoring, 'soil_data': soil}
+    rules = {'monitoring_data': VALIDATION_RULES['monitoring_data']}
+    elapsed = _timeit(lambda: validate(frames, rules), repeat=1)
+    _, quarantined, _ = validate(frames, rules)
+    sort = _timeit(lambda: monitoring.sort_values(by=['parcelle_id', 'date'], kind='mergesort'), repeat=1)
+    copy = _timeit(lambda: monitoring.copy(), repeat=1)
+
+    print(f"========= validation ({n_rows} lignes de suivi) =========")
+    print(f"Validation (bornes, doublons, références) : {elapsed:.2f} s, {len(quarantined['monitoring_data'])} lignes en quarantaine")
+    print(f"Tri par (parcelle, date), pour référence  : {sort:.2f} s")
+    print(f"Copie, pour référence                     : {copy:.2f} s")
+    return {'validation': elapsed, 'sort': sort, 'copy': copy}
+
+
+def benchmark_similarity(n_parcels=100000, n_queries=1000, k=5, seed=0):
+    """
+    Recherche des k parcelles au profil le plus proche : index k-NN contre un
+    calcul de toutes les distances pour chaque requête.
+    """
+    rng = np.random.default_rng(seed)
+    columns = SOIL_PROFILE + TREND_PROFILE
+    parcels = np.array([f"P{i:06d}" for i in range(n_parcels)], dtype=object)
+    # Profils corrélés (quelques facteurs latents), comme des sols et rendements réels
+    latent = rng.normal(size=(n_parcels, 3))
+    profiles = pd.DataFrame(latent @ rng.normal(size=(3, len(columns))) + rng.normal(0, 0.3, (n_parcels, len(columns))),
+                            index=pd.Index(parcels, name='parcelle_id'), columns=columns)
+    queries = rng.choice(parcels, n_queries, replace=False)
+
+    build = _timeit(lambda: SimilarityIndex(profiles), repeat=1)
+    index = SimilarityIndex(profiles)
+    single = _timeit(lambda: [index.similar(parcelle_id, k=k) for parcelle_id in queries[:100]]) / 100
+    batch = _timeit(lambda: index.similar(queries, k=k))
+
+    def scan(parcelle_id):
+        target = index.vectors[index.positions.get_loc(parcelle_id)]
+        distances = np.sqrt(((index.vectors - target) ** 2).sum(axis=1))
+        return np.argpartition(distances, k + 1)[:k + 1]
+
+    scan_time = _timeit(lambda: [scan(parcelle_id) for parcelle_id in queries[:100]], repeat=1) / 100
+
+    print(f"========= parcelles similaires ({n_parcels} parcelles, {len(columns)} variables, k={k}) =========")
+    print(f"Construction de l'index          : {build:.2f} s")
+    print(f"Requête unitaire (index / scan)  : {single * 1000:.2f} ms / {scan_time * 1000:.2f} ms")
+    print(f"Lot de {n_queries} requêtes          : {batch:.3f} s ({batch / n_queries * 1000:.3f} ms par parcelle)")
+    return {'build': build, 'single': single, 'scan': scan_time, 'batch': batch}
+
+
+def benchmark_out_of_core_features(data_dir=SYNTHETIC_DIR, n_parcels=1000, memory_budget_mb=256):
+    """
+    Pic mémoire et durée de la préparation complète des caractéristiques en mémoire
+    (pipeline) et par lots de parcelles lus dans les partitions puis écrits dans le
+    stockage en colonnes, à sorties identiques (à l'arrondi des cumuls près) une fois
+    triées par (parcelle, date).
+    """
+    _ensure_synthetic_dataset(data_dir, n_parcels)
+    manager = AgriculturalDataManager(data_dir=data_dir)
+    manager.partition_sources()
+
+    def measure(func):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result, elapsed, peak
+
+    written, out_of_core, out_of_core_peak = measure(lambda: manager.prepare_features_out_of_core(memory_budget_mb=memory_budget_mb))
+
+    # Référence en mémoire, sans reprise du cache du pipeline
+    cache_dir = tempfile.mkdtemp(prefix="cache_", dir=data_dir)
+    reference = AgriculturalDataManager(data_dir=data_dir)
+    features, in_memory, in_memory_peak = measure(lambda: reference.run_pipeline(targets=['features'], cache_dir=cache_dir)['features'])
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    stored = manager.store.read('features').sort_values(by=['parcelle_id', 'date'], kind='mergesort').reset_index(drop=True)
+    # Les cumuls par saison des indicateurs ne diffèrent que par l'arrondi (cumul global moins décalage)
+    try:
+        pd.testing.assert_frame_equal(stored, features, check_exact=False, rtol=1e-9)
+        identical = True
+    except AssertionError:
+        identical = False
+
+    print(f"========= caractéristiques hors mémoire ({written} lignes) =========")
+    print(f"En mémoire                       : {in_memory:.2f} s, pic {in_memory_peak / 1e6:.0f} Mo")
+    print(f"Par lots (budget {memory_budget_mb} Mo)        : {out_of_core:.2f} s, pic {out_of_core_peak / 1e6:.0f} Mo")
+    print(f"Sorties identiques (à 1e-9 près) : {identical}")
+    return {'in_memory': in_memory, 'in_memory_peak': in_memory_peak, 'out_of_core': out_of_core,
+            'out_of_core_peak': out_of_core_peak, 'identical': identical}
+
+
+def benchmark_kernels(n_parcels=10000, rows_per_parcel=365, n_looped=200, seed=0):
+    """
+    Noyaux groupés (moyenne mobile NDVI, comptage de la matrice de stress,
+    régressions par parcelle, moyenne et mode du risque) : chemin compilé par
+    Numba s'il est installé, repli NumPy et équivalent pandas / scikit-learn.
+    Les équivalents qui bouclent sur les parcelles sont mesurés sur `n_looped`
+    parcelles puis extrapolés. Vérifie que les boucles des noyaux (exécutées en
+    Python si Numba est absent) et, s'il est installé, le chemin Numba donnent
+    les résultats du chemin NumPy.
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = n_parcels * rows_per_parcel
+    parcels = np.repeat(np.arange(n_parcels), rows_per_parcel)
+    days = np.tile(np.arange(rows_per_parcel, dtype='float64'), n_parcels) + 737000
+    ndvi = 0.5 + 0.2 * np.sin(days / 58) + rng.normal(0, 0.05, n_rows)
+    ndvi[rng.random(n_rows) < 0.01] = np.nan
+    temperature = rng.normal(15, 8, n_rows)
+    stress = rng.random(n_rows)
+    weights = rng.integers(1, 24, n_rows).astype('float64')
+    codes = rng.integers(0, 4, n_rows)
+    bounds = group_bounds(parcels)
+    frame = pd.DataFrame({'parcelle_id': parcels, 'date': days, 'ndvi': ndvi, 'temperature': temperature,
+                          'stress': stress, 'poids': weights, 'categorie': pd.Categorical.from_codes(codes, ['a', 'b', 'c', 'd'])})
+    looped = frame[frame['parcelle_id'] < n_looped]
+    scale = n_parcels / n_looped
+
+    def binned_pandas():
+        binned = frame.assign(temp_bin=(frame['temperature'] // 5) * 5, stress_bin=(frame['stress'] // 0.1) * 0.1)
+        return binned.groupby(['parcelle_id', 'temp_bin', 'stress_bin'])['poids'].sum()
+
+    def trends_sklearn():
+        for _, group in looped.dropna().groupby('parcelle_id'):
+            LinearRegression().fit(group[['date']].to_numpy(), group['ndvi'].to_numpy())
+
+    def mode_pandas():
+        looped.groupby('parcelle_id').agg(moyenne=('ndvi', 'mean'), mode=('categorie', lambda x: x.mode()[0] if not x.mode().empty else None))
+
+    kernels = {
+        'Moyenne mobile (30 points)': (
+            lambda engine: grouped_rolling_mean(ndvi, bounds, 30, engine=engine),
+            lambda: frame.groupby('parcelle_id')['ndvi'].rolling(30).mean(), 1),
+        'Matrice de stress': (
+            lambda engine: binned_counts(parcels, temperature, stress, weights, 5, 0.1, engine=engine),
+            binned_pandas, 1),
+        'Régressions par parcelle': (
+            lambda engine: grouped_linear_trend(days, ndvi, bounds, engine=engine),
+            trends_sklearn, scale),
+        'Moyenne et mode': (
+            lambda engine: grouped_mean_mode(ndvi, codes, bounds, 4, engine=engine),
+            mode_pandas, scale),
+    }
+
+    def same_outputs(left, right):
+        left, right = (left, right) if isinstance(left, tuple) else ((left,), (right,))
+        return all(np.allclose(a, b, equal_nan=True) for a, b in zip(left, right))
+
+    # Boucles des noyaux (en Python pur si Numba est absent) contre la version NumPy, sur un extrait
+    sample = bounds[:51]
+    rows = slice(0, int(sample[-1]))
+    loops = {
+        'Moyenne mobile (30 points)': (kernels_module._rolling_mean_loop(ndvi[rows], sample, 30), grouped_rolling_mean(ndvi[rows], sample, 30, engine='numpy')),
+        'Régressions par parcelle': (kernels_module._linear_trend_loop(days[rows], ndvi[rows], sample), grouped_linear_trend(days[rows], ndvi[rows], sample, engine='numpy')),
+        'Moyenne et mode': (kernels_module._mean_mode_loop(ndvi[rows], codes[rows], sample, 4), grouped_mean_mode(ndvi[rows], codes[rows], sample, 4, engine='numpy')),
+    }
+    for name, (looped_result, numpy_result) in loops.items():
+        assert same_outputs(looped_result, numpy_result), f"{name}: loop and NumPy results differ"
+
+    print(f"========= noyaux groupés ({n_parcels} parcelles, {n_rows} lignes, Numba {'disponible' if NUMBA_AVAILABLE else 'absent'}) =========")
+    results = {}
+    for name, (kernel, baseline, factor) in kernels.items():
+        timings = {'numpy': _timeit(lambda: kernel('numpy'))}
+        if NUMBA_AVAILABLE:
+            # Première exécution (compilation) comparée au chemin NumPy
+            assert same_outputs(kernel('numba'), kernel('numpy')), f"{name}: Numba and NumPy results differ"
+            timings['numba'] = _timeit(lambda: kernel('numba'))
+        timings['pandas'] = _timeit(baseline, repeat=1) * factor
+        compiled = f"Numba {timings['numba']:.3f} s / " if NUMBA_AVAILABLE else ""
+        print(f"{name:<33}: {compiled}NumPy {timings['numpy']:.3f} s / pandas {timings['pandas']:.2f} s")
+        results[name] = timings
+    return results
+
+
+BENCHMARKS = {
+    'loading': benchmark_loading,
+    'daily_aggregation': benchmark_daily_aggregation,
+    'gap_filling': benchmark_gap_filling,
+    'agro_indicators': benchmark_agro_indicators,
+    'yield_prediction': benchmark_yield_prediction,
+    'season_curves': benchmark_season_curves,
+    'ndvi_anomalies': benchmark_ndvi_anomalies,
+    'weather_correlations': benchmark_weather_correlations,
+    'snapshot': benchmark_snapshot,
+    'parcel_polygons': benchmark_parcel_polygons,
+    'spatial_index': benchmark_spatial_index,
+    'partitioned_loading': benchmark_partitioned_loading,
+    'validation': benchmark_validation,
+    'similarity': benchmark_similarity,
+    'out_of_core_features': benchmark_out_of_core_features,
+    'kernels': benchmark_kernels,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mesures de performance du pipeline agricole.")
+    parser.add_argument("benchmarks", nargs="*", choices=sorted(BENCHMARKS), default=sorted(BENCHMARKS))
+    args = parser.parse_args()
+
+    for name in args.benchmarks:
+        BENCHMARKS[name]()
@@ -0,0 +1,177 @@
+import os
+import shutil
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+class ColumnarStore:
+    """
+    Stockage en colonnes (Parquet) des tables dérivées du pipeline.
+
+    Chaque table est un fichier `<nom>.parquet` du répertoire `root`, ou, si elle
+    est partitionnée, un répertoire `<nom>/` d'un fichier `<partition>.parquet`
+    par partition. Les lectures ne chargent que les colonnes demandées et
+    appliquent les filtres sur les groupes de lignes ; les écritures passent par
+    un fichier temporaire remplacé atomiquement.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, name):
+        return os.path.join(self.root, f"{name}.parquet")
+
+    def partition_path(self, name, label):
+        return os.path.join(self.root, name, f"{label}.parquet")
+
+    def _location(self, name):
+        """
+        Chemin de la table `name` (fichier ou répertoire partitionné), ou None si elle n'existe pas.
+        """
+        directory = os.path.join(self.root, name)
+        if os.path.isdir(directory):
+            return directory
+        return self.path(name) if os.path.exists(self.path(name)) else None
+
+    def exists(self, name):
+        return self._location(name) is not None
+
+    def is_partitioned(self, name):
+        return os.path.isdir(os.path.join(self.root, name))
+
+    def columns(self, name):
+        """
+        Noms des colonnes de la table `name`, lus dans le schéma sans charger les données.
+        """
+        return ds.dataset(self._location(name), format="parquet").schema.names
+
+    @staticmethod
+    def _table(frame):
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        # Une colonne d'objets entièrement vide est typée comme du texte
+        return table.cast(pa.schema([
+            field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in table.schema
+        ], metadata=table.schema.metadata))
+
+    def _write_file(self, path, frame, row_group_size=100_000):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+        pq.write_table(self._table(frame), tmp_path, row_group_size=row_group_size)
+        os.replace(tmp_path, path)
+
+    def write(self, name, frame, row_group_size=100_000, partition=None):
+        """
+        Remplace la table `name` par `frame`. Avec `partition` (fonction qui associe
+        à chaque ligne d'un DataFrame son étiquette de partition, d'après ses seules
+        colonnes de clé), la table est écrite en un fichier par partition.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        if partition is None:
+            self._write_file(self.path(name), frame, row_group_size)
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+            return
+
+        # Nouveau répertoire complet, puis échange avec l'ancien
+        directory = os.path.join(self.root, name)
+        tmp_directory = os.path.join(self.root, f".{name}.tmp")
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+        labels = np.asarray(partition(frame))
+        for label in np.unique(labels):
+            pq.write_table(
+                self._table(frame[labels == label]), os.path.join(tmp_directory, f"{label}.parquet"),
+                row_group_size=row_group_size,
+            )
+        old_directory = os.path.join(self.root, f".{name}.old")
+        shutil.rmtree(old_directory, ignore_errors=True)
+        if os.path.isdir(directory):
+            os.rename(directory, old_directory)
+        os.rename(tmp_directory, directory)
+        shutil.rmtree(old_directory, ignore_errors=True)
+        if os.path.exists(self.path(name)):
+            os.remove(self.path(name))
+
+    @contextmanager
+    def appender(self, name, row_group_size=100_000):
+        """
+        Écrit la table `name` par lots : le contexte fournit une fonction `append(frame)`
+        qui ajoute les lignes au fichier temporaire, sans garder les lots en mémoire.
+        La table n'est remplacée qu'à la sortie du contexte, sans erreur.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.path(name)}.tmp"
+        state = {'writer': None}
+
+        def append(frame):
+            if state['writer'] is None:
+                state['writer'] = pq.ParquetWriter(tmp_path, self._table(frame).schema)
+            table = pa.Table.from_pandas(frame, schema=state['writer'].schema, preserve_index=False)
+            state['writer'].write_table(table, row_group_size=row_group_size)
+
+        try:
+            yield append
+            if state['writer'] is None:
+                raise ValueError(f"No rows written to table '{name}'.")
+            state['writer'].close()
+            os.replace(tmp_path, self.path(name))
+        finally:
+            if state['writer'] is not None and os.path.exists(tmp_path):
+                state['writer'].close()
+                os.remove(tmp_path)
+
+    def read(self, name, columns=None, filters=None):
+        """
+        Lit la table `name` (colonnes et filtres au format pyarrow, par exemple
+        [('date', '>=', start)]). Retourne un DataFrame vide si la table n'existe pas.
+        """
+        location = self._location(name)
+        if location is None:
+            return pd.DataFrame(columns=columns)
+        return pq.read_table(location, columns=columns, filters=filters).to_pandas()
+
+    def upsert(self, name, frame, keys, remove=None, partition=None):
+        """
+        Insère ou remplace dans la table `name` les lignes de `frame` identifiées
+        par les colonnes `keys`. Les lignes dont les clés figurent dans `remove`
+        sont supprimées. Pour une table partitionnée par `partition` (voir `write`),
+        seuls les fichiers des partitions touchées sont relus et réécrits.
+        """
+        if not self.exists(name):
+            self.write(name, frame, partition=partition)
+            return
+        if partition is None or not self.is_partitioned(name):
+            existing = self.read(name)
+            combined = self._replace_rows(existing, frame, keys, remove)
+            self.write(name, combined, partition=partition)
+            return
+
+        labels = np.asarray(partition(frame))
+        removed_labels = np.asarray(partition(remove)) if remove is not None and len(remove) else np.array([], dtype=labels.dtype)
+        for label in np.unique(np.concatenate([labels, removed_labels])):
+            path = self.partition_path(name, label)
+            existing = pq.read_table(path).to_pandas() if os.path.exists(path) else frame.iloc[:0]
+            part_remove = remove[removed_labels == label] if len(removed_labels) else None
+            combined = self._replace_rows(existing, frame[labels == label], keys, part_remove)
+            if combined.empty:
+                if os.path.exists(path):
+                    os.remove(path)
+            else:
+                self._write_file(path, combined)
+
+    @staticmethod
+    def _replace_rows(existing, frame, keys, remove=None):
+        """
+        Lignes de `existing` dont les clés ne figurent ni dans `frame` ni dans `remove`,
+        complétées par `frame` et triées par clés.
+        """
+        existing_keys = pd.MultiIndex.from_frame(existing[keys])
+        replaced = existing_keys.isin(pd.MultiIndex.from_frame(frame[keys]))
+        if remove is not None and len(remove):
+            replaced |= existing_keys.isin(pd.MultiIndex.from_frame(remove[keys]))
+        combined = pd.concat([existing[~replaced], frame], ignore_index=True)
+        return combined.sort_values(by=keys, kind='mergesort').reset_index(drop=True)
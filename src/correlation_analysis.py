@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import scipy.fft as sp_fft
+
+
+# Variables météo journalières comparées par défaut (les absentes sont ignorées)
+WEATHER_VARIABLES = [
+    'temperature', 'temperature_min', 'temperature_max', 'humidite', 'precipitation',
+    'rayonnement_solaire', 'vitesse_vent', 'et0',
+]
+
+
+def daily_panel(features, columns, parcels=None):
+    """
+    Range les colonnes demandées dans un tableau dense (parcelles, variables, jours),
+    complété par des NaN pour les jours non observés.
+    """
+    data = features if parcels is None else features[features['parcelle_id'].isin(parcels)]
+    parcel_codes, parcel_ids = pd.factorize(data['parcelle_id'], sort=True)
+    dates = data['date'].dt.normalize()
+    start = dates.min()
+    days = ((dates - start) // pd.Timedelta(days=1)).to_numpy()
+    n_days = int(days.max()) + 1 if len(days) else 0
+
+    panel = np.full((len(parcel_ids), len(columns), n_days), np.nan)
+    for j, column in enumerate(columns):
+        panel[parcel_codes, j, days] = data[column].to_numpy(dtype=float)
+    return panel, np.asarray(parcel_ids, dtype=object), pd.date_range(start, periods=n_days, freq='D')
+
+
+def _cross_sums(spectrum_a, spectrum_b, n_fft, max_lag):
+    """
+    Sommes décalées sum_t a[..., t] * b[..., t + k] pour k = 0..max_lag, à partir
+    des transformées de Fourier de a et b.
+    """
+    return sp_fft.irfft(np.conj(spectrum_a) * spectrum_b, n_fft, axis=-1)[..., :max_lag + 1]
+
+
+def lagged_cross_correlation(weather, target, max_lag=60, min_periods=10, chunk_size=256):
+    """
+    Corrélation de Pearson entre chaque variable météo au jour t et la cible
+    (NDVI, rendement) au jour t + k, pour k = 0..max_lag.
+
+    `weather` est de forme (parcelles, variables, jours) et `target` de forme
+    (parcelles, jours) ; les NaN sont exclus paire par paire. Les sommes décalées
+    nécessaires sont toutes calculées par FFT, par blocs de parcelles.
+    Retourne un tableau (parcelles, variables, max_lag + 1).
+    """
+    n_parcels, n_variables, n_days = weather.shape
+    n_fft = sp_fft.next_fast_len(n_days + max_lag, real=True)
+    correlations = np.full((n_parcels, n_variables, max_lag + 1), np.nan)
+
+    for start in range(0, n_parcels, chunk_size):
+        x = weather[start:start + chunk_size]
+        y = target[start:start + chunk_size, None, :]
+        mask_x, mask_y = ~np.isnan(x), ~np.isnan(y)
+
+        # Centrage préalable pour limiter les pertes de précision
+        with np.errstate(invalid='ignore'):
+            x = np.where(mask_x, x - np.nanmean(x, axis=-1, keepdims=True), 0.0)
+            y = np.where(mask_y, y - np.nanmean(y, axis=-1, keepdims=True), 0.0)
+
+        # Chaque série n'est transformée qu'une fois pour les six sommes décalées
+        fft = lambda a: sp_fft.rfft(a, n_fft, axis=-1)
+        f_mask_x, f_x, f_xx = fft(mask_x.astype(float)), fft(x), fft(x ** 2)
+        f_mask_y, f_y, f_yy = fft(mask_y.astype(float)), fft(y), fft(y ** 2)
+
+        count = np.rint(_cross_sums(f_mask_x, f_mask_y, n_fft, max_lag))
+        sum_x = _cross_sums(f_x, f_mask_y, n_fft, max_lag)
+        sum_y = _cross_sums(f_mask_x, f_y, n_fft, max_lag)
+        sum_xx = _cross_sums(f_xx, f_mask_y, n_fft, max_lag)
+        sum_yy = _cross_sums(f_mask_x, f_yy, n_fft, max_lag)
+        sum_xy = _cross_sums(f_x, f_y, n_fft, max_lag)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            covariance = count * sum_xy - sum_x * sum_y
+            variance_x = count * sum_xx - sum_x ** 2
+            variance_y = count * sum_yy - sum_y ** 2
+            r = covariance / np.sqrt(variance_x * variance_y)
+        valid = (count >= min_periods) & (variance_x > 1e-12 * count ** 2) & (variance_y > 1e-12 * count ** 2)
+        correlations[start:start + chunk_size] = np.where(valid, np.clip(r, -1, 1), np.nan)
+
+    return correlations
+
+
+def strongest_lags(correlations, parcels, variables):
+    """
+    Pour chaque (parcelle, variable), décalage de corrélation absolue maximale.
+    """
+    filled = np.where(np.isnan(correlations), -np.inf, np.abs(correlations))
+    best = filled.argmax(axis=-1)
+    values = np.take_along_axis(correlations, best[..., None], axis=-1)[..., 0]
+    return pd.DataFrame({
+        'parcelle_id': np.repeat(parcels, len(variables)),
+        'variable': np.tile(variables, len(parcels)),
+        'decalage_jours': best.ravel(),
+        'correlation': values.ravel(),
+    })
@@ -4,19 +4,25 @@ import pandas as pd
 
 from bokeh.models import ColumnDataSource, Select, CustomJS, Span, HoverTool, ColorBar, LinearColorMapper, BasicTicker
 from bokeh.plotting import figure, show
-from data_manager import AgriculturalDataManager
+from data_manager import AgriculturalDataManager, RISK_THRESHOLDS
+from kernels import binned_counts
 from bokeh.palettes import RdYlBu11 as palette
 
 class AgriculturalDashboard:
-    def __init__(self, data_manager):
+    def __init__(self, data_manager, start=None, end=None):
         """
         Initialize the AgriculturalDashboard class.
+        Only the [start, end] window is fetched from the data manager.
         """
         self.data_manager = data_manager
+        self.start = start
+        self.end = end
         self.full_yield_source = None
         self.full_ndvi_source = None
         self.yield_source = None
         self.ndvi_source = None
+        self.full_risk_source = None
+        self.risk_source = None
         self.create_data_sources()
 
 
@@ -25,20 +31,41 @@ class AgriculturalDashboard:
         Prepare data sources using the AgriculturalDataManager.
         """
         try:
-            self.data_manager.load_data()
-            self.features_data = self.data_manager.prepare_features()
-
-            # Prepare yield and NDVI data
-            yield_data = self.features_data[['parcelle_id', 'date', 'rendement_estime']].dropna()
-            ndvi_data = self.features_data[['parcelle_id', 'date', 'ndvi']].dropna()
+            # Reuse data already held by the manager (e.g. an attached shared snapshot)
+            if self.data_manager.features is None:
+                self.data_manager.run_pipeline(targets=['features'])
+            self.features_data = self.data_manager.query(start=self.start, end=self.end)
+
+            # Prepare yield and NDVI data for the displayed window
+            yield_data = self.data_manager.query(
+                start=self.start, end=self.end, columns=['parcelle_id', 'date', 'rendement_estime']
+            ).dropna()
+
+            # Server-side predictions, shipped precomputed to the prediction plot
+            predictions = self.data_manager.predict_yields()
+            yield_data['predicted_yield'] = predictions.loc[yield_data.index] if predictions is not None else np.nan
+
+            # Time-resolved risk series for the displayed window: read from the published
+            # artifact, computed (and published) by the pipeline only if it never was
+            if self.data_manager.risk_timeline is None and self.data_manager.load_risk_timeline() is None:
+                self.data_manager.run_pipeline(targets=['risk_timeline'])
+            risk_data = self.data_manager.query(
+                start=self.start, end=self.end, columns=['parcelle_id', 'date', 'risk_index'], dataset='risk'
+            ).dropna()
+
+            # NDVI served from the materialized rollup at the resolution matching the window
+            ndvi_data = self.data_manager.get_rollup(start=self.start, end=self.end, metrics=['ndvi'])
+            ndvi_data = ndvi_data.rename(columns={'debut_periode': 'date'})[['parcelle_id', 'date', 'ndvi']].dropna()
 
             # Full sources
             self.full_yield_source = ColumnDataSource(yield_data)
             self.full_ndvi_source = ColumnDataSource(ndvi_data)
+            self.full_risk_source = ColumnDataSource(risk_data)
 
             # Dynamic sources (initially empty)
             self.yield_source = ColumnDataSource(data={key: [] for key in yield_data.columns})
             self.ndvi_source = ColumnDataSource(data={key: [] for key in ndvi_data.columns})
+            self.risk_source = ColumnDataSource(data={key: [] for key in risk_data.columns})
 
             print("Data sources successfully prepared.")
         except Exception as e:
@@ -179,21 +206,26 @@ class AgriculturalDashboard:
         Crée une matrice de stress combinant stress hydrique et conditions météorologiques.
         """
         try:
-            # Vérification et préparation des colonnes nécessaires
-            if 'temperature' not in self.features_data.columns or 'stress_hydrique' not in self.features_data.columns:
+            # Agrégats journaliers de la fenêtre affichée
+            daily = self.data_manager.get_rollup(
+                'day', start=self.start, end=self.end, metrics=['temperature', 'stress_hydrique']
+            )
+            if daily is None or 'temperature' not in daily.columns or 'stress_hydrique' not in daily.columns:
                 print("Les colonnes 'temperature' et 'stress_hydrique' sont nécessaires pour la matrice de stress.")
                 return None
 
-            # Calcul des bins pour la température et le stress hydrique
-            self.features_data['temp_bin'] = (self.features_data['temperature'] // 5) * 5  # Bins de 5°C
-            self.features_data['stress_bin'] = (self.features_data['stress_hydrique'] // 0.1) * 0.1  # Bins de 0.1 pour le stress hydrique
-
-            # Compter les occurrences pour chaque combinaison de bins
-            stress_matrix = (
-                self.features_data.groupby(['parcelle_id', 'temp_bin', 'stress_bin'])
-                .size()
-                .reset_index(name='count')
+            # Compter les jours par parcelle et combinaison de bins de 5°C de température
+            # et de 0.1 de stress hydrique, en une passe sur des codes de parcelle entiers
+            codes, parcels = pd.factorize(daily['parcelle_id'], sort=True)
+            groups, temp_bins, stress_bins, counts = binned_counts(
+                codes, daily['temperature'], daily['stress_hydrique'], daily['nb_lignes'], 5, 0.1
             )
+            stress_matrix = pd.DataFrame({
+                'parcelle_id': np.asarray(parcels, dtype=object)[groups],
+                'temp_bin': temp_bins,
+                'stress_bin': stress_bins,
+                'count': counts.astype(daily['nb_lignes'].dtype),
+            })
 
             # Normaliser les densités
             max_count = stress_matrix['count'].max()
@@ -283,6 +315,69 @@ class AgriculturalDashboard:
             print(f"Erreur lors de la création de la matrice de stress : {e}")
             return None
 
+    def create_risk_timeline_plot(self, select_widget):
+        """
+        Create a plot showing the time-resolved risk index of the selected parcel.
+        """
+        try:
+            p = figure(
+                title="Risk Index Over Time",
+                x_axis_type="datetime",
+                height=400,
+                tools="pan,wheel_zoom,box_zoom,reset,save",
+                x_axis_label="Date",
+                y_axis_label="Risk Index"
+            )
+            p.line(
+                x='date',
+                y='risk_index',
+                source=self.risk_source,
+                line_width=2,
+                color="firebrick",
+                legend_label="Risk Index"
+            )
+            p.add_tools(HoverTool(
+                tooltips=[("Parcel", "@parcelle_id"), ("Date", "@date{%F}"), ("Risk", "@risk_index{0.2f}")],
+                formatters={"@date": "datetime"},
+                mode="vline"
+            ))
+            p.legend.location = "top_left"
+
+            # Category thresholds
+            for threshold in RISK_THRESHOLDS:
+                p.add_layout(Span(location=threshold, dimension='width', line_color='gray', line_dash='dashed', line_width=1))
+
+            # Callback to update data dynamically
+            callback = CustomJS(
+                args=dict(source=self.risk_source, full_source=self.full_risk_source, select=select_widget),
+                code="""
+                const full_data = full_source.data;
+                const filtered = source.data;
+                const selected_parcel = select.value;
+
+                // Reset filtered data
+                for (let key in filtered) {
+                    filtered[key] = [];
+                }
+
+                // Filter data by selected parcel
+                for (let i = 0; i < full_data['parcelle_id'].length; i++) {
+                    if (full_data['parcelle_id'][i] === selected_parcel) {
+                        for (let key in filtered) {
+                            filtered[key].push(full_data[key][i]);
+                        }
+                    }
+                }
+                source.change.emit();
+                """
+            )
+            select_widget.js_on_change("value", callback)
+
+            return p
+        except Exception as e:
+            print(f"Error creating risk timeline plot: {e}")
+            return None
+
     def create_layout(self):
         """
         Organize the layout with plots and widgets.
@@ -302,6 +397,7 @@ class AgriculturalDashboard:
             ndvi_plot = self.create_ndvi_temporal_plot(select_widget)
             stress_plot = self.create_stress_matrix(select_widget)
             yield_prediction_plot = self.create_yield_prediction_plot(select_widget)
+            risk_timeline_plot = self.create_risk_timeline_plot(select_widget)
 
             # Validate that all plots are generated
             if not yield_plot or not ndvi_plot or not stress_plot:
@@ -311,9 +407,10 @@ class AgriculturalDashboard:
             # Organize plots into rows, with two plots per row
             row1 = row(yield_plot, ndvi_plot)  # First row with two plots
             row2 = row(stress_plot, yield_prediction_plot)  # Second row (add more plots here if needed)
+            row3 = row(risk_timeline_plot)
 
             # Combine rows into a column
-            layout = column(select_widget, row1, row2)
+            layout = column(select_widget, row1, row2, row3)
 
             return layout
         except Exception as e:
@@ -323,6 +420,7 @@ class AgriculturalDashboard:
     def create_yield_prediction_plot(self, select_widget):
         """
         Crée un graphique de prédiction des rendements basé sur les données historiques et actuelles.
+        Les prédictions sont calculées côté serveur par le gestionnaire de données.
         """
         try:
             # Initialize the plot
@@ -390,10 +488,7 @@ class AgriculturalDashboard:
                     if (full_data['parcelle_id'][i] === selected_parcel) {
                         filtered["date"].push(full_data["date"][i]);
                         filtered["actual_yield"].push(full_data["rendement_estime"][i]);
-
-                        // Generate predicted yield with a simple linear trend approximation
-                        const prediction = full_data["rendement_estime"][i] * (1 + 0.05 * (Math.random() - 0.5));
-                        filtered["predicted_yield"].push(prediction);
+                        filtered["predicted_yield"].push(full_data["predicted_yield"][i]);
                     }
                 }
 
@@ -425,7 +520,7 @@ class AgriculturalDashboard:
 
 if __name__ == "__main__":
     data_manager = AgriculturalDataManager()
-    data_manager.load_data()
+    data_manager.run_pipeline(targets=['features'])
     dashboard = AgriculturalDashboard(data_manager)
     layout = dashboard.create_layout()
     if layout:
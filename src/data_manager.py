@@ -1,126 +1,1042 @@
+import os
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 import warnings
 
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from sklearn.preprocessing import StandardScaler
 from statsmodels.tsa.seasonal import seasonal_decompose
-from sklearn.linear_model import LinearRegression
+from weather_aggregation import aggregate_hourly_to_daily
+from agro_indicators import AgroClimaticIndicators
+from risk_timeline import RollingRiskIndex
+from yield_model import YieldPredictor, training_columns
+from season_curves import fit_season_curves
+from ndvi_anomaly import NDVIAnomalyDetector
+from correlation_analysis import WEATHER_VARIABLES, daily_panel, lagged_cross_correlation, strongest_lags
+from columnar_store import ColumnarStore
+from rollups import RollupStore, resolution_for_span
+from shared_snapshot import publish_snapshot, attach_snapshot, latest_version
+from artifacts import ArtifactStore
+from hashing import data_version
+from gap_filling import fill_gaps
+from pipeline import Pipeline, Stage, RETURN_VALUE
+from parcel_geometry import ParcelGeometry, ZOOM_LEVELS
+from spatial_index import GridIndex
+from partitioned_store import PartitionedStore, parcel_region, spatial_regions
+from validation import validate, write_quarantine
+from similarity import SimilarityIndex, parcel_profiles
+from kernels import group_bounds, grouped_linear_trend, grouped_mean_mode, grouped_rolling_mean
 
 warnings.filterwarnings("ignore")
 
+
+# Schéma explicite de chaque source : fichier, types des colonnes et format des dates.
+# Les types sont imposés au parseur pour éviter toute inférence au chargement.
+DATASET_SCHEMAS = {
+    'monitoring_data': {
+        'file': 'monitoring_cultures.csv',
+        'dtype': {
+            'date': 'timestamp[ns]', 'parcelle_id': 'str', 'latitude': 'float64', 'longitude': 'float64',
+            'culture': 'str', 'ndvi': 'float64', 'lai': 'float64',
+            'stress_hydrique': 'float64', 'biomasse_estimee': 'float64',
+        },
+        'date_format': '%Y-%m-%d',
+    },
+    'weather_data': {
+        'file': 'meteo_detaillee.csv',
+        'dtype': {
+            'date': 'timestamp[ns]', 'temperature': 'float64', 'humidite': 'float64', 'precipitation': 'float64',
+            'rayonnement_solaire': 'float64', 'vitesse_vent': 'float64', 'direction_vent': 'float64',
+        },
+        'date_format': '%Y-%m-%d %H:%M:%S',
+    },
+    'soil_data': {
+        'file': 'sols.csv',
+        'dtype': {
+            'parcelle_id': 'str', 'latitude': 'float64', 'longitude': 'float64', 'type_sol': 'str',
+            'surface_ha': 'float64', 'capacite_retention_eau': 'float64', 'ph': 'float64',
+            'matiere_organique': 'float64', 'azote': 'float64', 'phosphore': 'float64', 'potassium': 'float64',
+        },
+        'date_format': None,
+    },
+    'yield_history': {
+        'file': 'historique_rendements.csv',
+        'dtype': {
+            'parcelle_id': 'str', 'date': 'timestamp[ns]', 'culture': 'str', 'rendement_estime': 'float64',
+            'rendement_final': 'float64', 'progression': 'float64',
+        },
+        'date_format': '%Y-%m-%d',
+    },
+}
+
+
+# Comblement des trous avant la préparation des caractéristiques : colonnes interpolées,
+# pas de la grille, longueur maximale d'un trou (en relevés), colonne du masque de qualité
+# et colonnes d'identité recopiées dans les lignes réinsérées (les autres y restent vides).
+# Les précipitations ne sont pas interpolées : une heure manquante reste manquante.
+GAP_FILLING = {
+    'monitoring_data': {
+        'columns': ['ndvi', 'lai', 'stress_hydrique', 'biomasse_estimee'],
+        'group': 'parcelle_id', 'freq': 'D', 'max_gap': 7, 'seasonal': None, 'mask_column': 'qualite',
+        'carry': ['culture', 'latitude', 'longitude'],
+    },
+    'weather_data': {
+        'columns': ['temperature', 'humidite', 'rayonnement_solaire', 'vitesse_vent'],
+        'group': None, 'freq': 'h', 'max_gap': 6, 'seasonal': 'hour', 'mask_column': 'qualite_meteo',
+        'carry': [],
+    },
+    'yield_history': {
+        'columns': ['rendement_estime', 'progression'],
+        'group': 'parcelle_id', 'freq': None, 'max_gap': 2, 'seasonal': None, 'mask_column': 'qualite_rendement',
+        'carry': ['culture'],
+    },
+}
+
+
+# Règles de validation des sources, appliquées après le nettoyage : colonnes obligatoires,
+# bornes inclusives (None : borne ouverte), clés uniques et références vers le jeu des sols.
+# Les types attendus sont ceux de DATASET_SCHEMAS. Les lignes rejetées vont en quarantaine.
+VALIDATION_RULES = {
+    'monitoring_data': {
+        'required': ['parcelle_id', 'date', 'latitude', 'longitude'],
+        'ranges': {
+            'latitude': (-90, 90), 'longitude': (-180, 180), 'ndvi': (-1, 1), 'lai': (0, 15),
+            'stress_hydrique': (0, 1), 'biomasse_estimee': (0, None),
+        },
+        'unique': ['parcelle_id', 'date'],
+        'references': {'parcelle_id': ('soil_data', 'parcelle_id')},
+    },
+    'weather_data': {
+        'required': ['date'],
+        'ranges': {
+            'temperature': (-60, 60), 'humidite': (0, 100), 'precipitation': (0, 500),
+            'rayonnement_solaire': (0, 1400), 'vitesse_vent': (0, 150), 'direction_vent': (0, 360),
+        },
+        'unique': ['date'],
+    },
+    'soil_data': {
+        'required': ['parcelle_id', 'latitude', 'longitude'],
+        'ranges': {
+            'latitude': (-90, 90), 'longitude': (-180, 180), 'surface_ha': (0, None),
+            'capacite_retention_eau': (0, 1), 'ph': (0, 14), 'matiere_organique': (0, 100),
+            'azote': (0, None), 'phosphore': (0, None), 'potassium': (0, None),
+        },
+        'unique': ['parcelle_id'],
+    },
+    'yield_history': {
+        'required': ['parcelle_id', 'date'],
+        'ranges': {'rendement_estime': (0, 30), 'rendement_final': (0, 30), 'progression': (0, 100)},
+        'unique': ['parcelle_id', 'date'],
+        'references': {'parcelle_id': ('soil_data', 'parcelle_id')},
+    },
+}
+
+
+# Préparation hors mémoire : pic mémoire de la jointure d'un lot, en multiple de la taille du lot joint
+OUT_OF_CORE_PEAK_FACTOR = 5
+
+
+# Indice de risque : variables normalisées, pondérations et seuils des catégories
+RISK_FEATURES = ['rendement_estime', 'ph', 'matiere_organique']
+RISK_WEIGHTS = [0.5, 0.3, 0.2]
+RISK_THRESHOLDS = [-1, 0, 1]
+RISK_LABELS = ['Très Bas', 'Bas', 'Modéré', 'Élevé']
+
+
+def typed_validation_rules(rules):
+    """
+    Règles de validation complétées des types attendus, tirés de DATASET_SCHEMAS.
+    """
+    return {
+        attribute: {
+            'types': {
+                column: 'datetime64' if dtype.startswith('timestamp') else dtype
+                for column, dtype in DATASET_SCHEMAS[attribute]['dtype'].items() if dtype != 'str'
+            },
+            **dataset_rules,
+        }
+        for attribute, dataset_rules in rules.items()
+    }
+
+
+def read_dataset(path, schema):
+    """
+    Lit un fichier CSV source avec le lecteur pyarrow (multi-thread, libère le GIL)
+    en appliquant les types et le format de date déclarés dans son schéma.
+    """
+    convert_options = pa_csv.ConvertOptions(
+        column_types={column: pa.type_for_alias(dtype) for column, dtype in schema['dtype'].items()},
+        timestamp_parsers=[schema['date_format']] if schema['date_format'] else None,
+    )
+    return pa_csv.read_csv(path, convert_options=convert_options).to_pandas()
+
+
 class AgriculturalDataManager:
 
-    def __init__(self):
+    # Jeux de données indexés par (parcelle_id, date) et attribut correspondant
+    INDEXED_DATASETS = {
+        'monitoring': 'monitoring_data',
+        'weather': 'weather_data',
+        'yield': 'yield_history',
+        'features': 'features',
+        'risk': 'risk_timeline',
+        'indicators': 'indicators',
+    }
+
+    # Sorties du pipeline reprises par le gestionnaire (nom logique -> attribut)
+    PIPELINE_DATASETS = {
+        'monitoring': 'monitoring_data',
+        'weather_daily': 'weather_data',
+        'soil': 'soil_data',
+        'yield': 'yield_history',
+        'indicators': 'indicators',
+        'features': 'features',
+        'risk_timeline': 'risk_timeline',
+        'risk_state': 'risk_engine',
+    }
+
+    # Jeux de données publiés dans les instantanés partagés
+    SNAPSHOT_DATASETS = ['monitoring_data', 'weather_data', 'soil_data', 'yield_history', 'features', 'risk_timeline']
+
+    def __init__(self, data_dir="../data", raise_errors=False):
+        self.data_dir = data_dir
+        # Dans le pipeline, une étape en échec lève son exception au lieu d'être mise en cache
+        self.raise_errors = raise_errors
         self.monitoring_data = None
         self.weather_data = None
         self.soil_data = None
         self.yield_history = None
         self.scalar = StandardScaler()
         self.data = None 
-
-
-    def load_data(self):
+        self.features = None
+        self.hourly_weather_data = None
+        self.indicator_engine = None
+        self.indicators = None
+        self.risk_engine = None
+        self.risk_timeline = None
+        self.yield_predictor = None
+        self.ndvi_detector = None
+        self.store = ColumnarStore(os.path.join(data_dir, "store"))
+        self.rollups = None
+        self.snapshot_version = None
+        self.artifacts = ArtifactStore(os.path.join(data_dir, "artifacts"))
+        self.partitions = PartitionedStore(os.path.join(data_dir, "partitions"))
+        self.artifact_versions = {}
+        # Baux pris sur les versions d'artefacts retenues (nom -> jeton)
+        self._artifact_pins = {}
+        self.gaps_filled = False
+        self.pipeline = None
+        self.geometry = None
+        self.spatial_index = None
+        self._spatial_source = None
+        self.similarity_index = None
+        self._similarity_source = None
+        self._indices = {}
+
+
+    def load_data(self, parallel=True, start=None, end=None, parcels=None):
+        """
+        Charge les quatre sources, limitées à la fenêtre [start, end] et aux
+        parcelles demandées. Les sources partitionnées à jour (`partition_sources`)
+        ne sont lues que pour les partitions concernées ; les autres sont lues
+        depuis le CSV puis filtrées.
+        """
         try: 
-            self.monitoring_data = pd.read_csv("../data/monitoring_cultures.csv", parse_dates=["date"])
-            self.weather_data = pd.read_csv("../data/meteo_detaillee.csv", parse_dates=["date"])
-            self.soil_data = pd.read_csv("../data/sols.csv")
-            self.yield_history = pd.read_csv("../data/historique_rendements.csv", parse_dates=["date"])
+            # Les quatre sources sont lues en parallèle ; pyarrow libère le GIL pendant le parsing
+            paths = {
+                attribute: os.path.join(self.data_dir, schema['file'])
+                for attribute, schema in DATASET_SCHEMAS.items()
+            }
+
+            def read(attribute):
+                if self.partitions.is_current(attribute, paths[attribute]):
+                    return self.partitions.read(attribute, start=start, end=end, parcels=parcels)
+                frame = read_dataset(paths[attribute], DATASET_SCHEMAS[attribute])
+                return self._slice_source(frame, start, end, parcels)
+
+            if parallel:
+                with ThreadPoolExecutor(max_workers=len(paths)) as executor:
+                    futures = {attribute: executor.submit(read, attribute) for attribute in paths}
+                    frames = {attribute: future.result() for attribute, future in futures.items()}
+            else:
+                frames = {attribute: read(attribute) for attribute in paths}
+
+            self.monitoring_data = frames['monitoring_data']
+            self.weather_data = frames['weather_data']
+            self.soil_data = frames['soil_data']
+            self.yield_history = frames['yield_history']
             
             # Combine all data into one DataFrame 'data' for easier access
             self.data = pd.merge(self.monitoring_data, self.weather_data, on="date", how="left")
             self.data = pd.merge(self.data, self.soil_data, on="parcelle_id", how="left")
             self.data = pd.merge(self.data, self.yield_history, on=["parcelle_id", "date"], how="left")
+
+            self._setup_temporal_indices()
         
         except FileNotFoundError as e:
             print(f"erreur: fichier introuvable. {e}")
+            if self.raise_errors:
+                raise
         
         except Exception as e:
             print(f"error loading data {e}")
+            if self.raise_errors:
+                raise
 
     
+    @staticmethod
+    def _slice_source(frame, start=None, end=None, parcels=None):
+        """
+        Restreint une source lue en entier à la fenêtre [start, end] et aux parcelles demandées.
+        """
+        mask = np.ones(len(frame), dtype=bool)
+        if start is not None and 'date' in frame.columns:
+            mask &= (frame['date'] >= pd.Timestamp(start)).to_numpy()
+        if end is not None and 'date' in frame.columns:
+            mask &= (frame['date'] <= pd.Timestamp(end)).to_numpy()
+        if parcels is not None and 'parcelle_id' in frame.columns:
+            mask &= frame['parcelle_id'].isin(np.atleast_1d(parcels)).to_numpy()
+        return frame if mask.all() else frame[mask].reset_index(drop=True)
+
+
+    def partition_sources(self):
+        """
+        Réécrit les quatre sources CSV en partitions Parquet par année et région
+        (`data/partitions/`), avec le manifeste utilisé par `load_data` pour
+        l'élagage. Les régions sont un découpage spatial des parcelles de `sols.csv`.
+        Retourne le manifeste.
+        """
+        try:
+            paths = {attribute: os.path.join(self.data_dir, schema['file']) for attribute, schema in DATASET_SCHEMAS.items()}
+            soil = read_dataset(paths['soil_data'], DATASET_SCHEMAS['soil_data'])
+            regions = spatial_regions(soil['parcelle_id'], soil['latitude'], soil['longitude'], self.partitions.n_regions)
+            for attribute, path in paths.items():
+                frame = soil if attribute == 'soil_data' else read_dataset(path, DATASET_SCHEMAS[attribute])
+                self.partitions.write(attribute, frame, source=path, regions=regions)
+            return self.partitions.manifest()
+
+        except Exception as e:
+            print(f"error partitioning sources: {e}")
+            return None
+
+
     def clean_data(self):
         
         self.weather_data['rayonnement_solaire'] = self.weather_data['rayonnement_solaire'].abs()
    
     
+    def validate_data(self, rules=None):
+        """
+        Contrôle en une passe vectorisée les quatre sources selon `rules` (VALIDATION_RULES
+        par défaut : types, bornes, doublons de clé, parcelles absentes des sols). Les lignes
+        rejetées sont retirées et écrites avec leurs motifs dans `quarantine/<jeu>.csv`
+        du répertoire de données. Retourne le résumé des rejets par jeu et motif.
+        """
+        try:
+            rules = typed_validation_rules(VALIDATION_RULES if rules is None else rules)
+            frames = {attribute: getattr(self, attribute) for attribute in rules}
+            valid, quarantined, summary = validate(frames, rules)
+            for attribute, frame in valid.items():
+                setattr(self, attribute, frame)
+            write_quarantine(quarantined, os.path.join(self.data_dir, "quarantine"))
+
+            if not summary.empty:
+                rejected = sum(len(rows) for rows in quarantined.values())
+                print(f"{rejected} lignes mises en quarantaine :")
+                print(summary.to_string(index=False))
+            self._setup_temporal_indices()
+            return summary
+
+        except Exception as e:
+            print(f"error validating data: {e}")
+            if self.raise_errors:
+                raise
+            return None
+
+
+    def impute_gaps(self, settings=None):
+        """
+        Comble en une passe les trous de toutes les séries (monitoring par parcelle,
+        météo horaire, historique des rendements) selon `settings` (GAP_FILLING par
+        défaut). Chaque jeu reçoit une colonne de qualité (0 observé, 1 interpolé, 2 manquant).
+        """
+        try:
+            settings = GAP_FILLING if settings is None else settings
+            for attribute, dataset_settings in settings.items():
+                frame = getattr(self, attribute)
+                if frame is None:
+                    continue
+                dataset_settings = dict(dataset_settings)
+                if attribute == 'weather_data' and self.hourly_weather_data is not None:
+                    # Météo déjà agrégée : grille journalière
+                    dataset_settings.update(freq='D', seasonal=None, max_gap=settings['monitoring_data']['max_gap'])
+                setattr(self, attribute, fill_gaps(frame, **dataset_settings))
+
+            self.gaps_filled = True
+            self._setup_temporal_indices()
+
+        except Exception as e:
+            print(f"error filling gaps: {e}")
+            if self.raise_errors:
+                raise
+
+
     def meteo_data_hourly_to_daily(self):
         try:
             self.weather_data['date'] = pd.to_datetime(self.weather_data['date'], errors='coerce')
-            self.weather_data = (
-                self.weather_data
-                .set_index('date')
-                .resample('D')
-                .mean()
-                .reset_index()
-            )
+            mask_column = GAP_FILLING['weather_data']['mask_column']
+            hourly = self.weather_data.drop(columns=[mask_column], errors='ignore')
+            self.hourly_weather_data = hourly
+            # Moyenne, min, max et cumul journaliers ; moyenne circulaire pour la direction du vent
+            daily = aggregate_hourly_to_daily(hourly)
+            if mask_column in self.weather_data.columns:
+                # Qualité journalière : pire qualité des heures de la journée
+                days = self.weather_data['date'].dt.floor('D')
+                daily[mask_column] = self.weather_data.groupby(days)[mask_column].max().to_numpy()
+            self.weather_data = daily
+            self._indices.pop('weather', None)
 
         except Exception as e:
             print(f"Error aggregating: {e}")
+            if self.raise_errors:
+                raise
+
+
+    def compute_agro_indicators(self):
+        """
+        Calcule les indicateurs agro-climatiques (degrés-jours, cumul de pluie, ET0,
+        bilan hydrique) par parcelle et par saison à partir de la météo horaire.
+        """
+        try:
+            hourly = self.hourly_weather_data if self.hourly_weather_data is not None else self.weather_data
+            self.indicator_engine = AgroClimaticIndicators(self.soil_data)
+            self.indicators = self.indicator_engine.compute(self.monitoring_data, hourly)
+            return self.indicators
+
+        except Exception as e:
+            print(f"error computing agro-climatic indicators: {e}")
+            if self.raise_errors:
+                raise
+            return None
+
+
+    def update_agro_indicators(self, hourly_rows, monitoring_rows=None):
+        """
+        Intègre de nouvelles mesures horaires et de nouvelles lignes de monitoring
+        sans recalculer l'historique des indicateurs ; seuls les nouveaux relevés
+        reçoivent une ligne d'indicateurs.
+        """
+        try:
+            if self.indicator_engine is None:
+                raise ValueError("Indicators are not computed. Call compute_agro_indicators first.")
+            new_rows = self.indicator_engine.update(hourly_rows, monitoring_rows)
+            self.indicators = self.indicator_engine.indicators
+            return new_rows
+
+        except Exception as e:
+            print(f"error updating agro-climatic indicators: {e}")
+            return None
 
 
     def _setup_temporal_indices(self):
+        """
+        Trie les jeux de données par (parcelle_id, date) et mémorise, pour chaque
+        parcelle, la plage de lignes qu'elle occupe. `query` s'appuie sur ces
+        bornes pour découper les données par recherche dichotomique.
+        """
         try:
-            self.monitoring_data.set_index('date', inplace=True)
-            self.weather_data.set_index('date', inplace=True)
-            self.yield_history.set_index('date', inplace=True)
+            self._indices = {}
+            for dataset, attribute in self.INDEXED_DATASETS.items():
+                frame = getattr(self, attribute)
+                if frame is None:
+                    continue
+
+                # Les données déjà triées (par exemple un instantané partagé) ne sont pas recopiées
+                sort_keys = ['parcelle_id', 'date'] if 'parcelle_id' in frame.columns else ['date']
+                if not self._is_sorted(frame, sort_keys):
+                    frame = frame.sort_values(by=sort_keys, kind='mergesort').reset_index(drop=True)
+                    setattr(self, attribute, frame)
+
+                if 'parcelle_id' in frame.columns:
+                    parcels, starts = np.unique(frame['parcelle_id'].to_numpy(), return_index=True)
+                    bounds = np.append(starts, len(frame))
+                else:
+                    parcels, bounds = None, np.array([0, len(frame)])
+
+                self._indices[dataset] = {
+                    'parcels': parcels,
+                    'bounds': bounds,
+                    'dates': frame['date'].to_numpy(dtype='datetime64[ns]'),
+                }
 
         except Exception as e:
             print(f"error setting up indexex: {e}")
+            if self.raise_errors:
+                raise
+
+
+    @staticmethod
+    def _is_sorted(frame, keys):
+        """
+        Indique si `frame` est déjà trié selon `keys` avec un index 0..n-1.
+        """
+        if not isinstance(frame.index, pd.RangeIndex) or frame.index.start != 0 or frame.index.step != 1:
+            return False
+        dates = frame['date'].to_numpy()
+        if keys == ['date']:
+            return bool(np.all(dates[1:] >= dates[:-1]))
+        parcels = frame['parcelle_id'].to_numpy(dtype=object)
+        same = parcels[1:] == parcels[:-1]
+        return bool(np.all((parcels[1:] > parcels[:-1]) | (same & (dates[1:] >= dates[:-1]))))
+
+
+    def query(self, parcels=None, start=None, end=None, columns=None, dataset='features'):
+        """
+        Retourne les lignes d'un jeu de données pour les parcelles et la fenêtre
+        temporelle [start, end] demandées.
+
+        Les bornes sont trouvées par recherche dichotomique dans les données triées
+        par (parcelle_id, date). Lorsque la fenêtre est contiguë (une parcelle, ou
+        toutes les parcelles sans filtre de date), le résultat est une vue sur les
+        données du gestionnaire et ne doit pas être modifié sur place.
+        """
+        try:
+            if dataset not in self.INDEXED_DATASETS:
+                raise KeyError(f"Unknown dataset: {dataset}")
+
+            frame = getattr(self, self.INDEXED_DATASETS[dataset])
+            if frame is None:
+                raise ValueError(f"Dataset '{dataset}' is not loaded.")
+
+            if dataset not in self._indices:
+                self._setup_temporal_indices()
+                frame = getattr(self, self.INDEXED_DATASETS[dataset])
+            index = self._indices[dataset]
+
+            # Plages de lignes des parcelles demandées
+            if index['parcels'] is None or parcels is None:
+                positions = np.arange(len(index['bounds']) - 1)
+            else:
+                requested = np.atleast_1d(np.asarray(parcels, dtype=object))
+                positions = np.searchsorted(index['parcels'], requested)
+                found = positions < len(index['parcels'])
+                found[found] = index['parcels'][positions[found]] == requested[found]
+                positions = np.sort(positions[found])
+            lows = index['bounds'][positions]
+            highs = index['bounds'][positions + 1]
+
+            # Resserrer chaque plage sur la fenêtre temporelle
+            dates = index['dates']
+            if start is not None:
+                start = np.datetime64(pd.Timestamp(start), 'ns')
+                lows = np.array([lo + np.searchsorted(dates[lo:hi], start, side='left') for lo, hi in zip(lows, highs)], dtype=np.int64)
+            if end is not None:
+                end = np.datetime64(pd.Timestamp(end), 'ns')
+                highs = np.array([lo + np.searchsorted(dates[lo:hi], end, side='right') for lo, hi in zip(index['bounds'][positions], highs)], dtype=np.int64)
+
+            # Fusionner les plages adjacentes pour conserver des vues
+            slices = []
+            for lo, hi in zip(lows, highs):
+                if hi <= lo:
+                    continue
+                if slices and slices[-1][1] == lo:
+                    slices[-1][1] = hi
+                else:
+                    slices.append([lo, hi])
+
+            if not slices:
+                result = frame.iloc[0:0]
+            elif len(slices) == 1:
+                result = frame.iloc[slices[0][0]:slices[0][1]]
+            else:
+                result = pd.concat([frame.iloc[lo:hi] for lo, hi in slices])
+
+            if columns is not None:
+                result = result[list(columns)]
+
+            return result
+
+        except Exception as e:
+            print(f"error querying {dataset}: {e}")
+            return None
 
     
     def prepare_features(self):
         try:
+            if not self.gaps_filled:
+                self.impute_gaps()
+
             self.monitoring_data = self.monitoring_data.sort_values(by="date")
             self.weather_data = self.weather_data.sort_values(by="date")
 
-            data = pd.merge_asof(
-                self.monitoring_data,
-                self.weather_data,
-                on="date",
-                direction='nearest'
+            data = self._join_features(
+                self.monitoring_data, self.weather_data, self.soil_data, self.yield_history, self.indicators
             )
-            
-            data = pd.merge(data, self.soil_data, how='left', on="parcelle_id")            
-            
-            data = self._enrich_with_yield_history(data)
-            
-            data.drop(columns=['latitude_y', 'longitude_y'], errors='ignore', inplace=True)
-            data.rename(columns={'latitude_x': 'latitude', 'longitude_x': 'longitude'}, inplace=True)
-
-            data.drop(columns=['culture_y'], errors='ignore', inplace=True)
-            data.rename(columns={'culture_x': 'culture'}, inplace=True)
 
-
-            data.to_csv("../data/features_merge.csv", index=False)
+            # Nouvelle version immuable : les lecteurs d'une version antérieure ne sont pas affectés
+            self.artifact_versions['features'] = self.artifacts.publish('features', data)
             print(data.columns)
 
+            self.features = data
+            self.rollups = None
+            self._setup_temporal_indices()
+
             return data
 
         except Exception as e:
             print(f"error preparing data: {e}")
+            if self.raise_errors:
+                raise
+
+
+    def prepare_features_out_of_core(self, memory_budget_mb=512, table='features'):
+        """
+        Prépare les caractéristiques par lots de parcelles, sans matérialiser la
+        jointure complète : chaque lot est joint (merge_asof) à la seule fenêtre
+        météo qui l'encadre, puis ajouté à la table `table` du stockage en colonnes.
+        Le résultat est celui de `prepare_features`, groupé par lot. Retourne le
+        nombre de lignes écrites.
+
+        Si le monitoring et l'historique des rendements sont partitionnés et à jour
+        (`partition_sources`), seules la météo et les sols restent en mémoire : les
+        lignes de chaque lot sont lues dans les partitions, validées, comblées et
+        complétées de leurs indicateurs lot par lot, et `memory_budget_mb` couvre les
+        données résidentes comme les lots. Les cumuls par saison des indicateurs ne
+        diffèrent alors que par l'arrondi ; les relevés de parcelles absentes des sols
+        ne sont pas lus (ils ne sont donc pas mis en quarantaine).
+        Sinon, les sources entières sont chargées et préparées en mémoire ; le budget
+        ne porte que sur les lots joints, hors données d'entrée résidentes.
+        """
+        try:
+            if all(
+                self.partitions.is_current(attribute, os.path.join(self.data_dir, DATASET_SCHEMAS[attribute]['file']))
+                for attribute in ('monitoring_data', 'yield_history')
+            ):
+                return self._prepare_features_from_partitions(memory_budget_mb, table)
+
+            if not self.gaps_filled:
+                self.impute_gaps()
+            if 'monitoring' not in self._indices:
+                self._setup_temporal_indices()
+
+            index = self._indices['monitoring']
+            parcels = index['parcels']
+            rows = np.diff(index['bounds'])
+            weather = self.weather_data.sort_values(by="date", kind="mergesort").reset_index(drop=True)
+            weather_dates = weather['date'].to_numpy(dtype='datetime64[ns]')
+
+            def batch(parcels):
+                monitoring = self.query(parcels=parcels, dataset='monitoring').sort_values(by="date", kind="mergesort")
+                soil = self.soil_data[self.soil_data['parcelle_id'].isin(parcels)]
+                yields = self.query(parcels=parcels, dataset='yield')
+                indicators = self.query(parcels=parcels, dataset='indicators') if self.indicators is not None else None
+                return self._join_batch(monitoring, weather, weather_dates, soil, yields, indicators)
+
+            written = self._append_batches(table, parcels, rows, memory_budget_mb * 1e6, batch)
+            self.rollups = None
+            return written
 
+        except Exception as e:
+            print(f"error preparing data out of core: {e}")
+            return None
 
-    def _enrich_with_yield_history(self, data):
+
+    def _prepare_features_from_partitions(self, memory_budget_mb, table):
+        """
+        Mode partitionné de `prepare_features_out_of_core` : météo et sols préparés
+        une fois et résidents, monitoring et rendements lus et préparés par lot.
+        """
+        paths = {attribute: os.path.join(self.data_dir, schema['file']) for attribute, schema in DATASET_SCHEMAS.items()}
+
+        def read(attribute):
+            if self.partitions.is_current(attribute, paths[attribute]):
+                return self.partitions.read(attribute)
+            return read_dataset(paths[attribute], DATASET_SCHEMAS[attribute])
+
+        # Données résidentes : série météo commune et une ligne de sol par parcelle
+        shared = AgriculturalDataManager(data_dir=self.data_dir)
+        shared.weather_data, shared.soil_data = read('weather_data'), read('soil_data')
+        shared.clean_data()
+        shared.validate_data(rules={attribute: VALIDATION_RULES[attribute] for attribute in ('weather_data', 'soil_data')})
+        shared.impute_gaps(settings={'weather_data': GAP_FILLING['weather_data']})
+        hourly = shared.weather_data
+        shared.meteo_data_hourly_to_daily()
+        weather = shared.weather_data.sort_values(by="date", kind="mergesort").reset_index(drop=True)
+        weather_dates = weather['date'].to_numpy(dtype='datetime64[ns]')
+        soil = shared.soil_data
+
+        resident = sum(int(frame.memory_usage(deep=True).sum()) for frame in (hourly, weather, soil))
+        budget = memory_budget_mb * 1e6 - resident
+        if budget <= 0:
+            raise MemoryError(f"Resident weather and soil data ({resident / 1e6:.0f} MB) exceed the memory budget.")
+
+        # Parcelles ordonnées par région : un lot ne lit que les partitions de quelques régions
+        entry = self.partitions.manifest()['monitoring_data']
+        parcels = soil['parcelle_id'].to_numpy(dtype=object)
+        parcels = parcels[np.lexsort((parcels, parcel_region(parcels, entry.get('regions'), entry['n_regions'])))]
+        # Taille des lots estimée sur le nombre moyen de relevés par parcelle du manifeste
+        rows_per_parcel = sum(partition['rows'] for partition in entry['partitions']) / max(len(parcels), 1)
+        rows = np.full(len(parcels), rows_per_parcel)
+
+        rules = typed_validation_rules({attribute: VALIDATION_RULES[attribute] for attribute in ('monitoring_data', 'yield_history')})
+        quarantined = {attribute: [] for attribute in rules}
+
+        def batch(parcels):
+            frames = {
+                'monitoring_data': self.partitions.read('monitoring_data', parcels=parcels),
+                'yield_history': self.partitions.read('yield_history', parcels=parcels),
+                'soil_data': soil[soil['parcelle_id'].isin(parcels)],
+            }
+            valid, rejected, _ = validate(frames, rules)
+            for attribute, frame in rejected.items():
+                quarantined.setdefault(attribute, []).append(frame)
+
+            monitoring = fill_gaps(valid['monitoring_data'], **GAP_FILLING['monitoring_data'])
+            if monitoring.empty:
+                return None
+            yields = fill_gaps(valid['yield_history'], **GAP_FILLING['yield_history'])
+            indicators = AgroClimaticIndicators(frames['soil_data']).compute(monitoring, hourly)
+            monitoring = monitoring.sort_values(by="date", kind="mergesort")
+            return self._join_batch(monitoring, weather, weather_dates, frames['soil_data'], yields, indicators)
+
+        written = self._append_batches(table, parcels, rows, budget, batch)
+        write_quarantine(
+            {attribute: pd.concat(frames, ignore_index=True) if frames else None for attribute, frames in quarantined.items()},
+            os.path.join(self.data_dir, "quarantine"),
+        )
+        self.rollups = None
+        return written
+
+
+    def _append_batches(self, table, parcels, rows, budget, batch):
+        """
+        Ajoute à la table `table` les lots de parcelles produits par `batch`. Le premier
+        lot (une parcelle) mesure l'empreinte d'une ligne jointe ; les suivants sont
+        dimensionnés d'après `rows` (relevés par parcelle) pour que leur pic mémoire
+        reste sous `budget` octets. Retourne le nombre de lignes écrites.
+        """
+        bytes_per_row = None
+        written = 0
+        start = 0
+        with self.store.appender(table) as append:
+            while start < len(parcels):
+                if bytes_per_row is None:
+                    stop = start + 1
+                else:
+                    capacity = budget / (bytes_per_row * OUT_OF_CORE_PEAK_FACTOR)
+                    stop = start + max(int(np.searchsorted(np.cumsum(rows[start:]), capacity, side='right')), 1)
+
+                data = batch(parcels[start:stop])
+                start = stop
+                if data is None or data.empty:
+                    continue
+                if bytes_per_row is None:
+                    bytes_per_row = data.memory_usage(deep=True).sum() / len(data)
+                append(data)
+                written += len(data)
+        return written
+
+
+    def _join_batch(self, monitoring, weather, weather_dates, soil, yields, indicators):
+        """
+        Jointure d'un lot de relevés (triés par date) restreinte à la fenêtre de la
+        météo (triée, dates `weather_dates`) qui encadre leurs dates.
+        """
+        dates = monitoring['date'].to_numpy(dtype='datetime64[ns]')
+        # Un relevé de part et d'autre de la période du lot, pour la recherche du plus proche
+        low = max(int(np.searchsorted(weather_dates, dates.min(), side='left')) - 1, 0)
+        high = min(int(np.searchsorted(weather_dates, dates.max(), side='right')) + 1, len(weather))
+        return self._join_features(monitoring, weather.iloc[low:high], soil, yields, indicators)
+
+
+    def _join_features(self, monitoring, weather, soil, yield_history, indicators=None):
+        """
+        Jointure des relevés (triés par date) avec la météo la plus proche, les sols,
+        l'historique des rendements et les indicateurs, triée par (parcelle_id, date).
+        """
+        data = pd.merge_asof(
+            monitoring,
+            weather,
+            on="date",
+            direction='nearest'
+        )
+
+        data = pd.merge(data, soil, how='left', on="parcelle_id")
+
+        data = self._enrich_with_yield_history(data, yield_history)
+
+        if indicators is not None:
+            data = self._enrich_with_indicators(data, indicators)
+
+        data.drop(columns=['latitude_y', 'longitude_y'], errors='ignore', inplace=True)
+        data.rename(columns={'latitude_x': 'latitude', 'longitude_x': 'longitude'}, inplace=True)
+
+        data.drop(columns=['culture_y'], errors='ignore', inplace=True)
+        data.rename(columns={'culture_x': 'culture'}, inplace=True)
+
+        return data.sort_values(by=['parcelle_id', 'date'], kind='mergesort').reset_index(drop=True)
+
+
+    def _enrich_with_yield_history(self, data, yield_history=None):
         try:
             
             # Merge the yield data with the main dataset
             data = pd.merge(
                 data,
-                self.yield_history,
+                self.yield_history if yield_history is None else yield_history,
                 how="left",
                 on=["parcelle_id", "date"]
             )
             return data
         except Exception as e:
             print(f"error enriching yield: {e}")
+            if self.raise_errors:
+                raise
+            return data
+
+
+    def _enrich_with_indicators(self, data, indicators=None):
+        try:
+            indicators = (self.indicators if indicators is None else indicators)[
+                ['parcelle_id', 'date', 'gdd_cumul', 'pluie_cumulee', 'et0', 'reserve_hydrique', 'stress_hydrique']
+            ].rename(columns={'stress_hydrique': 'stress_hydrique_calcule'})
+            data = pd.merge(data, indicators, how="left", on=["parcelle_id", "date"])
+
+            # Le stress hydrique dérivé de la météo complète les observations manquantes
+            if 'stress_hydrique' in data.columns:
+                data['stress_hydrique'] = data['stress_hydrique'].fillna(data['stress_hydrique_calcule'])
+            else:
+                data['stress_hydrique'] = data['stress_hydrique_calcule']
+            return data
+        except Exception as e:
+            print(f"error enriching indicators: {e}")
+            if self.raise_errors:
+                raise
             return data
 
 
+    def pipeline_stages(self):
+        """
+        Étapes de l'analyse, de la lecture des fichiers aux indicateurs de risque :
+        chargement -> nettoyage -> validation -> comblement des trous -> (indicateurs agro-climatiques,
+        météo journalière) -> caractéristiques -> (risques, série de risque, tendances NDVI).
+        """
+        sources = [os.path.join(self.data_dir, schema['file']) for schema in DATASET_SCHEMAS.values()]
+        return [
+            Stage('load', 'load_data', sources=sources, modules=['partitioned_store'], outputs={
+                'monitoring_raw': 'monitoring_data', 'weather_raw': 'weather_data',
+                'soil_raw': 'soil_data', 'yield_raw': 'yield_history',
+            }),
+            Stage('clean', 'clean_data', inputs={'weather_raw': 'weather_data'}, outputs={'weather_clean': 'weather_data'}),
+            Stage('validate', 'validate_data', params={'rules': VALIDATION_RULES}, modules=['validation'], inputs={
+                'monitoring_raw': 'monitoring_data', 'weather_clean': 'weather_data',
+                'soil_raw': 'soil_data', 'yield_raw': 'yield_history',
+            }, outputs={
+                'monitoring_valid': 'monitoring_data', 'weather_valid': 'weather_data',
+                'soil': 'soil_data', 'yield_valid': 'yield_history', 'validation': RETURN_VALUE,
+            }),
+            Stage('impute', 'impute_gaps', params={'settings': GAP_FILLING}, modules=['gap_filling'], inputs={
+                'monitoring_valid': 'monitoring_data', 'weather_valid': 'weather_data', 'yield_valid': 'yield_history',
+            }, outputs={'monitoring': 'monitoring_data', 'weather_hourly': 'weather_data', 'yield': 'yield_history'}),
+            Stage('indicators', 'compute_agro_indicators', modules=['agro_indicators'], inputs={
+                'monitoring': 'monitoring_data', 'weather_hourly': 'weather_data', 'soil': 'soil_data',
+            }, outputs={'indicators': 'indicators'}),
+            Stage('daily_weather', 'meteo_data_hourly_to_daily', modules=['weather_aggregation'],
+                  inputs={'weather_hourly': 'weather_data'}, outputs={'weather_daily': 'weather_data'}),
+            Stage('features', 'prepare_features', state={'gaps_filled': True}, inputs={
+                'monitoring': 'monitoring_data', 'weather_daily': 'weather_data', 'soil': 'soil_data',
+                'yield': 'yield_history', 'indicators': 'indicators',
+            }, outputs={'features': 'features'}),
+            Stage('risk', 'calculate_risk_metrics', inputs={'features': None}, args=['features'],
+                  params={'weights': RISK_WEIGHTS, 'thresholds': RISK_THRESHOLDS}, modules=['kernels'],
+                  outputs={'risk_metrics': RETURN_VALUE}),
+            Stage('risk_timeline', 'compute_risk_timeline', inputs={'features': None}, args=['features'],
+                  modules=['risk_timeline'], outputs={'risk_timeline': 'risk_timeline', 'risk_state': 'risk_engine'}),
+            Stage('patterns', 'get_all_temporal_patterns', modules=['kernels'], inputs={'features': 'features'},
+                  outputs={'temporal_patterns': RETURN_VALUE}),
+        ]
+
+
+    def run_pipeline(self, targets=None, max_workers=4, cache_dir=None):
+        """
+        Exécute les étapes nécessaires à `targets` (toutes par défaut), en reprenant
+        du cache disque celles dont le code, les paramètres et les entrées n'ont pas
+        changé. Les jeux de données produits remplacent ceux du gestionnaire.
+        Retourne le dictionnaire des sorties.
+        """
+        try:
+            cache_dir = cache_dir if cache_dir is not None else os.path.join(self.data_dir, "cache")
+            self.pipeline = Pipeline(
+                self.pipeline_stages(), cache_dir,
+                factory=lambda: AgriculturalDataManager(data_dir=self.data_dir, raise_errors=True),
+                max_workers=max_workers,
+            )
+            datasets = list(self.PIPELINE_DATASETS) + ['weather_hourly']
+            outputs = self.pipeline.run(targets, fetch=datasets)
+
+            for name, attribute in self.PIPELINE_DATASETS.items():
+                if name in outputs:
+                    setattr(self, attribute, outputs[name])
+            if 'weather_hourly' in outputs:
+                self.hourly_weather_data = outputs['weather_hourly'].drop(
+                    columns=[GAP_FILLING['weather_data']['mask_column']], errors='ignore'
+                )
+            self.gaps_filled = self.gaps_filled or 'monitoring' in outputs
+            self.rollups = None
+            self._setup_temporal_indices()
+            return outputs
+
+        except Exception as e:
+            print(f"error running pipeline: {e}")
+            return None
+
+
+    def load_parcel_geometry(self, path=None, zooms=ZOOM_LEVELS):
+        """
+        Charge les contours des parcelles depuis un GeoJSON local (par défaut
+        `parcelles.geojson` du répertoire de données) et précalcule leurs versions
+        simplifiées par niveau de zoom. Retourne None si aucun fichier n'existe.
+        """
+        path = path if path is not None else os.path.join(self.data_dir, "parcelles.geojson")
+        if not os.path.exists(path):
+            return None
+        try:
+            self.geometry = ParcelGeometry.from_geojson(path).precompute(zooms)
+            return self.geometry
+
+        except Exception as e:
+            print(f"error loading parcel geometry: {e}")
+            return None
+
+
+    def build_spatial_index(self, points_per_cell=16):
+        """
+        Construit l'index spatial en grille sur les coordonnées des parcelles
+        (`sols.csv`). Il est reconstruit si les données de sol sont remplacées.
+        """
+        try:
+            if self.soil_data is None:
+                raise ValueError("Soil data is not loaded.")
+            self.spatial_index = GridIndex(
+                self.soil_data['parcelle_id'].to_numpy(),
+                self.soil_data['latitude'].to_numpy(),
+                self.soil_data['longitude'].to_numpy(),
+                points_per_cell=points_per_cell,
+            )
+            self._spatial_source = self.soil_data
+            return self.spatial_index
+
+        except Exception as e:
+            print(f"error building spatial index: {e}")
+            return None
+
+
+    def _get_spatial_index(self):
+        if self.spatial_index is None or self._spatial_source is not self.soil_data:
+            self.build_spatial_index()
+        return self.spatial_index
+
+
+    def parcels_in_bbox(self, south, west, north, east):
+        """
+        Identifiants des parcelles situées dans le rectangle [south, north] x [west, east] (degrés).
+        """
+        try:
+            return self._get_spatial_index().query_bbox(south, west, north, east)
+
+        except Exception as e:
+            print(f"error querying parcels in bounding box: {e}")
+            return None
+
+
+    def parcels_within(self, latitude, longitude, radius_km):
+        """
+        Parcelles à moins de `radius_km` km du point donné : série des distances (km)
+        indexée par parcelle_id, de la plus proche à la plus éloignée.
+        """
+        try:
+            ids, distances = self._get_spatial_index().query_radius(latitude, longitude, radius_km)
+            return pd.Series(distances, index=pd.Index(ids, name='parcelle_id'), name='distance_km')
+
+        except Exception as e:
+            print(f"error querying parcels within {radius_km} km: {e}")
+            return None
+
+
+    def build_similarity_index(self):
+        """
+        Construit l'index de similarité des parcelles sur leur profil standardisé :
+        chimie du sol et, si les caractéristiques sont préparées, moyennes et
+        pentes du rendement et du NDVI.
+        """
+        try:
+            if self.soil_data is None:
+                raise ValueError("Soil data is not loaded.")
+            self.similarity_index = SimilarityIndex(parcel_profiles(self.soil_data, self.features))
+            self._similarity_source = (self.soil_data, self.features)
+            return self.similarity_index
+
+        except Exception as e:
+            print(f"error building similarity index: {e}")
+            return None
+
+
+    def similar_parcels(self, parcels, k=5):
+        """
+        Les `k` parcelles au profil le plus proche de chacune de `parcels` (un
+        identifiant ou une liste) : DataFrame (parcelle_id, voisin, rang, distance).
+        L'index est reconstruit si les données de sol ou les caractéristiques changent.
+        """
+        try:
+            source = self._similarity_source
+            if self.similarity_index is None or source[0] is not self.soil_data or source[1] is not self.features:
+                self.build_similarity_index()
+            return self.similarity_index.similar(parcels, k=k)
+
+        except Exception as e:
+            print(f"error finding parcels similar to {parcels}: {e}")
+            return None
+
+
+    def get_parcel_summary(self, parcelle_id):
+        """
+        Synthèse d'une parcelle à partir des caractéristiques préparées : position,
+        culture actuelle, période couverte et statistiques NDVI / rendement.
+        """
+        try:
+            parcelle_data = self.query(parcels=parcelle_id)
+            if parcelle_data is None or parcelle_data.empty:
+                raise ValueError(f"No data found for parcelle_id: {parcelle_id}")
+
+            last = parcelle_data.iloc[-1]
+            return {
+                "parcelle_id": parcelle_id,
+                "latitude": float(parcelle_data["latitude"].mean()),
+                "longitude": float(parcelle_data["longitude"].mean()),
+                "culture_actuelle": last["culture"],
+                "debut": parcelle_data["date"].min(),
+                "fin": parcelle_data["date"].max(),
+                "nb_observations": int(len(parcelle_data)),
+                "ndvi_moyen": float(parcelle_data["ndvi"].mean()),
+                "ndvi_dernier": float(last["ndvi"]),
+                "rendement_moyen": float(parcelle_data["rendement_estime"].mean()),
+            }
+
+        except Exception as e:
+            print(f"Error in get_parcel_summary: {e}")
+            return None
+
+
     def get_temporal_patterns(self, parcelle_id):
         try:
-            features = pd.read_csv("../data/features_merge.csv", parse_dates=["date"])
-            parcelle_data = features[features["parcelle_id"] == parcelle_id]
+            # Les caractéristiques préparées en mémoire évitent de relire l'artefact publié
+            if self.features is not None:
+                parcelle_data = self.query(parcels=parcelle_id)
+            else:
+                parcelle_data = self.read_artifact('features', filters=[('parcelle_id', '==', parcelle_id)])
 
 
             if "ndvi" not in parcelle_data.columns:
@@ -129,8 +1045,7 @@ class AgriculturalDataManager:
             if parcelle_data.empty:
                 raise ValueError(f"No data found for parcelle_id: {parcelle_id}")
 
-            parcelle_data.sort_values(by="date", inplace=True)
-            parcelle_data.set_index("date", inplace=True)
+            parcelle_data = parcelle_data.sort_values(by="date", kind="mergesort").set_index("date")
 
             ndvi_series = parcelle_data["ndvi"].dropna()
             if len(ndvi_series) < 12:
@@ -138,12 +1053,12 @@ class AgriculturalDataManager:
 
             decomposition = seasonal_decompose(ndvi_series, model="additive", period=12)
 
-            date_ordinal = parcelle_data.index.map(datetime.toordinal).values.reshape(-1, 1)
-            ndvi_values = ndvi_series.values.reshape(-1, 1)
+            date_ordinal = ndvi_series.index.map(datetime.toordinal).values
+            bounds = np.array([0, len(ndvi_series)])
 
-            trend_model = LinearRegression().fit(date_ordinal, ndvi_values)
-            trend_slope = trend_model.coef_[0][0]
-            trend_intercept = trend_model.intercept_[0]
+            slopes, intercepts, _, _ = grouped_linear_trend(date_ordinal, ndvi_series.values, bounds)
+            trend_slope = slopes[0]
+            trend_intercept = intercepts[0]
 
             trend = {
                 "pente": trend_slope,
@@ -155,7 +1070,9 @@ class AgriculturalDataManager:
                 "ndvi_trend": decomposition.trend.dropna(),
                 "ndvi_seasonal": decomposition.seasonal,
                 "ndvi_residual": decomposition.resid.dropna(),
-                "ndvi_moving_avg": ndvi_series.rolling(window=30).mean().dropna(),
+                "ndvi_moving_avg": pd.Series(
+                    grouped_rolling_mean(ndvi_series.values, bounds, 30), index=ndvi_series.index, name=ndvi_series.name,
+                ).dropna(),
                 "summary_stats": {
                     "mean_ndvi": ndvi_series.mean(),
                     "std_ndvi": ndvi_series.std(),
@@ -171,82 +1088,545 @@ class AgriculturalDataManager:
             return None, None
 
     
-    def calculate_risk_metrics(self, data):
+    def get_all_temporal_patterns(self, parcels=None):
+        """
+        Tendances NDVI de toutes les parcelles (ou de `parcels`) : parcelle -> (historique, tendance).
+        """
+        if parcels is None:
+            parcels = self.features['parcelle_id'].unique()
+        return {parcelle_id: self.get_temporal_patterns(parcelle_id) for parcelle_id in parcels}
+
+
+    def calculate_risk_metrics(self, data, weights=None, thresholds=None, publish=True):
+        """
+        Indice de risque moyen et catégorie la plus fréquente par parcelle et culture,
+        avec les pondérations `weights` et seuils `thresholds` (RISK_WEIGHTS et
+        RISK_THRESHOLDS par défaut). Avec `publish=False`, le résultat n'est pas
+        publié comme nouvelle version de l'artefact `grouped_risk_metrics`.
+        """
         try:
-            required_columns = ['parcelle_id', 'culture', 'rendement_estime', 'ph', 'matiere_organique']
+            weights = RISK_WEIGHTS if weights is None else weights
+            thresholds = RISK_THRESHOLDS if thresholds is None else thresholds
+            required_columns = ['parcelle_id', 'culture'] + RISK_FEATURES
             for col in required_columns:
                 if col not in data.columns:
                     raise KeyError(f"Required column '{col}' is missing from the data.")
 
             # Normalize the required columns
-            normalized_data = self.scalar.fit_transform(data[['rendement_estime', 'ph', 'matiere_organique']])
+            normalized_data = self.scalar.fit_transform(data[RISK_FEATURES])
 
-            # Calculate risk index
-            data['risk_index'] = (
-                0.5 * normalized_data[:, 0] +  # Weight for rendement
-                0.3 * normalized_data[:, 1] +  # Weight for pH
-                0.2 * normalized_data[:, 2]    # Weight for organic matter
-            )
+            # Calculate risk index (weights for rendement, pH and organic matter)
+            data['risk_index'] = normalized_data @ np.asarray(weights)
 
             # Assign risk categories based on thresholds
             data['risk_category'] = pd.cut(
                 data['risk_index'],
-                bins=[-np.inf, -1, 0, 1, np.inf],
-                labels=['Très Bas', 'Bas', 'Modéré', 'Élevé']
+                bins=[-np.inf] + list(thresholds) + [np.inf],
+                labels=RISK_LABELS
             )
 
-            # Group by parcelle_id and culture, aggregate risk index and risk category
-            grouped_data = data.groupby(['parcelle_id', 'culture']).agg(
-                avg_risk_index=('risk_index', 'mean'),
-                most_frequent_risk_category=('risk_category', lambda x: x.mode()[0] if not x.mode().empty else None)
-            ).reset_index()
+            # Group by parcelle_id and culture: rows sorted into contiguous groups, then
+            # mean risk index and most frequent category (ties: lowest, like mode()) per group
+            rows = np.flatnonzero(data[['parcelle_id', 'culture']].notna().all(axis=1).to_numpy())
+            parcels = data['parcelle_id'].to_numpy()[rows]
+            crops = data['culture'].to_numpy()[rows]
+            order = np.lexsort((crops, parcels))
+            rows, parcels, crops = rows[order], parcels[order], crops[order]
+            bounds = group_bounds(parcels, crops)
+            categories = data['risk_category']
+            means, modes = grouped_mean_mode(
+                data['risk_index'].to_numpy()[rows], categories.cat.codes.to_numpy()[rows], bounds, len(categories.cat.categories),
+            )
+            grouped_data = pd.DataFrame({
+                'parcelle_id': parcels[bounds[:-1]],
+                'culture': crops[bounds[:-1]],
+                'avg_risk_index': means,
+                'most_frequent_risk_category': pd.Categorical.from_codes(modes, dtype=categories.dtype),
+            })
 
 
-            # Save the grouped data to a CSV file
-            grouped_data.to_csv("../data/grouped_risk_metrics.csv", index=False)
+            # Publish the grouped data as a new immutable version
+            if publish:
+                self.artifact_versions['grouped_risk_metrics'] = self.artifacts.publish('grouped_risk_metrics', grouped_data)
 
             return grouped_data
 
         except Exception as e:
             print(f"Erreur lors du calcul des métriques de risque : {e}")
+            if self.raise_errors:
+                raise
             return None
         
 
+    def evaluate_risk_scenarios(self, data, weights, thresholds=RISK_THRESHOLDS):
+        """
+        Évalue en une passe un ensemble de scénarios de pondération du risque.
+
+        `weights` est une matrice (scénarios, 3) de pondérations de RISK_FEATURES et
+        `thresholds` une matrice (scénarios, 3) de seuils croissants (ou un seul jeu
+        de seuils commun). Les indices de tous les scénarios sont obtenus par un
+        unique produit matriciel avec les variables normalisées.
+
+        Retourne un dictionnaire de DataFrames indexés par (parcelle_id, culture),
+        une colonne par scénario : indice moyen et catégorie la plus fréquente.
+        """
+        try:
+            required_columns = ['parcelle_id', 'culture'] + RISK_FEATURES
+            for col in required_columns:
+                if col not in data.columns:
+                    raise KeyError(f"Required column '{col}' is missing from the data.")
+
+            weights = np.atleast_2d(np.asarray(weights, dtype=float))
+            thresholds = np.asarray(thresholds, dtype=float)
+            thresholds = np.broadcast_to(np.atleast_2d(thresholds), (len(weights), thresholds.shape[-1]))
+            if weights.shape[1] != len(RISK_FEATURES):
+                raise ValueError(f"weights must have {len(RISK_FEATURES)} columns.")
+            if np.any(np.diff(thresholds, axis=1) < 0):
+                raise ValueError("thresholds must be increasing within each scenario.")
+
+            normalized_data = StandardScaler().fit_transform(data[RISK_FEATURES])
+            # Lignes sans parcelle ou sans culture écartées, comme dans calculate_risk_metrics
+            keyed = data[['parcelle_id', 'culture']].notna().all(axis=1).to_numpy()
+            valid = ~np.isnan(normalized_data).any(axis=1) & keyed
+
+            # Lignes regroupées par (parcelle_id, culture) en segments contigus
+            group_ids = np.full(len(data), -1, dtype=np.int64)
+            group_ids[keyed], group_index = pd.MultiIndex.from_frame(data.loc[keyed, ['parcelle_id', 'culture']]).factorize()
+            order = np.argsort(group_ids[valid], kind='stable')
+            features = normalized_data[valid][order]
+            sorted_groups = group_ids[valid][order]
+            starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]]) if len(sorted_groups) else np.array([], dtype=int)
+            present = sorted_groups[starts]
+
+            # Indices de tous les scénarios : un seul produit matriciel (lignes, scénarios)
+            scores = features @ weights.T
+
+            # Catégorie = nombre de seuils strictement dépassés (intervalles fermés à droite)
+            codes = np.zeros(scores.shape, dtype=np.int8)
+            for k in range(thresholds.shape[1]):
+                codes += scores > thresholds[:, k]
+
+            n_groups, n_scenarios, n_categories = len(group_index), len(weights), thresholds.shape[1] + 1
+
+            # L'indice étant linéaire, sa moyenne par groupe est la moyenne des variables pondérée
+            means = np.full((n_groups, n_scenarios), np.nan)
+            category_counts = np.zeros((n_groups, n_scenarios, n_categories), dtype=np.int64)
+            if len(starts):
+                group_sizes = np.diff(np.r_[starts, len(features)])
+                means[present] = (np.add.reduceat(features, starts, axis=0) / group_sizes[:, None]) @ weights.T
+                for category in range(n_categories):
+                    category_counts[present, :, category] = np.add.reduceat(codes == category, starts, axis=0)
+
+            # Catégorie la plus fréquente (en cas d'égalité, la plus basse, comme mode())
+            modes = category_counts.argmax(axis=2)
+            labels = np.asarray(RISK_LABELS, dtype=object)[modes]
+            labels[category_counts.sum(axis=2) == 0] = None
+
+            index = pd.MultiIndex.from_tuples(group_index, names=['parcelle_id', 'culture'])
+            return {
+                'avg_risk_index': pd.DataFrame(means, index=index),
+                'risk_category': pd.DataFrame(labels, index=index),
+            }
+
+        except Exception as e:
+            print(f"Erreur lors de l'évaluation des scénarios de risque : {e}")
+            return None
+
+
+    def _publish_risk_timeline(self):
+        """
+        Publie la série de risque comme nouvelle version de l'artefact `risk_timeline`,
+        avec l'état de la fenêtre glissante en fichier annexe.
+        """
+        self.artifact_versions['risk_timeline'] = self.artifacts.publish(
+            'risk_timeline', self.risk_timeline, sidecars={'state.npz': self.risk_engine.save_state},
+        )
+
+
+    def compute_risk_timeline(self, data, window_days=90, publish=True):
+        """
+        Calcule la série temporelle de l'indice de risque par parcelle sur tout
+        l'historique, avec normalisation sur fenêtre glissante. Avec `publish=True`,
+        la série et l'état nécessaire aux mises à jour incrémentales sont publiés
+        comme nouvelle version immuable de l'artefact `risk_timeline`.
+        """
+        try:
+            required_columns = ['parcelle_id', 'date'] + RISK_FEATURES
+            for col in required_columns:
+                if col not in data.columns:
+                    raise KeyError(f"Required column '{col}' is missing from the data.")
+
+            self.risk_engine = RollingRiskIndex(RISK_FEATURES, RISK_WEIGHTS, RISK_THRESHOLDS, RISK_LABELS, window_days)
+            self.risk_timeline = self.risk_engine.update(data)
+            if publish:
+                self._publish_risk_timeline()
+            self._indices.pop('risk', None)
+            self.rollups = None
+
+            return self.risk_timeline
+
+        except Exception as e:
+            print(f"Erreur lors du calcul de la série de risque : {e}")
+            if self.raise_errors:
+                raise
+            return None
+
+
+    def load_risk_timeline(self):
+        """
+        Lit la version retenue (la dernière publiée par défaut) de la série de risque
+        et l'état de sa fenêtre glissante.
+        """
+        try:
+            timeline = self.read_artifact('risk_timeline')
+            timeline['risk_category'] = pd.Categorical(timeline['risk_category'], categories=RISK_LABELS)
+            engine = RollingRiskIndex(RISK_FEATURES, RISK_WEIGHTS, RISK_THRESHOLDS, RISK_LABELS)
+            engine.load_state(self.artifacts.sidecar_path('risk_timeline', self.artifact_versions['risk_timeline'], 'state.npz'))
+            self.risk_timeline, self.risk_engine = timeline, engine
+            self._indices.pop('risk', None)
+            return self.risk_timeline
+
+        except FileNotFoundError as e:
+            print(f"erreur: série de risque introuvable. {e}")
+            return None
+
+
+    def update_risk_timeline(self, new_rows, publish=True):
+        """
+        Ajoute à la série de risque les nouvelles lignes de monitoring : seules les
+        lignes (parcelle, date) non encore traitées, à partir de la dernière date
+        traitée, sont calculées. Les variables de sol et de rendement manquantes
+        sont complétées à partir des données chargées. Avec `publish=True`, la série
+        complétée est publiée comme nouvelle version de l'artefact `risk_timeline`.
+        """
+        try:
+            if self.risk_engine is None:
+                raise ValueError("Risk timeline is not computed. Call compute_risk_timeline first.")
+
+            if 'ph' not in new_rows.columns or 'matiere_organique' not in new_rows.columns:
+                new_rows = pd.merge(new_rows, self.soil_data[['parcelle_id', 'ph', 'matiere_organique']], how="left", on="parcelle_id")
+            if 'rendement_estime' not in new_rows.columns:
+                new_rows = pd.merge(new_rows, self.yield_history[['parcelle_id', 'date', 'rendement_estime']], how="left", on=["parcelle_id", "date"])
+
+            tail = self.risk_engine.update(new_rows)
+            if tail.empty:
+                return tail
+
+            self.risk_timeline = pd.concat([self.risk_timeline, tail], ignore_index=True)
+            if publish:
+                self._publish_risk_timeline()
+            self._indices.pop('risk', None)
+            return tail
+
+        except Exception as e:
+            print(f"Erreur lors de la mise à jour de la série de risque : {e}")
+            return None
+
+
+    def init_ndvi_anomaly_detector(self, alpha=0.1, threshold=3.0, warmup=10):
+        """
+        Construit l'attente saisonnière du NDVI à partir du monitoring chargé et
+        rejoue l'historique pour initialiser l'état EWMA de chaque parcelle.
+        Retourne les anomalies détectées sur l'historique.
+        """
+        try:
+            self.ndvi_detector = NDVIAnomalyDetector(alpha=alpha, threshold=threshold, warmup=warmup)
+            self.ndvi_detector.fit_expectation(self.monitoring_data)
+            history = self.ndvi_detector.update(self.monitoring_data)
+            return history[history['anomalie']]
+
+        except Exception as e:
+            print(f"Erreur lors de l'initialisation du détecteur NDVI : {e}")
+            return None
+
+
+    def detect_ndvi_anomalies(self, new_rows):
+        """
+        Évalue un nouveau lot d'observations NDVI (par exemple le relevé journalier
+        de l'exploitation) contre l'état en mémoire, sans relire les caractéristiques publiées.
+        Retourne le lot annoté (ndvi_attendu, residu, zscore, anomalie).
+        """
+        try:
+            if self.ndvi_detector is None:
+                raise ValueError("NDVI detector is not initialized. Call init_ndvi_anomaly_detector first.")
+            return self.ndvi_detector.update(new_rows)
+
+        except Exception as e:
+            print(f"Erreur lors de la détection d'anomalies NDVI : {e}")
+            return None
+
+
+    def analyze_weather_correlations(self, target='ndvi', variables=None, max_lag=60, parcels=None):
+        """
+        Corrélations décalées (0 à `max_lag` jours) entre chaque variable météo
+        journalière et la cible (ndvi ou rendement_estime), pour chaque parcelle.
+
+        Retourne un dictionnaire : tableau `correlations` (parcelles, variables, décalages),
+        `parcels`, `variables`, `lags` et le tableau `strongest` des décalages les plus marqués.
+        """
+        try:
+            if self.features is None:
+                raise ValueError("Features are not prepared. Call prepare_features first.")
+            candidates = WEATHER_VARIABLES if variables is None else variables
+            variables = [column for column in candidates if column in self.features.columns]
+
+            panel, parcel_ids, _ = daily_panel(self.features, variables + [target], parcels=parcels)
+            correlations = lagged_cross_correlation(panel[:, :-1], panel[:, -1], max_lag=max_lag)
+            return {
+                'correlations': correlations,
+                'parcels': parcel_ids,
+                'variables': variables,
+                'lags': np.arange(max_lag + 1),
+                'strongest': strongest_lags(correlations, parcel_ids, variables),
+            }
+
+        except Exception as e:
+            print(f"Erreur lors de l'analyse des corrélations : {e}")
+            return None
+
+
+    def _rollup_rows(self, rows):
+        """
+        Lignes de caractéristiques complétées de l'indice de risque lorsque la série est calculée.
+        """
+        if self.risk_timeline is None or 'risk_index' in rows.columns:
+            return rows
+        risk = self.risk_timeline[['parcelle_id', 'date', 'risk_index']]
+        return pd.merge(rows, risk, how="left", on=["parcelle_id", "date"])
+
+
+    def compute_rollups(self):
+        """
+        Matérialise les agrégats par parcelle (jour, semaine, mois, saison) des
+        caractéristiques fusionnées dans le stockage en colonnes.
+        """
+        try:
+            if self.features is None:
+                raise ValueError("Features are not prepared. Call prepare_features first.")
+            self.rollups = RollupStore(self.store).build(self._rollup_rows(self.features))
+            return self.rollups
+
+        except Exception as e:
+            print(f"Erreur lors du calcul des agrégats : {e}")
+            return None
+
+
+    def update_rollups(self, new_rows):
+        """
+        Fusionne de nouvelles lignes de caractéristiques dans les agrégats stockés,
+        sans recalculer l'historique.
+        """
+        try:
+            if self.rollups is None:
+                self.rollups = RollupStore(self.store)
+                if not self.rollups.load():
+                    raise ValueError("Rollups are not computed. Call compute_rollups first.")
+            return self.rollups.update(self._rollup_rows(new_rows))
+
+        except Exception as e:
+            print(f"Erreur lors de la mise à jour des agrégats : {e}")
+            return None
+
+
+    def get_rollup(self, resolution=None, parcels=None, start=None, end=None, metrics=None):
+        """
+        Agrégats par parcelle à la résolution demandée ('day', 'week', 'month',
+        'season') sur la fenêtre [start, end]. Sans résolution, celle-ci est
+        choisie d'après la durée de la fenêtre.
+        """
+        try:
+            # Les agrégats sont recalculés après prepare_features, sinon repris du stockage
+            if self.rollups is None and self.features is not None:
+                self.compute_rollups()
+            elif self.rollups is None:
+                self.rollups = RollupStore(self.store)
+                if not self.rollups.load():
+                    raise ValueError("Rollups are not computed. Call compute_rollups first.")
+
+            if resolution is None:
+                bounds = self.features['date'] if self.features is not None else None
+                window_start = start if start is not None else bounds.min()
+                window_end = end if end is not None else bounds.max()
+                resolution = resolution_for_span(window_start, window_end)
+
+            return self.rollups.get(resolution, parcels=parcels, start=start, end=end, metrics=metrics)
+
+        except Exception as e:
+            print(f"Erreur lors de la lecture des agrégats : {e}")
+            return None
+
+
+    def pin_artifacts(self, versions=None):
+        """
+        Fixe les versions d'artefacts lues par ce gestionnaire (nom -> empreinte).
+        Sans argument, retient la version courante de chaque artefact publié.
+        Chaque version retenue est protégée par un bail : le nettoyage des anciennes
+        versions par un autre pipeline ne la supprime pas. Retourne les versions retenues.
+        """
+        if versions is None:
+            versions = {name: self.artifacts.latest(name) for name in ['features', 'grouped_risk_metrics', 'risk_timeline']}
+        for name, version in versions.items():
+            if version is not None:
+                self._retain_artifact(name, version)
+        return dict(self.artifact_versions)
+
+
+    def _retain_artifact(self, name, version):
+        """
+        Retient `version` de l'artefact `name` : renouvelle son bail, ou libère celui
+        de la version précédemment retenue et en prend un nouveau.
+        """
+        token = self._artifact_pins.get(name)
+        if token is not None and token.startswith(f"{version}."):
+            self.artifacts.renew(name, token)
+        else:
+            if token is not None:
+                self.artifacts.unpin(name, token)
+            self._artifact_pins[name] = self.artifacts.pin(name, version)
+        self.artifact_versions[name] = version
+
+
+    def release_artifacts(self):
+        """
+        Libère les baux pris par ce gestionnaire ; les versions retenues restent lisibles
+        tant que le nettoyage ne les a pas supprimées.
+        """
+        for name, token in self._artifact_pins.items():
+            self.artifacts.unpin(name, token)
+        self._artifact_pins = {}
+
+
+    def read_artifact(self, name, columns=None, filters=None):
+        """
+        Lit la version retenue de l'artefact `name` ; à la première lecture,
+        la version courante est retenue (sous bail) pour toutes les lectures suivantes.
+        """
+        version = self.artifact_versions.get(name) or self.artifacts.latest(name)
+        if version is None:
+            raise FileNotFoundError(f"Artifact '{name}' has not been published yet.")
+        self._retain_artifact(name, version)
+        return self.artifacts.read(name, version=version, columns=columns, filters=filters)
+
+
+    def _snapshot_root(self, root=None):
+        return root if root is not None else os.path.join(self.data_dir, "snapshots")
+
+
+    def publish_snapshot(self, root=None, keep=2):
+        """
+        Publie les données chargées et préparées dans un instantané versionné,
+        projetable en mémoire par les autres processus (sessions Streamlit, workers).
+        Pour un partage en mémoire vive, `root` peut pointer vers /dev/shm.
+        """
+        try:
+            frames = {
+                attribute: getattr(self, attribute)
+                for attribute in self.SNAPSHOT_DATASETS
+                if getattr(self, attribute) is not None
+            }
+            self.snapshot_version = publish_snapshot(frames, self._snapshot_root(root), keep=keep)
+            return self.snapshot_version
+
+        except Exception as e:
+            print(f"Erreur lors de la publication de l'instantané : {e}")
+            return None
+
+
+    def attach_snapshot(self, root=None, version=None, categorical=True):
+        """
+        Remplace les données du gestionnaire par un instantané publié, sans copie
+        des colonnes numériques et temporelles. Les DataFrames obtenus sont en
+        lecture seule ; par défaut, les colonnes texte restent aussi partagées sous
+        forme de codes catégoriels (`categorical=False` les recopie en chaînes).
+        """
+        try:
+            self.snapshot_version, frames = attach_snapshot(self._snapshot_root(root), version=version, categorical=categorical)
+            for attribute in self.SNAPSHOT_DATASETS:
+                setattr(self, attribute, frames.get(attribute))
+            self.rollups = None
+            self._setup_temporal_indices()
+            return self.snapshot_version
+
+        except FileNotFoundError as e:
+            print(f"erreur: instantané introuvable. {e}")
+            return None
+
+
+    def refresh_snapshot(self, root=None, categorical=True):
+        """
+        S'attache à la dernière version publiée si elle a changé.
+        Retourne True si les données ont été remplacées.
+        """
+        version = latest_version(self._snapshot_root(root))
+        if version is None or version == self.snapshot_version:
+            return False
+        return self.attach_snapshot(root, version=version, categorical=categorical) is not None
+
+
+    def predict_yields(self, features=None):
+        """
+        Prédit le rendement de chaque ligne de caractéristiques avec un modèle
+        unique entraîné sur toutes les parcelles. Le modèle n'est réentraîné que
+        si les données ont changé ; les prédictions sont mises en cache.
+        """
+        try:
+            features = self.features if features is None else features
+            if features is None:
+                raise ValueError("Features are not prepared. Call prepare_features first.")
+
+            version = data_version(features, training_columns(features))
+            if self.yield_predictor is None or self.yield_predictor.trained_version != version:
+                self.yield_predictor = YieldPredictor().fit(features)
+
+            return self.yield_predictor.predict(features)
+
+        except Exception as e:
+            print(f"Erreur lors de la prédiction des rendements : {e}")
+            return None
+
+
+    def fit_season_curves(self, model='logistic', months_observed=None):
+        """
+        Ajuste une courbe de croissance (logistique ou Gompertz) à chaque
+        (parcelle, saison) de l'historique des rendements en un seul lot.
+        Avec `months_observed`, donne une estimation précoce du rendement final.
+        """
+        try:
+            if self.yield_history is None:
+                raise ValueError("Yield history is not loaded.")
+            return fit_season_curves(self.yield_history, model=model, months_observed=months_observed)
+
+        except Exception as e:
+            print(f"Erreur lors de l'ajustement des courbes de croissance : {e}")
+            return None
+
+
     def analyze_yield_patterns(self, parcelle_id):
         try:
-            # Extract yield history for the specified parcelle
-            parcelle_yield_history = self.yield_history[
-                self.yield_history['parcelle_id'] == parcelle_id
-            ].copy()
+            # Extract yield history for the specified parcelle (already sorted by date)
+            parcelle_yield_history = self.query(parcels=parcelle_id, dataset='yield')
 
-            if parcelle_yield_history.empty:
+            if parcelle_yield_history is None or parcelle_yield_history.empty:
                 raise ValueError(f"No yield data found for parcelle_id: {parcelle_id}")
 
-            # Ensure the data is sorted by year
-            parcelle_yield_history.sort_values(by='date', inplace=True)
-
             # Set 'annee' as the index temporarily for analysis
             yield_series = parcelle_yield_history.set_index('date')['rendement_estime']
 
-            # Handle missing or constant data
-            if yield_series.isnull().any():
-                print("Filling missing values in yield series.")
-                yield_series = yield_series.interpolate()
+            # Gaps are filled upstream by impute_gaps; only gaps longer than the limit remain
+            yield_series = yield_series.dropna()
 
             if yield_series.nunique() == 1:  # Check if all values are the same
                 print("Adding noise to constant yield series.")
                 yield_series = yield_series + np.random.normal(0, 0.1, size=len(yield_series))
 
             # Trend analysis using linear regression
-            date_ordinal = yield_series.index.map(datetime.toordinal).values.reshape(-1, 1)
-            yield_values = yield_series.values.reshape(-1, 1)
-
-            trend_model = LinearRegression().fit(date_ordinal, yield_values)
-            trend_slope = trend_model.coef_[0][0]
-            trend_intercept = trend_model.intercept_[0]
+            date_ordinal = yield_series.index.map(datetime.toordinal).values
+            slopes, intercepts, _, _ = grouped_linear_trend(date_ordinal, yield_series.values, np.array([0, len(yield_series)]))
+            trend_slope = slopes[0]
+            trend_intercept = intercepts[0]
 
             # Calculate residuals
-            predicted_values = trend_model.predict(date_ordinal).flatten()
+            predicted_values = trend_slope * date_ordinal + trend_intercept
             residuals = yield_series - predicted_values
 
             # Compile results
@@ -279,18 +1659,18 @@ if __name__ == "__main__":
     data_manager = AgriculturalDataManager()
 
 
-    # Load data and prepare features
-    data_manager.load_data()
-    data_manager.clean_data()
-    data_manager.meteo_data_hourly_to_daily()
+    # Load, clean, fill gaps, prepare features, then patterns and risk (cached stages are skipped)
+    outputs = data_manager.run_pipeline(targets=['risk_metrics', 'temporal_patterns'])
+    print(f"Étapes : {data_manager.pipeline.last_run}")
 
-    features = data_manager.prepare_features()
+    # Nouvelle version de l'instantané partagé : les sessions du tableau de bord la reprennent (refresh_snapshot)
+    data_manager.publish_snapshot()
 
 
     # Analyze temporal patterns for a specific parcelle
     parcelle_id = "P001"
-    history, trend = data_manager.get_temporal_patterns(parcelle_id)
-    risk_metric = data_manager.calculate_risk_metrics(features)
+    history, trend = outputs['temporal_patterns'][parcelle_id]
+    risk_metric = outputs['risk_metrics']
     yield_analysis = data_manager.analyze_yield_patterns(parcelle_id)
 
     print("========= risk metrics =========")
@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+
+
+# Codes du masque de qualité (le maximum sur les colonnes traitées est retenu par ligne)
+OBSERVED = 0
+IMPUTED = 1
+MISSING = 2
+
+# Clés de profil saisonnier : heure du jour pour la météo horaire, jour de l'année sinon
+SEASONAL_KEYS = {
+    'hour': (lambda dates: dates.dt.hour.to_numpy(), 24),
+    'dayofyear': (lambda dates: dates.dt.dayofyear.to_numpy() - 1, 366),
+}
+
+
+def _group_codes(data, group):
+    if group is None:
+        return np.zeros(len(data), dtype=np.int64)
+    return pd.factorize(data[group], sort=False)[0].astype(np.int64)
+
+
+def _regularize(data, group, time, freq, carry):
+    """
+    Complète chaque série (déjà triée par groupe puis date) sur une grille régulière
+    de pas `freq`, du premier au dernier relevé du groupe. Les lignes insérées ne
+    reprennent de la dernière ligne observée du groupe que le groupe et les colonnes
+    d'identité `carry` ; toutes les autres valeurs y sont manquantes, si bien qu'un
+    cumul (précipitations...) n'est pas modifié. Les groupes ayant un relevé hors
+    grille ou une date en double sont laissés tels quels (et signalés), sans
+    empêcher la régularisation des autres. Retourne les données et le masque des
+    lignes insérées.
+    """
+    codes = _group_codes(data, group)
+    step = pd.tseries.frequencies.to_offset(freq).nanos
+    times = data[time].to_numpy(dtype='datetime64[ns]').view('int64')
+
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    sizes = np.diff(np.r_[starts, len(data)])
+    offgrid = (times - np.repeat(times[starts], sizes)) % step != 0
+    duplicated = np.r_[False, (codes[1:] == codes[:-1]) & (times[1:] == times[:-1])]
+    irregular = np.logical_or.reduceat(offgrid | duplicated, starts)
+    if not irregular.any():
+        return _fill_grid(data, group, time, step, carry)
+
+    label = f"{irregular.sum()} série(s)" if group is not None else "la série"
+    print(f"Comblement des trous : {label} avec des relevés hors grille ({freq}) ou des dates "
+          f"en double laissée(s) sans régularisation.")
+    skipped = np.repeat(irregular, sizes)
+    regular, inserted = _fill_grid(data[~skipped].reset_index(drop=True), group, time, step, carry)
+    keys = [group, time] if group is not None else [time]
+    combined = pd.concat([regular, data[skipped]], ignore_index=True)
+    order = combined.sort_values(by=keys, kind='mergesort').index.to_numpy()
+    inserted = np.r_[inserted, np.zeros(skipped.sum(), dtype=bool)][order]
+    return combined.iloc[order].reset_index(drop=True), inserted
+
+
+def _fill_grid(data, group, time, step, carry):
+    """
+    Réinsère les relevés absents de séries dont tous les relevés sont sur la grille
+    de pas `step` (en nanosecondes) et dont les dates sont distinctes.
+    """
+    if not len(data):
+        return data, np.zeros(0, dtype=bool)
+    codes = _group_codes(data, group)
+    times = data[time].to_numpy(dtype='datetime64[ns]').view('int64')
+
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(data)] - 1
+    offsets_in_group = times - np.repeat(times[starts], ends - starts + 1)
+    lengths = (times[ends] - times[starts]) // step + 1
+    total = int(lengths.sum())
+    if total == len(data):
+        # Série déjà régulière
+        return data, np.zeros(len(data), dtype=bool)
+    grid_starts = np.r_[0, np.cumsum(lengths)[:-1]]
+    positions = np.repeat(grid_starts, ends - starts + 1) + offsets_in_group // step
+
+    # Chaque ligne de la grille pointe sur la dernière ligne observée de son groupe
+    source = np.full(total, -1, dtype=np.int64)
+    source[positions] = np.arange(len(data))
+    source = np.maximum.accumulate(source)
+    inserted = np.ones(total, dtype=bool)
+    inserted[positions] = False
+
+    grid = data.iloc[source].reset_index(drop=True)
+    grid_index = np.arange(total) - np.repeat(grid_starts, lengths)
+    grid[time] = pd.to_datetime(np.repeat(times[starts], lengths) + grid_index * step)
+    kept = {time, group, *carry}
+    for column in grid.columns:
+        if column not in kept:
+            grid[column] = grid[column].mask(inserted)
+    return grid, inserted
+
+
+def _interpolate(values, times, codes, max_gap):
+    """
+    Interpolation linéaire (pondérée par le temps) des valeurs manquantes de toutes
+    les séries à la fois. Un trou n'est comblé que s'il est borné par deux relevés
+    du même groupe et ne dépasse pas `max_gap` valeurs consécutives.
+    """
+    n = len(values)
+    valid = ~np.isnan(values)
+    index = np.arange(n)
+    previous = np.maximum.accumulate(np.where(valid, index, -1))
+    following = np.minimum.accumulate(np.where(valid, index, n)[::-1])[::-1]
+
+    fillable = ~valid & (previous >= 0) & (following < n)
+    left = np.where(fillable, previous, 0)
+    right = np.where(fillable, following, 0)
+    fillable &= (codes[left] == codes) & (codes[right] == codes)
+    if max_gap is not None:
+        fillable &= (right - left - 1) <= max_gap
+
+    filled = values.copy()
+    left, right = left[fillable], right[fillable]
+    weight = (times[fillable] - times[left]) / (times[right] - times[left])
+    filled[fillable] = values[left] + weight * (values[right] - values[left])
+    return filled, fillable
+
+
+def _seasonal_profile(values, keys, codes, size):
+    """
+    Profil moyen de chaque groupe par clé saisonnière (0 là où aucun relevé n'existe).
+    """
+    valid = ~np.isnan(values)
+    slots = codes * size + keys
+    length = (int(codes.max()) + 1) * size if len(codes) else 0
+    sums = np.bincount(slots[valid], weights=values[valid], minlength=length)
+    counts = np.bincount(slots[valid], minlength=length)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        profile = np.where(counts > 0, sums / np.maximum(counts, 1), 0.0)
+    return profile[slots]
+
+
+def fill_gaps(frame, columns, group=None, time='date', freq=None, max_gap=None,
+              seasonal=None, mask_column='qualite', carry=()):
+    """
+    Comble les trous de toutes les séries de `frame` en une passe vectorisée.
+
+    Les données sont triées par `group` puis `time`. Avec `freq` (par exemple 'D'
+    ou 'h'), les relevés absents sont d'abord réinsérés sur une grille régulière ;
+    seules les colonnes d'identité `carry` (culture, coordonnées...) y sont recopiées.
+    Une série ayant un relevé hors grille ou une date en double n'est pas régularisée.
+    Chaque colonne de `columns` est ensuite interpolée linéairement dans son
+    groupe, ou autour d'un profil moyen `seasonal` ('hour' ou 'dayofyear') dont
+    seul l'écart est interpolé. Les trous de plus de `max_gap` valeurs restent vides.
+
+    La colonne `mask_column` indique par ligne OBSERVED, IMPUTED ou MISSING
+    (pire cas sur les colonnes traitées). Les lignes réinsérées qui n'ont pu
+    être comblées sont retirées.
+    """
+    keys = [group, time] if group is not None else [time]
+    data = frame.sort_values(by=keys, kind='mergesort').reset_index(drop=True)
+    columns = [column for column in columns if column in data.columns]
+
+    inserted = np.zeros(len(data), dtype=bool)
+    if freq is not None and len(data):
+        data, inserted = _regularize(data, group, time, freq, carry)
+
+    codes = _group_codes(data, group)
+    times = data[time].to_numpy(dtype='datetime64[ns]').view('int64').astype('float64')
+    if seasonal is not None:
+        key_function, size = SEASONAL_KEYS[seasonal]
+        seasonal_keys = key_function(data[time])
+
+    mask = np.full(len(data), OBSERVED, dtype=np.int8)
+    if mask_column in data.columns:
+        # Qualité d'un passage précédent, conservée pour les lignes d'origine
+        mask = np.maximum(mask, data[mask_column].fillna(OBSERVED).to_numpy(dtype=np.int8))
+    unfilled = np.ones(len(data), dtype=bool)
+
+    for column in columns:
+        values = data[column].to_numpy(dtype='float64')
+        if seasonal is not None:
+            profile = _seasonal_profile(values, seasonal_keys, codes, size)
+            filled, imputed = _interpolate(values - profile, times, codes, max_gap)
+            filled = np.where(imputed, filled + profile, values)
+        else:
+            filled, imputed = _interpolate(values, times, codes, max_gap)
+        data[column] = filled
+
+        missing = np.isnan(filled)
+        mask = np.maximum(mask, np.where(imputed, IMPUTED, np.where(missing, MISSING, OBSERVED)).astype(np.int8))
+        unfilled &= missing
+
+    data[mask_column] = mask
+    if columns and np.any(inserted & unfilled):
+        data = data[~(inserted & unfilled)].reset_index(drop=True)
+    return data
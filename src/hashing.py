@@ -0,0 +1,11 @@
+import hashlib
+
+import pandas as pd
+
+
+def data_version(frame, columns):
+    """
+    Empreinte du contenu des colonnes utilisées, servant de clé de cache ou de version.
+    """
+    hashed = pd.util.hash_pandas_object(frame[columns], index=True).to_numpy()
+    return hashlib.sha1(hashed.tobytes()).hexdigest()
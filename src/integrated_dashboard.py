@@ -132,9 +132,18 @@ from data_manager import AgriculturalDataManager
 
 if __name__ == "__main__":
 
-    # Load data
-    data_manager = AgriculturalDataManager()
-    data_manager.load_data()
+    # Attach to the shared snapshot; the first session runs the pipeline and publishes it.
+    # Streamlit reruns this script on every interaction: the session keeps its manager
+    # and only swaps in a newer published version.
+    if 'data_manager' in st.session_state:
+        data_manager = st.session_state['data_manager']
+        data_manager.refresh_snapshot()
+    else:
+        data_manager = AgriculturalDataManager()
+        if data_manager.attach_snapshot() is None:
+            data_manager.run_pipeline(targets=['features'])
+            data_manager.publish_snapshot()
+        st.session_state['data_manager'] = data_manager
 
     # Initialize dashboard
     dashboard = IntegratedDashboard(data_manager)
@@ -0,0 +1,295 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+# Noyaux groupés sur des tableaux triés par parcelle : le groupe g occupe la plage
+# contiguë [bounds[g], bounds[g + 1]). Les boucles sont compilées par Numba s'il est
+# installé ; sinon une version NumPy vectorisée aux mêmes résultats est utilisée.
+# Le paramètre `engine` ('numba' ou 'numpy') force l'une ou l'autre.
+NUMBA_AVAILABLE = njit is not None
+
+# Au-delà de ce nombre de cases, le comptage par cases passe d'un tableau dense à un tri
+DENSE_BIN_LIMIT = 50_000_000
+
+
+def _jit(function):
+    return njit(cache=True)(function) if NUMBA_AVAILABLE else function
+
+
+def _use_numba(engine):
+    if engine is None:
+        return NUMBA_AVAILABLE
+    if engine == 'numba' and not NUMBA_AVAILABLE:
+        raise ImportError("numba is not installed.")
+    return engine == 'numba'
+
+
+def group_bounds(*keys):
+    """
+    Bornes des groupes de lignes consécutives de même clé (tableaux déjà triés) :
+    tableau de n_groupes + 1 positions.
+    """
+    n = len(keys[0])
+    if n == 0:
+        return np.zeros(1, dtype=np.int64)
+    change = np.zeros(n - 1, dtype=bool)
+    for key in keys:
+        key = np.asarray(key)
+        change |= key[1:] != key[:-1]
+    return np.r_[0, np.flatnonzero(change) + 1, n].astype(np.int64)
+
+
+# Moyenne mobile ----------------------------------------------------------------
+
+@_jit
+def _rolling_mean_loop(values, bounds, window):
+    out = np.full(len(values), np.nan)
+    for g in range(len(bounds) - 1):
+        total = 0.0
+        missing = 0
+        for i in range(bounds[g], bounds[g + 1]):
+            value = values[i]
+            if np.isnan(value):
+                missing += 1
+            else:
+                total += value
+            if i - bounds[g] >= window:
+                old = values[i - window]
+                if np.isnan(old):
+                    missing -= 1
+                else:
+                    total -= old
+            if i - bounds[g] >= window - 1 and missing == 0:
+                out[i] = total / window
+    return out
+
+
+def _rolling_mean_numpy(values, bounds, window):
+    out = np.full(len(values), np.nan)
+    if len(values) < window:
+        return out
+    sums = np.lib.stride_tricks.sliding_window_view(values, window).sum(axis=1)
+    positions = np.arange(len(values)) - np.repeat(bounds[:-1], np.diff(bounds))
+    complete = positions >= window - 1
+    out[complete] = sums[np.flatnonzero(complete) - (window - 1)] / window
+    return out
+
+
+def grouped_rolling_mean(values, bounds, window, engine=None):
+    """
+    Moyenne mobile sur `window` lignes au sein de chaque groupe, comme
+    `rolling(window).mean()` : NaN tant que la fenêtre n'est pas complète ou
+    contient une valeur manquante.
+    """
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    bounds = np.asarray(bounds, dtype=np.int64)
+    if _use_numba(engine):
+        return _rolling_mean_loop(values, bounds, window)
+    return _rolling_mean_numpy(values, bounds, window)
+
+
+# Tendance linéaire ---------------------------------------------------------------
+
+@_jit
+def _linear_trend_loop(x, y, bounds):
+    n_groups = len(bounds) - 1
+    slope = np.full(n_groups, np.nan)
+    intercept = np.full(n_groups, np.nan)
+    mean_y = np.full(n_groups, np.nan)
+    count = np.zeros(n_groups, dtype=np.int64)
+    for g in range(n_groups):
+        sum_x = 0.0
+        sum_y = 0.0
+        n = 0
+        for i in range(bounds[g], bounds[g + 1]):
+            if not (np.isnan(x[i]) or np.isnan(y[i])):
+                sum_x += x[i]
+                sum_y += y[i]
+                n += 1
+        count[g] = n
+        if n == 0:
+            continue
+        mx = sum_x / n
+        my = sum_y / n
+        sxx = 0.0
+        sxy = 0.0
+        for i in range(bounds[g], bounds[g + 1]):
+            if not (np.isnan(x[i]) or np.isnan(y[i])):
+                dx = x[i] - mx
+                sxx += dx * dx
+                sxy += dx * (y[i] - my)
+        slope[g] = sxy / sxx if sxx > 0 else 0.0
+        intercept[g] = my - slope[g] * mx
+        mean_y[g] = my
+    return slope, intercept, mean_y, count
+
+
+def _linear_trend_numpy(x, y, bounds):
+    n_groups = len(bounds) - 1
+    valid = ~(np.isnan(x) | np.isnan(y))
+    # Bornes des groupes une fois les lignes incomplètes retirées
+    kept = np.r_[0, np.cumsum(valid)][bounds]
+    x, y = x[valid], y[valid]
+    count = np.diff(kept)
+    slope = np.full(n_groups, np.nan)
+    intercept = np.full(n_groups, np.nan)
+    mean_y = np.full(n_groups, np.nan)
+    present = count > 0
+    if not present.any():
+        return slope, intercept, mean_y, count
+
+    starts = kept[:-1][present]
+    mx = np.add.reduceat(x, starts) / count[present]
+    my = np.add.reduceat(y, starts) / count[present]
+    dx = x - np.repeat(mx, count[present])
+    dy = y - np.repeat(my, count[present])
+    sxx = np.add.reduceat(dx * dx, starts)
+    sxy = np.add.reduceat(dx * dy, starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope[present] = np.where(sxx > 0, sxy / sxx, 0.0)
+    intercept[present] = my - slope[present] * mx
+    mean_y[present] = my
+    return slope, intercept, mean_y, count
+
+
+def grouped_linear_trend(x, y, bounds, engine=None):
+    """
+    Régression linéaire y = pente * x + intercept de chaque groupe (moindres carrés
+    sur les valeurs centrées, lignes incomplètes ignorées). Retourne les tableaux
+    (pente, intercept, moyenne de y, nombre de points) ; la pente est nulle si x
+    est constant, comme la solution de norme minimale de LinearRegression.
+    """
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    y = np.ascontiguousarray(y, dtype=np.float64)
+    bounds = np.asarray(bounds, dtype=np.int64)
+    if _use_numba(engine):
+        return _linear_trend_loop(x, y, bounds)
+    return _linear_trend_numpy(x, y, bounds)
+
+
+# Moyenne et mode groupés -------------------------------------------------------------
+
+@_jit
+def _mean_mode_loop(values, codes, bounds, n_categories):
+    n_groups = len(bounds) - 1
+    means = np.full(n_groups, np.nan)
+    modes = np.full(n_groups, -1, dtype=np.int64)
+    counts = np.zeros(n_categories, dtype=np.int64)
+    for g in range(n_groups):
+        total = 0.0
+        n = 0
+        counts[:] = 0
+        for i in range(bounds[g], bounds[g + 1]):
+            if not np.isnan(values[i]):
+                total += values[i]
+                n += 1
+            if codes[i] >= 0:
+                counts[codes[i]] += 1
+        if n > 0:
+            means[g] = total / n
+        best = 0
+        for c in range(n_categories):
+            if counts[c] > best:
+                best = counts[c]
+                modes[g] = c
+    return means, modes
+
+
+def _mean_mode_numpy(values, codes, bounds, n_categories):
+    n_groups = len(bounds) - 1
+    groups = np.repeat(np.arange(n_groups), np.diff(bounds))
+    valid = ~np.isnan(values)
+    sums = np.bincount(groups[valid], weights=values[valid], minlength=n_groups)
+    counts = np.bincount(groups[valid], minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    coded = codes >= 0
+    table = np.bincount(groups[coded] * n_categories + codes[coded], minlength=n_groups * n_categories)
+    table = table.reshape(n_groups, n_categories)
+    # argmax retient la plus petite catégorie en cas d'égalité, comme mode()[0]
+    modes = np.where(table.sum(axis=1) > 0, table.argmax(axis=1), -1)
+    return means, modes
+
+
+def grouped_mean_mode(values, codes, bounds, n_categories, engine=None):
+    """
+    Moyenne de `values` (valeurs manquantes ignorées) et catégorie la plus fréquente
+    parmi les codes 0..n_categories - 1 (-1 : manquant) de chaque groupe. En cas
+    d'égalité, la plus petite catégorie est retenue ; -1 si le groupe n'a aucun code.
+    """
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    codes = np.ascontiguousarray(codes, dtype=np.int64)
+    bounds = np.asarray(bounds, dtype=np.int64)
+    if _use_numba(engine):
+        return _mean_mode_loop(values, codes, bounds, n_categories)
+    return _mean_mode_numpy(values, codes, bounds, n_categories)
+
+
+# Comptage par cases -------------------------------------------------------------------
+
+@_jit
+def _bin_keys_loop(groups, x, y, weights, x_width, y_width, x_low, y_low, n_x, n_y):
+    size = (groups.max() + 1) * n_x * n_y if len(groups) else 0
+    totals = np.zeros(size, dtype=np.float64)
+    counts = np.zeros(size, dtype=np.int64)
+    for i in range(len(groups)):
+        if np.isnan(x[i]) or np.isnan(y[i]) or groups[i] < 0:
+            continue
+        # Division entière flottante, comme floor_divide et `//` de pandas aux bornes des cases
+        key = (groups[i] * n_x + int(x[i] // x_width) - x_low) * n_y + int(y[i] // y_width) - y_low
+        totals[key] += weights[i]
+        counts[key] += 1
+    return totals, counts
+
+
+def _bin_numpy(groups, x_index, y_index, weights, n_x, n_y, dense):
+    keys = (groups * n_x + x_index) * n_y + y_index
+    if dense:
+        size = (int(groups.max()) + 1) * n_x * n_y
+        return np.bincount(keys, weights=weights, minlength=size), np.bincount(keys, minlength=size), None
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return np.bincount(inverse, weights=weights), np.bincount(inverse), unique
+
+
+def binned_counts(groups, x, y, weights, x_width, y_width, engine=None):
+    """
+    Somme des poids par (groupe, case de x, case de y), les cases étant
+    [k * largeur, (k + 1) * largeur[ comme `(x // largeur) * largeur`. `groups`
+    sont des codes entiers (-1 : ignoré). Retourne (groupe, borne de x, borne de y,
+    total) des cases non vides, triés par groupe puis x puis y.
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    valid = ~(np.isnan(x) | np.isnan(y)) & (groups >= 0)
+    empty = (np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), np.empty(0))
+    if not valid.any():
+        return empty
+
+    x_index = np.floor_divide(x[valid], x_width).astype(np.int64)
+    y_index = np.floor_divide(y[valid], y_width).astype(np.int64)
+    x_low, y_low = int(x_index.min()), int(y_index.min())
+    n_x, n_y = int(x_index.max()) - x_low + 1, int(y_index.max()) - y_low + 1
+    n_groups = int(groups[valid].max()) + 1
+    dense = n_groups * n_x * n_y <= DENSE_BIN_LIMIT
+
+    if _use_numba(engine) and dense:
+        totals, counts = _bin_keys_loop(
+            np.where(valid, groups, -1), x, y, weights, float(x_width), float(y_width), x_low, y_low, n_x, n_y,
+        )
+        keys = np.flatnonzero(counts)
+        totals = totals[keys]
+    else:
+        totals, counts, unique = _bin_numpy(groups[valid], x_index - x_low, y_index - y_low, weights[valid], n_x, n_y, dense)
+        keys = np.flatnonzero(counts) if unique is None else unique
+        totals = totals[counts > 0] if unique is None else totals
+
+    cell_groups, rest = np.divmod(keys, n_x * n_y)
+    cell_x, cell_y = np.divmod(rest, n_y)
+    return cell_groups, (cell_x + x_low) * float(x_width), (cell_y + y_low) * float(y_width), totals
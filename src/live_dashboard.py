@@ -0,0 +1,269 @@
+import argparse
+import io
+import os
+
+import pandas as pd
+
+from bokeh.io import curdoc
+from bokeh.layouts import column, row
+from bokeh.models import ColumnDataSource, DataTable, HoverTool, Select, TableColumn
+from bokeh.plotting import figure
+from data_manager import AgriculturalDataManager
+
+
+class SimulatedFeed:
+    """
+    Rejoue des observations déjà chargées comme un flux : chaque appel à
+    `next_batch` renvoie les lignes de monitoring et de météo de la période suivante.
+    """
+
+    def __init__(self, monitoring, weather, start, step=pd.Timedelta(days=1)):
+        self.monitoring = monitoring.sort_values(by='date', kind='mergesort').reset_index(drop=True)
+        self.weather = weather.sort_values(by='date', kind='mergesort').reset_index(drop=True)
+        self.current = pd.Timestamp(start)
+        self.step = step
+
+    def next_batch(self):
+        end = self.current + self.step
+        batch = tuple(
+            frame[(frame['date'] >= self.current) & (frame['date'] < end)]
+            for frame in (self.monitoring, self.weather)
+        )
+        self.current = end
+        return batch
+
+
+class CsvTailFeed:
+    """
+    Surveille des fichiers CSV en ajout (monitoring et météo) et renvoie à chaque
+    appel les seules lignes écrites depuis la lecture précédente.
+    """
+
+    def __init__(self, monitoring_path, weather_path=None):
+        self.paths = {'monitoring': monitoring_path, 'weather': weather_path}
+        self.offsets = {}
+        self.headers = {}
+        for name, path in self.paths.items():
+            if path is not None and os.path.exists(path):
+                with open(path) as handle:
+                    self.headers[name] = handle.readline()
+                    handle.seek(0, os.SEEK_END)
+                    self.offsets[name] = handle.tell()
+
+    def _read_new_rows(self, name):
+        path = self.paths[name]
+        if path is None or not os.path.exists(path):
+            return pd.DataFrame(columns=['date'])
+        with open(path) as handle:
+            if name not in self.headers:
+                self.headers[name] = handle.readline()
+                self.offsets[name] = handle.tell()
+            handle.seek(self.offsets[name])
+            chunk = handle.read()
+            # Ne traiter que les lignes complètes
+            complete = chunk[:chunk.rfind('\n') + 1]
+            self.offsets[name] += len(complete.encode())
+        if not complete:
+            return pd.DataFrame(columns=['date'])
+        return pd.read_csv(io.StringIO(self.headers[name] + complete), parse_dates=['date'])
+
+    def next_batch(self):
+        return self._read_new_rows('monitoring'), self._read_new_rows('weather')
+
+
+class LiveDashboard:
+    """
+    Tableau de bord Bokeh en direct (serveur Bokeh).
+
+    Les nouvelles observations sont poussées avec `ColumnDataSource.stream`
+    (avec `rollover` pour borner la mémoire du navigateur) et le tableau
+    d'état des parcelles est mis à jour par `patch` : seules les différences
+    transitent par le websocket.
+    """
+
+    STATUS_COLUMNS = ['parcelle_id', 'culture', 'date', 'ndvi', 'stress_hydrique', 'anomalie']
+
+    def __init__(self, data_manager, feed, rollover=2000, period_ms=1000, detect_anomalies=True):
+        self.data_manager = data_manager
+        self.feed = feed
+        self.rollover = rollover
+        self.period_ms = period_ms
+        self.detect_anomalies = detect_anomalies
+        # Observations diffusées depuis le chargement, par parcelle (au plus `rollover` lignes chacune)
+        self.streamed = {}
+        self.streamed_anomalies = {}
+        if detect_anomalies and self.data_manager.ndvi_detector is None:
+            self.data_manager.init_ndvi_anomaly_detector()
+
+    def _ndvi_history(self, parcelle_id):
+        """
+        Dernières observations NDVI d'une parcelle, chargées puis diffusées, dans la limite de `rollover`.
+        """
+        history = self.data_manager.query(parcels=parcelle_id, columns=['date', 'ndvi'], dataset='monitoring')
+        if parcelle_id in self.streamed:
+            history = pd.concat([history, self.streamed[parcelle_id]], ignore_index=True)
+        return dict(history.tail(self.rollover).to_dict(orient='list'))
+
+    def _anomaly_history(self, parcelle_id):
+        anomalies = self.streamed_anomalies.get(parcelle_id)
+        if anomalies is None:
+            return {'date': [], 'ndvi': [], 'zscore': []}
+        return dict(anomalies.to_dict(orient='list'))
+
+    def _buffer(self, buffers, rows, columns):
+        """
+        Ajoute les lignes diffusées au tampon de chaque parcelle, borné à `rollover`.
+        """
+        for parcelle_id, group in rows.groupby('parcelle_id', sort=False):
+            group = group[columns]
+            if parcelle_id in buffers:
+                group = pd.concat([buffers[parcelle_id], group], ignore_index=True)
+            buffers[parcelle_id] = group.tail(self.rollover).reset_index(drop=True)
+
+    def _status_table(self):
+        """
+        Dernière observation de chaque parcelle (une ligne par parcelle).
+        """
+        monitoring = self.data_manager.monitoring_data
+        last = monitoring.sort_values(by=['parcelle_id', 'date'], kind='mergesort').groupby('parcelle_id').tail(1)
+        status = last[['parcelle_id', 'culture', 'date', 'ndvi', 'stress_hydrique']].reset_index(drop=True)
+        status['anomalie'] = False
+        return status
+
+    def make_document(self, doc):
+        """
+        Construit les graphiques d'une session et programme la diffusion des nouvelles lignes.
+        """
+        status = self._status_table()
+        self.parcels = list(status['parcelle_id'])
+        self.status_rows = {parcel: i for i, parcel in enumerate(self.parcels)}
+        select = Select(title="Parcelle :", value=self.parcels[0], options=self.parcels)
+
+        self.ndvi_source = ColumnDataSource(self._ndvi_history(select.value))
+        self.anomaly_source = ColumnDataSource(data=self._anomaly_history(select.value))
+        weather = self.data_manager.weather_data[['date', 'temperature']].tail(self.rollover)
+        self.weather_source = ColumnDataSource(dict(weather.to_dict(orient='list')))
+        self.status_source = ColumnDataSource(status)
+
+        ndvi_plot = figure(title="NDVI en direct", x_axis_type="datetime", height=350, tools="pan,wheel_zoom,box_zoom,reset")
+        ndvi_plot.line(x='date', y='ndvi', source=self.ndvi_source, line_width=2, color="green", legend_label="NDVI")
+        ndvi_plot.circle(x='date', y='ndvi', source=self.anomaly_source, size=9, color="red", legend_label="Anomalie")
+        ndvi_plot.add_tools(HoverTool(tooltips=[("Date", "@date{%F}"), ("NDVI", "@ndvi{0.00}")], formatters={"@date": "datetime"}))
+        ndvi_plot.legend.location = "top_left"
+
+        weather_plot = figure(title="Température en direct", x_axis_type="datetime", height=350, tools="pan,wheel_zoom,box_zoom,reset")
+        weather_plot.line(x='date', y='temperature', source=self.weather_source, line_width=1, color="orange")
+
+        table = DataTable(
+            source=self.status_source,
+            columns=[TableColumn(field=column_name, title=column_name) for column_name in self.STATUS_COLUMNS],
+            height=300, width=800,
+        )
+
+        def on_parcel_change(attr, old, new):
+            # Seul changement complet : la sélection d'une autre parcelle
+            self.ndvi_source.data = self._ndvi_history(new)
+            self.anomaly_source.data = self._anomaly_history(new)
+
+        select.on_change('value', on_parcel_change)
+        self.select = select
+
+        doc.add_root(column(select, row(ndvi_plot, weather_plot), table))
+        doc.title = "Suivi agricole en direct"
+        doc.add_periodic_callback(self.push_updates, self.period_ms)
+        return doc
+
+    def push_updates(self):
+        """
+        Récupère le lot suivant du flux et n'envoie que les différences aux graphiques.
+        Retourne le nombre de lignes de monitoring et de météo diffusées.
+        """
+        monitoring, weather = self.feed.next_batch()
+
+        if not weather.empty:
+            new_weather = weather[['date', 'temperature']].sort_values(by='date', kind='mergesort')
+            self.weather_source.stream(new_weather.to_dict(orient='list'), rollover=self.rollover)
+
+        if monitoring.empty:
+            return 0, len(weather)
+
+        monitoring = monitoring.sort_values(by=['date', 'parcelle_id'], kind='mergesort')
+        scored = self.data_manager.detect_ndvi_anomalies(monitoring) if self.detect_anomalies else None
+        self._buffer(self.streamed, monitoring, ['date', 'ndvi'])
+        if scored is not None:
+            self._buffer(self.streamed_anomalies, scored[scored['anomalie']], ['date', 'ndvi', 'zscore'])
+
+        selected = monitoring[monitoring['parcelle_id'] == self.select.value]
+        if not selected.empty:
+            self.ndvi_source.stream(selected[['date', 'ndvi']].to_dict(orient='list'), rollover=self.rollover)
+        if scored is not None:
+            flagged = scored[scored['anomalie'] & (scored['parcelle_id'] == self.select.value)]
+            if not flagged.empty:
+                self.anomaly_source.stream(flagged[['date', 'ndvi', 'zscore']].to_dict(orient='list'), rollover=self.rollover)
+
+        # Mise à jour en place de la dernière observation de chaque parcelle
+        latest = monitoring.groupby('parcelle_id').tail(1)
+        if scored is not None:
+            anomalies = scored.groupby('parcelle_id')['anomalie'].any()
+            latest = latest.assign(anomalie=latest['parcelle_id'].map(anomalies).fillna(False).astype(bool))
+        else:
+            latest = latest.assign(anomalie=False)
+        latest = latest[latest['parcelle_id'].isin(self.status_rows)]
+        rows = latest['parcelle_id'].map(self.status_rows).to_numpy()
+        patches = {
+            column_name: list(zip(rows.tolist(), latest[column_name].tolist()))
+            for column_name in ['culture', 'date', 'ndvi', 'stress_hydrique', 'anomalie']
+        }
+        if len(rows):
+            self.status_source.patch(patches)
+        return len(monitoring), len(weather)
+
+
+def simulated_dashboard(data_dir="../data", history_days=365, rollover=2000, period_ms=1000):
+    """
+    Tableau de bord en direct alimenté par le rejeu des `history_days` derniers
+    jours : le gestionnaire ne connaît que l'historique antérieur.
+    """
+    data_manager = AgriculturalDataManager(data_dir=data_dir)
+    data_manager.load_data()
+    start = data_manager.monitoring_data['date'].max() - pd.Timedelta(days=history_days)
+
+    feed = SimulatedFeed(
+        data_manager.monitoring_data[data_manager.monitoring_data['date'] >= start],
+        data_manager.weather_data[data_manager.weather_data['date'] >= start],
+        start,
+    )
+    data_manager.monitoring_data = data_manager.monitoring_data[data_manager.monitoring_data['date'] < start].reset_index(drop=True)
+    data_manager.weather_data = data_manager.weather_data[data_manager.weather_data['date'] < start].reset_index(drop=True)
+    data_manager._setup_temporal_indices()
+    return LiveDashboard(data_manager, feed, rollover=rollover, period_ms=period_ms)
+
+
+if __name__.startswith("bokeh_app"):
+    # bokeh serve src/live_dashboard.py
+    simulated_dashboard().make_document(curdoc())
+
+elif __name__ == "__main__":
+    from bokeh.server.server import Server
+
+    parser = argparse.ArgumentParser(description="Tableau de bord agricole en direct (serveur Bokeh).")
+    parser.add_argument("--port", type=int, default=5006)
+    parser.add_argument("--watch", help="CSV de monitoring surveillé (à la place du flux simulé)")
+    parser.add_argument("--watch-weather", help="CSV météo surveillé")
+    parser.add_argument("--rollover", type=int, default=2000)
+    parser.add_argument("--period-ms", type=int, default=1000)
+    args = parser.parse_args()
+
+    def make_app(doc):
+        if args.watch:
+            data_manager = AgriculturalDataManager()
+            data_manager.load_data()
+            dashboard = LiveDashboard(data_manager, CsvTailFeed(args.watch, args.watch_weather), args.rollover, args.period_ms)
+        else:
+            dashboard = simulated_dashboard(rollover=args.rollover, period_ms=args.period_ms)
+        dashboard.make_document(doc)
+
+    server = Server({'/': make_app}, port=args.port)
+    server.start()
+    print(f"Tableau de bord en direct disponible sur http://localhost:{args.port}/")
+    server.io_loop.start()
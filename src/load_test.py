@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import numpy as np
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+
+
+ENDPOINTS = ["summary", "patterns", "yield-trend"]
+
+
+async def _worker(client, base_url, paths, latencies, errors):
+    """
+    Envoie les requêtes de la file une par une et mesure leur latence.
+    """
+    while paths:
+        path = paths.pop()
+        start = time.perf_counter()
+        try:
+            await client.fetch(f"{base_url}{path}", request_timeout=120)
+        except HTTPClientError as e:
+            errors.append((path, e.code))
+        except OSError as e:
+            errors.append((path, str(e)))
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_load_test(base_url, requests, concurrency, risk_share=0.05, seed=0):
+    """
+    Mélange aléatoire de requêtes sur toutes les parcelles envoyé avec
+    `concurrency` clients simultanés. Retourne les statistiques de latence.
+    """
+    AsyncHTTPClient.configure(None, max_clients=concurrency)
+    client = AsyncHTTPClient()
+    parcels = json.loads((await client.fetch(f"{base_url}/parcels")).body)
+
+    rng = random.Random(seed)
+    paths = [
+        "/risk" if rng.random() < risk_share else f"/parcels/{rng.choice(parcels)}/{rng.choice(ENDPOINTS)}"
+        for _ in range(requests)
+    ]
+
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*[_worker(client, base_url, paths, latencies, errors) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'elapsed': elapsed,
+        'throughput': len(latencies) / elapsed,
+        'p50': float(np.percentile(latencies, 50)),
+        'p95': float(np.percentile(latencies, 95)),
+        'p99': float(np.percentile(latencies, 99)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test de charge du service d'analyse local.")
+    parser.add_argument("--url", default="http://localhost:8888")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    stats = asyncio.run(run_load_test(args.url, args.requests, args.concurrency))
+
+    print(f"========= test de charge ({args.url}) =========")
+    print(f"Requêtes  : {stats['requests']} ({stats['errors']} erreurs) en {stats['elapsed']:.2f} s")
+    print(f"Débit     : {stats['throughput']:.1f} req/s")
+    print(f"Latence   : p50 {stats['p50']:.1f} ms, p95 {stats['p95']:.1f} ms, p99 {stats['p99']:.1f} ms")
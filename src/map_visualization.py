@@ -2,17 +2,29 @@ import folium
 from folium import plugins
 from branca.colormap import LinearColormap
 from data_manager import AgriculturalDataManager
+from rollups import summarize
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
+from kernels import group_bounds, grouped_linear_trend
 import webbrowser
 
 class AgriculturalMap:
-    def __init__(self, data_manager):
+    # Rapports par parcelle (report_generator.py), relativement à la carte enregistrée dans src/
+    REPORT_URL = "../reports/parcelles/rapport_{parcelle_id}.html"
+    # Nombre de parcelles similaires listées dans les popups
+    SIMILAR_PARCELS = 5
+
+    def __init__(self, data_manager, start=None, end=None, zoom_start=13, bounds=None):
         """
-        Initialise la carte avec le gestionnaire de données
+        Initialise la carte avec le gestionnaire de données, la fenêtre
+        temporelle [start, end] à afficher et, éventuellement, l'emprise
+        (south, west, north, east) à laquelle se limitent les couches
         """
         self.data_manager = data_manager
+        self.start = start
+        self.end = end
+        self.bounds = bounds
+        self.zoom_start = zoom_start
         self.map = None
         self.yield_colormap = LinearColormap(
             colors=["red", "yellow", "green"],
@@ -25,15 +37,26 @@ class AgriculturalMap:
         Crée la carte de base avec les couches appropriées
         """
         try:
-            self.data_manager.load_data()
-            features = self.data_manager.prepare_features()
-            avg_latitude = features['latitude'].mean()
-            avg_longitude = features['longitude'].mean()
+            # Réutiliser les données déjà détenues par le gestionnaire (instantané partagé, etc.)
+            if self.data_manager.features is None:
+                self.data_manager.run_pipeline(targets=['features'])
+            # Contours des parcelles s'ils sont disponibles, sinon des marqueurs
+            if self.data_manager.geometry is None:
+                self.data_manager.load_parcel_geometry()
+            if self.bounds is not None:
+                south, west, north, east = self.bounds
+                avg_latitude, avg_longitude = (south + north) / 2, (west + east) / 2
+            else:
+                features = self._get_features(columns=['latitude', 'longitude'])
+                avg_latitude = features['latitude'].mean()
+                avg_longitude = features['longitude'].mean()
             self.map = folium.Map(
                 location=[avg_latitude, avg_longitude],
-                zoom_start=13,
+                zoom_start=self.zoom_start,
                 tiles='OpenStreetMap'
             )
+            if self.bounds is not None:
+                self.map.fit_bounds([[south, west], [north, east]])
             print("Carte de base créée avec succès.")
         except Exception as e:
             print(f"Erreur lors de la création de la carte de base : {e}")
@@ -46,7 +69,7 @@ class AgriculturalMap:
             if self.map is None:
                 raise ValueError("La carte de base n'est pas initialisée. Appelez create_base_map d'abord.")
 
-            features = self.data_manager.prepare_features()
+            features = self._get_features()
 
             # Vérification des colonnes nécessaires
             required_columns = ['parcelle_id', 'latitude', 'longitude', 'rendement_estime', 'date', 'culture', 'ndvi']
@@ -59,51 +82,57 @@ class AgriculturalMap:
                 print("Création de la colonne 'date' à partir de 'date'.")
                 features['date'] = pd.to_datetime(features['date']).dt.year
 
+            # Rendements moyens par parcelle et par année, à partir des agrégats mensuels
+            yearly = self._get_yearly_yields()
+            mean_yields = self._get_window_means(['rendement_estime'])['rendement_estime']
+
             # Grouper par parcelle_id
             grouped = features.groupby('parcelle_id')
+            parcels = []
 
-            for parcelle_id, group in grouped:
-                # Vérification des données du groupe
-                if group.empty or 'latitude' not in group.columns or 'longitude' not in group.columns:
-                    print(f"Parcèle {parcelle_id} ignorée en raison de données manquantes.")
-                    continue
+            # Parcelles au profil le plus proche, en une requête pour toute la couche
+            similar = self.data_manager.similar_parcels(list(grouped.groups), k=self.SIMILAR_PARCELS)
+            similar = {} if similar is None else dict(tuple(similar.groupby('parcelle_id')))
 
-                # Calculer le rendement moyen
-                mean_yield = group['rendement_estime'].mean()
+            # Tendances des rendements de toutes les parcelles, en une passe
+            trends = self._calculate_yield_trends(list(grouped.groups))
 
-                # Calculer la tendance des rendements
-                trend = self._calculate_yield_trend(parcelle_id)
+            # Les coordonnées invalides sont écartées en amont par la validation des sources
+            for parcelle_id, group in grouped:
+                # Rendement moyen de la fenêtre affichée
+                mean_yield = mean_yields.get(parcelle_id, np.nan)
+
+                # Tendance des rendements (nulle sans assez de points)
+                trend = trends.get(parcelle_id, {'slope': 0, 'intercept': 0, 'variation_moyenne': 0})
 
                 # Créer le contenu de la popup pour l'historique des rendements
-                popup_content = self._create_yield_popup(group, mean_yield, trend)
+                history = yearly[yearly['parcelle_id'] == parcelle_id]
+                popup_content = self._create_yield_popup(history, mean_yield, trend)
 
                 # Ajouter les cultures récentes à la popup
-                recent_crops = self._format_recent_crops(group)
+                recent_crops = self._format_recent_crops(history)
                 popup_content += f"<h5 style='color: #2c3e50;'>Cultures récentes:</h5>{recent_crops}"
 
                 # Créer le contenu du popup pour les données NDVI actuelles
                 ndvi_popup_content = self._create_ndvi_popup(group.iloc[0])  # Utilise la première ligne de chaque groupe pour NDVI
                 popup_content += f"<h5 style='color: #2c3e50;'></h5>{ndvi_popup_content}"
 
+                # Ajouter les parcelles similaires (sol, rendement, NDVI)
+                if parcelle_id in similar:
+                    popup_content += self._format_similar_parcels(similar[parcelle_id])
+
                 # Ajouter à la carte
                 lat = group['latitude'].mean()
                 lon = group['longitude'].mean()
 
-                # Vérification des coordonnées
-                if not (-90 <= lat <= 90 and -180 <= lon <= 180):
-                    print(f"Parcèle {parcelle_id} ignorée en raison de coordonnées invalides : ({lat}, {lon})")
-                    continue
-
-                folium.CircleMarker(
-                    location=(lat, lon),
-                    radius=5,
-                    color=self.yield_colormap(mean_yield),
-                    fill=True,
-                    fill_color=self.yield_colormap(mean_yield),
-                    fill_opacity=0.7,
-                    popup=folium.Popup(popup_content, max_width=300)
-                ).add_to(self.map)
+                parcels.append({
+                    'parcelle_id': parcelle_id,
+                    'location': (lat, lon),
+                    'color': self.yield_colormap(mean_yield),
+                    'popup': popup_content,
+                })
 
+            self._add_parcels(parcels, "Historique des rendements")
             print("Couche d'historique des rendements ajoutée avec succès.")
 
         except Exception as e:
@@ -117,14 +146,17 @@ class AgriculturalMap:
             if self.map is None:
                 raise ValueError("La carte de base n'est pas initialisée. Appelez create_base_map d'abord.")
             
-            # Get features data
-            features = self.data_manager.prepare_features()
+            # Get features data for the displayed window
+            features = self._get_features()
 
             # Ensure the necessary columns are present
             required_columns = ['parcelle_id', 'latitude', 'longitude', 'ndvi', 'culture', 'date']
             if not all(col in features.columns for col in required_columns):
                 raise KeyError(f"Colonnes manquantes : {', '.join(required_columns)}")
             
+            # NDVI moyen de la fenêtre affichée, à partir des agrégats
+            mean_ndvi = self._get_window_means(['ndvi'])['ndvi']
+
             # Group by parcel ID
             grouped = features.groupby('parcelle_id')
             
@@ -135,11 +167,12 @@ class AgriculturalMap:
                 vmax=features['ndvi'].max()
             )
 
-            # Loop through each parcel to create markers on the map
+            # Loop through each parcel to create its shape or marker
+            parcels = []
             for parcelle_id, group in grouped:
                 lat = group['latitude'].mean()
                 lon = group['longitude'].mean()
-                ndvi = group['ndvi'].mean()
+                ndvi = mean_ndvi.get(parcelle_id, np.nan)
                 
                 # Prepare the popup content with NDVI and additional data
                 popup_content = f"""
@@ -150,17 +183,14 @@ class AgriculturalMap:
                     </div>
                 """
 
-                # Add the CircleMarker with popup to the map
-                folium.CircleMarker(
-                    location=(lat, lon),
-                    radius=5,
-                    color=ndvi_colormap(ndvi),
-                    fill=True,
-                    fill_color=ndvi_colormap(ndvi),
-                    fill_opacity=0.7,
-                    popup=folium.Popup(popup_content, max_width=300)
-                ).add_to(self.map)
+                parcels.append({
+                    'parcelle_id': parcelle_id,
+                    'location': (lat, lon),
+                    'color': ndvi_colormap(ndvi),
+                    'popup': popup_content,
+                })
 
+            self._add_parcels(parcels, "NDVI actuel")
             print("Couche NDVI actuelle ajoutée avec succès.")
 
         except Exception as e:
@@ -173,7 +203,7 @@ class AgriculturalMap:
         try:
             if self.map is None:
                 raise ValueError("La carte de base n'est pas initialisée. Appelez create_base_map d'abord.")
-            features = self.data_manager.prepare_features()
+            features = self._get_features().copy()
             # Assurer que les colonnes sont renommées si nécessaire
             features.rename(columns={
                 'lat': 'latitude',
@@ -181,7 +211,10 @@ class AgriculturalMap:
                 'yield': 'rendement_estime',
                 'year': 'date'
             }, inplace=True, errors='ignore')
-            risk_metrics = self.data_manager.calculate_risk_metrics(features)
+            # La série de risque, si elle est calculée, donne le risque de la fenêtre affichée
+            risk_metrics = self._get_window_risk()
+            if risk_metrics is None:
+                risk_metrics = self.data_manager.calculate_risk_metrics(features)
             if risk_metrics is None or features is None:
                 raise ValueError("Les métriques de risque ou les données de caractéristiques manquent.")
             merged_data = pd.merge(risk_metrics, features[['parcelle_id', 'latitude', 'longitude']], on='parcelle_id', how='left')
@@ -208,47 +241,139 @@ class AgriculturalMap:
         except Exception as e:
             print(f"Erreur lors de l'ajout de la carte de chaleur des risques : {e}")
 
-    def _calculate_yield_trend(self, parcelle_id):
+    def _add_parcels(self, parcels, name):
         """
-        Calcule la tendance des rendement_estimes en utilisant une régression linéaire.
-        Utilise l'historique des rendement_estime_estimes pour la parcelle donnée.
+        Ajoute les parcelles à la carte : les contours connus forment une seule
+        couche GeoJSON, à la résolution précalculée pour le zoom de la carte ;
+        les autres parcelles restent des marqueurs circulaires.
+        """
+        geometry = self.data_manager.geometry
+        with_shape = [parcel for parcel in parcels if geometry is not None and parcel['parcelle_id'] in geometry.polygons]
+
+        if with_shape:
+            properties = {parcel['parcelle_id']: {'color': parcel['color'], 'popup': parcel['popup']} for parcel in with_shape}
+            collection = geometry.feature_collection(
+                zoom=self.zoom_start,
+                parcels=[parcel['parcelle_id'] for parcel in with_shape],
+                properties=properties,
+            )
+            folium.GeoJson(
+                collection,
+                name=name,
+                style_function=lambda feature: {
+                    'color': feature['properties']['color'],
+                    'fillColor': feature['properties']['color'],
+                    'weight': 1,
+                    'fillOpacity': 0.6,
+                },
+                popup=folium.GeoJsonPopup(fields=['popup'], labels=False, localize=False, max_width=300),
+            ).add_to(self.map)
+
+        shaped = {parcel['parcelle_id'] for parcel in with_shape}
+        for parcel in parcels:
+            if parcel['parcelle_id'] in shaped:
+                continue
+            folium.CircleMarker(
+                location=parcel['location'],
+                radius=5,
+                color=parcel['color'],
+                fill=True,
+                fill_color=parcel['color'],
+                fill_opacity=0.7,
+                popup=folium.Popup(parcel['popup'], max_width=300)
+            ).add_to(self.map)
+
+    def _viewport_parcels(self):
+        """
+        Parcelles de l'emprise affichée (index spatial du gestionnaire), ou None sans emprise.
+        """
+        if self.bounds is None:
+            return None
+        return self.data_manager.parcels_in_bbox(*self.bounds)
+
+    def _get_features(self, columns=None):
+        """
+        Récupère les caractéristiques de la fenêtre et de l'emprise affichées
+        auprès du gestionnaire, sans reparcourir l'ensemble des données.
+        """
+        if self.data_manager.features is None:
+            self.data_manager.run_pipeline(targets=['features'])
+        return self.data_manager.query(parcels=self._viewport_parcels(), start=self.start, end=self.end, columns=columns)
+
+    def _get_window_means(self, metrics, resolution=None):
+        """
+        Moyennes par parcelle sur la fenêtre affichée, recombinées à partir des
+        agrégats matérialisés (sommes et nombres de chaque période).
+        """
+        rollup = self.data_manager.get_rollup(resolution, parcels=self._viewport_parcels(), start=self.start, end=self.end, metrics=metrics)
+        metrics = [metric for metric in metrics if f"{metric}_sum" in rollup.columns]
+        return summarize(rollup, ['parcelle_id'], metrics).set_index('parcelle_id')
+
+    def _get_yearly_yields(self):
+        """
+        Rendement moyen et dernière culture observée par parcelle et par année,
+        à partir des agrégats mensuels.
+        """
+        monthly = self.data_manager.get_rollup('month', parcels=self._viewport_parcels(), start=self.start, end=self.end, metrics=['rendement_estime'])
+        monthly['annee'] = monthly['debut_periode'].dt.year
+        yearly = summarize(monthly, ['parcelle_id', 'annee'], ['rendement_estime'])
+        return yearly[['parcelle_id', 'annee', 'culture', 'rendement_estime']]
+
+    def _get_window_risk(self):
+        """
+        Moyenne par parcelle de l'indice de risque résolu dans le temps sur la
+        fenêtre affichée, ou None si la série n'a pas été calculée.
+        """
+        if self.data_manager.risk_timeline is None:
+            return None
+        means = self._get_window_means(['risk_index'], resolution='day')
+        if 'risk_index' not in means.columns or means.empty:
+            return None
+        return means['risk_index'].rename('avg_risk_index').reset_index()
+
+    def _calculate_yield_trends(self, parcels):
+        """
+        Calcule la tendance annuelle des rendement_estimes de chaque parcelle par régression linéaire.
+        Les historiques, triés par parcelle, sont traités en une passe par le noyau groupé ;
+        les parcelles sans au moins deux rendements distincts sont absentes du résultat.
         """
         try:
-            # Filtrer l'historique des rendement_estimes pour la parcelle donnée
-            ph = self.data_manager.yield_history[self.data_manager.yield_history['parcelle_id'] == parcelle_id].copy()
-            
-            if ph.empty or ph['rendement_estime'].nunique() < 2:
-                # Pas assez de points de données pour une régression significative
-                return {'slope': 0, 'intercept': 0, 'variation_moyenne': 0}
-            
-            # Assurer que la colonne 'date' est au format numérique (année en entier)
-            ph['date'] = ph['date'].dt.year  # Convertit en année numérique
-            
-            # Trier et retirer les doublons par année
-            ph = ph.drop_duplicates(subset=['date']).sort_values(by='date')
-            
-            # Préparer les données pour la régression
-            X = ph['date'].values.reshape(-1, 1)
-            y = ph['rendement_estime'].values
-            
-            # Exécuter la régression linéaire
-            model = LinearRegression().fit(X, y)
-            slope = model.coef_[0]
-            intercept = model.intercept_
-            variation = slope / y.mean() if y.mean() != 0 else 0
+            ph = self.data_manager.query(parcels=parcels, dataset='yield')
+            if ph is None or ph.empty:
+                return {}
+
+            # Parcelles ayant assez de points de données pour une régression significative
+            varied = ph.groupby('parcelle_id', sort=False)['rendement_estime'].nunique() >= 2
+
+            # Année numérique ; une seule ligne par parcelle et par année (la première)
+            ph = pd.DataFrame({
+                'parcelle_id': ph['parcelle_id'].to_numpy(),
+                'date': ph['date'].dt.year.to_numpy(),
+                'rendement_estime': ph['rendement_estime'].to_numpy(),
+            }).drop_duplicates(subset=['parcelle_id', 'date'])
+            ph = ph[ph['parcelle_id'].isin(varied.index[varied])]
+
+            # Régression linéaire de chaque parcelle (lignes contiguës, triées par date)
+            ids = ph['parcelle_id'].to_numpy()
+            bounds = group_bounds(ids)
+            slopes, intercepts, means, _ = grouped_linear_trend(ph['date'].to_numpy(), ph['rendement_estime'].to_numpy(), bounds)
 
             return {
-                'slope': slope,
-                'intercept': intercept,
-                'variation_moyenne': variation
+                parcelle_id: {
+                    'slope': slope,
+                    'intercept': intercept,
+                    'variation_moyenne': slope / mean if mean != 0 else 0,
+                }
+                for parcelle_id, slope, intercept, mean in zip(ids[bounds[:-1]], slopes, intercepts, means)
             }
         except Exception as e:
-            print(f"Erreur lors du calcul de la tendance des rendement_estimes pour la parcelle {parcelle_id} : {e}")
-            return {'slope': 0, 'intercept': 0, 'variation_moyenne': 0}
-        
+            print(f"Erreur lors du calcul des tendances des rendement_estimes : {e}")
+            return {}
+
     def _create_yield_popup(self, history, mean_yield, trend):
         """
         Crée le contenu HTML pour la popup d'historique des rendements.
+        `history` contient les rendements moyens annuels de la parcelle (annee, rendement_estime).
         """
         try:
             # Valider les entrées
@@ -277,14 +402,8 @@ class AgriculturalMap:
                 <ul style="margin: 0; padding-left: 15px;">
             """
 
-            # Ajouter l'année et la moyenne des rendements
-            history['annee'] = history['date'].dt.year  # Extract the year from the date
-
-            # Group by 'annee' (year) and calculate the mean of rendement_estime for each year
-            yearly_yields = history.groupby('annee')['rendement_estime'].mean().reset_index()
-
             # Ajouter les détails des rendements moyens par année
-            for _, row in yearly_yields.iterrows():
+            for _, row in history.iterrows():
                 year = row['annee']
                 yield_value = row['rendement_estime']
                 popup_content += f"<li>{year}: {yield_value:.2f} t/ha</li>"
@@ -327,6 +446,20 @@ class AgriculturalMap:
             print(f"Erreur lors du formatage des cultures récentes : {e}")
             return "<div>Erreur lors du formatage des cultures récentes.</div>"
 
+    def _format_similar_parcels(self, neighbours):
+        """
+        Formate pour le popup la liste des parcelles similaires, avec un lien vers leur rapport
+        """
+        items = "".join(
+            f"<li><a href='{self.REPORT_URL.format(parcelle_id=row.voisin)}' target='_blank'>{row.voisin}</a>"
+            f" (distance {row.distance:.2f})</li>"
+            for row in neighbours.itertuples()
+        )
+        return (
+            "<h5 style='margin-top: 10px; margin-bottom: 5px; color: #2c3e50;'>Parcelles similaires :</h5>"
+            f"<ul style='margin: 0; padding-left: 15px;'>{items}</ul>"
+        )
+
     def _create_ndvi_popup(self, row):
         """
         Crée le contenu HTML du popup pour les données NDVI actuelles
@@ -353,9 +486,9 @@ class AgriculturalMap:
             return "<div>Erreur lors de la création du popup NDVI.</div>"
 
 if __name__ == "__main__":
-    # Initialiser AgriculturalDataManager et charger les données
+    # Initialiser AgriculturalDataManager et préparer les caractéristiques (pipeline en cache)
     data_manager = AgriculturalDataManager()
-    data_manager.load_data()
+    data_manager.run_pipeline(targets=['features'])
 
     # Initialiser AgriculturalMap
     agri_map = AgriculturalMap(data_manager)
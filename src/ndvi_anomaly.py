@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+
+
+# État par parcelle : moyenne et variance exponentielles du résidu NDVI, nombre d'observations
+STATE_DTYPE = np.dtype([('mean', 'f8'), ('var', 'f8'), ('count', 'i4')])
+
+
+def _circular_sum(values, width):
+    """
+    Somme glissante centrée de largeur `width` le long du dernier axe,
+    en bouclant sur l'année.
+    """
+    pad = width // 2
+    wrapped = np.concatenate([values[:, -pad:], values, values[:, :width - pad - 1]], axis=1)
+    cumulative = np.concatenate([np.zeros((values.shape[0], 1)), np.cumsum(wrapped, axis=1)], axis=1)
+    return cumulative[:, width:] - cumulative[:, :-width]
+
+
+class NDVIAnomalyDetector:
+    """
+    Détecteur en ligne d'anomalies NDVI.
+
+    Chaque observation est comparée à l'attente saisonnière de sa culture
+    (NDVI moyen par culture et jour de l'année). Le résidu est suivi par
+    parcelle avec une moyenne et une variance exponentielles (EWMA) : l'état
+    tient dans un tableau compact de taille fixe par parcelle, et une
+    observation est signalée lorsque son z-score dépasse `threshold`.
+    """
+
+    def __init__(self, alpha=0.1, threshold=3.0, warmup=10, smoothing_days=15):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.smoothing_days = smoothing_days
+        self.cultures = np.array([], dtype=object)
+        self.expectation = np.zeros((0, 366))
+        self.parcels = np.array([], dtype=object)
+        self.state = np.zeros(0, dtype=STATE_DTYPE)
+
+    def fit_expectation(self, monitoring_data):
+        """
+        Construit l'attente saisonnière : NDVI moyen par culture et jour de
+        l'année, lissé par une moyenne mobile circulaire.
+        """
+        data = monitoring_data[['culture', 'date', 'ndvi']].dropna()
+        self.cultures = np.array(sorted(data['culture'].unique()), dtype=object)
+        culture_codes = np.searchsorted(self.cultures, data['culture'].to_numpy())
+        days = data['date'].dt.dayofyear.to_numpy() - 1
+
+        flat = culture_codes * 366 + days
+        sums = np.bincount(flat, weights=data['ndvi'].to_numpy(), minlength=len(self.cultures) * 366).reshape(-1, 366)
+        counts = np.bincount(flat, minlength=len(self.cultures) * 366).reshape(-1, 366).astype(float)
+
+        # Lissage circulaire sur l'année pour combler les jours peu observés
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.expectation = _circular_sum(sums, self.smoothing_days) / _circular_sum(counts, self.smoothing_days)
+
+        overall = data['ndvi'].mean()
+        self.expectation[np.isnan(self.expectation)] = overall
+        return self
+
+    def _positions(self, parcels):
+        """
+        Positions des parcelles dans le tableau d'état ; les nouvelles parcelles
+        y sont ajoutées avec un état vierge.
+        """
+        positions = np.searchsorted(self.parcels, parcels)
+        found = positions < len(self.parcels)
+        found[found] = self.parcels[positions[found]] == parcels[found]
+        if found.all():
+            return positions
+
+        unknown = np.unique(parcels[~found])
+        merged = np.concatenate([self.parcels, unknown]).astype(object)
+        order = np.argsort(merged, kind='stable')
+        state = np.concatenate([self.state, np.zeros(len(unknown), dtype=STATE_DTYPE)])
+        self.parcels, self.state = merged[order], state[order]
+        return np.searchsorted(self.parcels, parcels)
+
+    def _culture_codes(self, cultures):
+        """
+        Ligne de la table d'attente de chaque culture, et masque des cultures connues.
+        """
+        if not len(self.cultures):
+            return np.zeros(len(cultures), dtype=bool), np.zeros(len(cultures), dtype=int)
+        codes = np.clip(np.searchsorted(self.cultures, cultures), 0, len(self.cultures) - 1)
+        return self.cultures[codes] == cultures, codes
+
+    def update(self, observations):
+        """
+        Traite un lot d'observations (parcelle_id, date, culture, ndvi) : calcule
+        le z-score de chaque résidu avant de mettre à jour l'état de sa parcelle.
+        Plusieurs observations d'une même parcelle sont traitées dans l'ordre des dates.
+        """
+        batch = observations[['parcelle_id', 'date', 'culture', 'ndvi']].dropna(subset=['ndvi'])
+        batch = batch.sort_values(by=['date'], kind='mergesort')
+        # Recherche des parcelles et cultures sur les seules valeurs distinctes du lot
+        parcel_codes, parcels = pd.factorize(batch['parcelle_id'])
+        positions = self._positions(np.asarray(parcels, dtype=object))[parcel_codes]
+        culture_codes, cultures = pd.factorize(batch['culture'])
+        known, rows_codes = self._culture_codes(np.asarray(cultures, dtype=object))
+        # Culture manquante (code -1) : dernière entrée, sans attente connue (repli global)
+        known, rows_codes = np.append(known, False), np.append(rows_codes, 0)
+        days = batch['date'].dt.dayofyear.to_numpy() - 1
+        expected = np.where(
+            known[culture_codes],
+            self.expectation[rows_codes[culture_codes], days],
+            np.nanmean(self.expectation),
+        )
+        residuals = batch['ndvi'].to_numpy(dtype=float) - expected
+        zscores = np.full(len(batch), np.nan)
+
+        # Une passe vectorisée par rang d'apparition de la parcelle dans le lot
+        ranks = pd.Series(parcel_codes).groupby(parcel_codes).cumcount().to_numpy()
+        by_rank = np.argsort(ranks, kind='stable')
+        bounds = np.searchsorted(ranks[by_rank], np.arange(ranks.max() + 2 if len(batch) else 0))
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            rows = by_rank[start:end]
+            where = positions[rows]
+            state = self.state[where]
+            deviation = residuals[rows] - state['mean']
+
+            with np.errstate(invalid='ignore', divide='ignore'):
+                z = deviation / np.sqrt(state['var'])
+            zscores[rows] = np.where(state['count'] >= self.warmup, z, np.nan)
+
+            first = state['count'] == 0
+            new_mean = np.where(first, residuals[rows], state['mean'] + self.alpha * deviation)
+            new_var = np.where(first, 0.0, (1 - self.alpha) * (state['var'] + self.alpha * deviation ** 2))
+            self.state['mean'][where] = new_mean
+            self.state['var'][where] = new_var
+            self.state['count'][where] = state['count'] + 1
+
+        result = batch.copy()
+        result['ndvi_attendu'] = expected
+        result['residu'] = residuals
+        result['zscore'] = zscores
+        result['anomalie'] = np.abs(np.nan_to_num(zscores)) > self.threshold
+        return result
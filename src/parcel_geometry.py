@@ -0,0 +1,187 @@
+import json
+import math
+
+import numpy as np
+
+
+# Niveaux de zoom pour lesquels une version simplifiée des contours est précalculée
+ZOOM_LEVELS = (10, 12, 14, 16)
+
+# Simplification en NumPy plutôt qu'avec shapely.simplify (shapely est pourtant dans
+# requirements.txt) : chaque anneau garde au moins trois sommets, de sorte qu'une petite
+# parcelle reste visible aux zooms faibles au lieu de devenir une géométrie vide.
+
+# Tolérance de simplification et pas de quantification, en pixels à l'écran
+TOLERANCE_PIXELS = 0.5
+QUANTIZATION_PIXELS = 0.25
+
+
+def pixel_size(zoom, latitude=0.0):
+    """
+    Taille d'un pixel en degrés au niveau de zoom `zoom` (tuiles Web Mercator de 256 px),
+    réduite par cos(latitude) pour rester valable dans les deux directions.
+    """
+    return 360.0 / (256 * 2 ** zoom) * math.cos(math.radians(latitude))
+
+
+def douglas_peucker(points, tolerance):
+    """
+    Indices des sommets conservés par l'algorithme de Douglas-Peucker sur la
+    polyligne `points` (n, 2). Version itérative : chaque segment est traité
+    avec un calcul vectorisé des distances de ses sommets intermédiaires.
+    """
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = points[first], points[last]
+        inner = points[first + 1:last]
+        segment = end - start
+        length = np.hypot(segment[0], segment[1])
+        if length == 0:
+            distances = np.hypot(inner[:, 0] - start[0], inner[:, 1] - start[1])
+        else:
+            distances = np.abs(segment[0] * (inner[:, 1] - start[1]) - segment[1] * (inner[:, 0] - start[0])) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)
+
+
+def simplify_ring(ring, tolerance):
+    """
+    Simplifie un anneau fermé en le coupant au sommet le plus éloigné du premier,
+    de sorte que les deux moitiés soient simplifiées séparément. Un anneau garde
+    au moins trois sommets distincts pour rester un polygone valide ; un anneau
+    dégénéré (tous ses sommets confondus) est retourné tel quel.
+    """
+    open_ring = ring[:-1]
+    if len(open_ring) <= 3:
+        return ring
+    offsets = open_ring - open_ring[0]
+    split = int(np.argmax(np.hypot(offsets[:, 0], offsets[:, 1])))
+    if split == 0:
+        return ring
+    first_half = douglas_peucker(open_ring[:split + 1], tolerance)
+    second_half = split + douglas_peucker(np.vstack([open_ring[split:], open_ring[:1]]), tolerance)
+    kept = np.concatenate([first_half, second_half[1:-1]])
+
+    if len(kept) < 3:
+        # Polygone plus petit que la tolérance : triangle des sommets extrêmes
+        remaining = np.setdiff1d(np.arange(len(open_ring)), [0, split])
+        axis = open_ring[split] - open_ring[0]
+        offsets = open_ring[remaining] - open_ring[0]
+        third = remaining[np.argmax(np.abs(axis[0] * offsets[:, 1] - axis[1] * offsets[:, 0]))]
+        kept = np.sort(np.array([0, split, third]))
+    return np.vstack([open_ring[kept], open_ring[:1]])
+
+
+def quantize(ring, step):
+    """
+    Arrondit les coordonnées à une grille de pas `step` (en degrés) et supprime
+    les sommets consécutifs devenus identiques. Retourne des listes de flottants
+    au nombre de décimales utile, pour un GeoJSON compact.
+    """
+    decimals = max(0, math.ceil(-math.log10(step)))
+    snapped = np.round(np.round(ring / step) * step, decimals)
+    distinct = np.r_[True, np.any(snapped[1:] != snapped[:-1], axis=1)]
+    snapped = snapped[distinct]
+    if len(snapped) < 4:
+        snapped = np.round(ring, decimals)
+    return snapped.tolist()
+
+
+class ParcelGeometry:
+    """
+    Contours des parcelles (GeoJSON local) et leurs versions simplifiées par niveau de zoom.
+
+    Pour chaque niveau de ZOOM_LEVELS, les anneaux sont simplifiés (Douglas-Peucker,
+    tolérance d'un demi-pixel) puis quantifiés sur une grille d'un quart de pixel.
+    La carte n'embarque que la version correspondant à son zoom.
+    """
+
+    def __init__(self, polygons):
+        # parcelle_id -> liste de polygones, chacun liste d'anneaux (n, 2) en (longitude, latitude)
+        self.polygons = polygons
+        self.levels = {}
+
+    @classmethod
+    def from_geojson(cls, path, id_property='parcelle_id'):
+        """
+        Lit une FeatureCollection de Polygon / MultiPolygon identifiés par `id_property`.
+        """
+        with open(path, encoding='utf-8') as source:
+            collection = json.load(source)
+        polygons = {}
+        for feature in collection['features']:
+            geometry = feature['geometry']
+            parts = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+            polygons.setdefault(feature['properties'][id_property], []).extend(
+                [np.asarray(ring, dtype='float64')[:, :2] for ring in part] for part in parts
+            )
+        return cls(polygons)
+
+    @property
+    def parcels(self):
+        return list(self.polygons)
+
+    def centroid_latitude(self):
+        return float(np.mean([polygon[0][:, 1].mean() for parts in self.polygons.values() for polygon in parts]))
+
+    def precompute(self, zooms=ZOOM_LEVELS):
+        """
+        Calcule les contours simplifiés et quantifiés pour chaque niveau de zoom.
+        """
+        latitude = self.centroid_latitude() if self.polygons else 0.0
+        for zoom in zooms:
+            pixel = pixel_size(zoom, latitude)
+            self.levels[zoom] = {
+                parcelle_id: [
+                    [quantize(simplify_ring(ring, TOLERANCE_PIXELS * pixel), QUANTIZATION_PIXELS * pixel) for ring in polygon]
+                    for polygon in parts
+                ]
+                for parcelle_id, parts in self.polygons.items()
+            }
+        return self
+
+    def level_for_zoom(self, zoom):
+        """
+        Niveau précalculé assez détaillé pour `zoom` : le plus petit niveau >= zoom, sinon le plus détaillé.
+        """
+        if not self.levels:
+            self.precompute()
+        candidates = [level for level in self.levels if level >= zoom]
+        return min(candidates) if candidates else max(self.levels)
+
+    def vertex_count(self, zoom=None):
+        """
+        Nombre total de sommets, à pleine résolution ou au niveau `zoom`.
+        """
+        if zoom is None:
+            return sum(len(ring) for parts in self.polygons.values() for polygon in parts for ring in polygon)
+        level = self.levels[self.level_for_zoom(zoom)]
+        return sum(len(ring) for parts in level.values() for polygon in parts for ring in polygon)
+
+    def feature_collection(self, zoom=None, parcels=None, properties=None):
+        """
+        FeatureCollection GeoJSON des parcelles demandées, à la résolution du
+        zoom donné (pleine résolution si `zoom` vaut None). `properties` associe
+        à chaque parcelle les propriétés à embarquer (couleur, popup, ...).
+        """
+        source = self.polygons if zoom is None else self.levels[self.level_for_zoom(zoom)]
+        parcels = self.polygons.keys() if parcels is None else [parcelle_id for parcelle_id in parcels if parcelle_id in source]
+        features = []
+        for parcelle_id in parcels:
+            parts = [[np.asarray(ring).tolist() for ring in polygon] for polygon in source[parcelle_id]]
+            geometry = {'type': 'Polygon', 'coordinates': parts[0]} if len(parts) == 1 else {'type': 'MultiPolygon', 'coordinates': parts}
+            feature_properties = {'parcelle_id': parcelle_id}
+            if properties is not None:
+                feature_properties.update(properties.get(parcelle_id, {}))
+            features.append({'type': 'Feature', 'properties': feature_properties, 'geometry': geometry})
+        return {'type': 'FeatureCollection', 'features': features}
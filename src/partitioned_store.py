@@ -0,0 +1,219 @@
+import json
+import os
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+MANIFEST = "manifest.json"
+
+# Nombre de régions par année
+N_REGIONS = 16
+
+# Position de chaque ligne dans la source, conservée pour relire les lignes dans l'ordre d'origine
+ROW_COLUMN = '_ligne'
+
+
+def spatial_regions(parcels, latitudes, longitudes, n_regions=N_REGIONS):
+    """
+    Découpe l'emprise des parcelles en une grille d'environ `n_regions` régions
+    d'effectifs comparables (quantiles de latitude puis de longitude).
+    Retourne le dictionnaire parcelle -> région.
+    """
+    side = max(1, int(round(np.sqrt(n_regions))))
+    latitudes = np.asarray(latitudes, dtype='float64')
+    longitudes = np.asarray(longitudes, dtype='float64')
+    quantiles = np.linspace(0, 1, side + 1)[1:-1]
+    rows = np.searchsorted(np.nanquantile(latitudes, quantiles), latitudes, side='right')
+    cols = np.searchsorted(np.nanquantile(longitudes, quantiles), longitudes, side='right')
+    return dict(zip(np.asarray(parcels, dtype=object).tolist(), (rows * side + cols).tolist()))
+
+
+def parcel_region(parcels, regions=None, n_regions=N_REGIONS):
+    """
+    Région de chaque identifiant de parcelle : celle du découpage spatial `regions`
+    si la parcelle y figure, sinon un groupe de hachage stable de l'identifiant.
+    """
+    parcels = np.atleast_1d(np.asarray(parcels, dtype=object))
+    hashed = (pd.util.hash_array(parcels) % np.uint64(n_regions)).astype(np.int64)
+    if not regions:
+        return hashed
+    mapped = pd.Series(parcels).map(regions).to_numpy(dtype='float64')
+    return np.where(np.isnan(mapped), hashed, mapped).astype(np.int64)
+
+
+def source_signature(path):
+    """
+    Taille et date de modification d'un fichier source, pour savoir si une partition est à jour.
+    """
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class PartitionedStore:
+    """
+    Jeux de données sources partitionnés sur disque par année et par région.
+
+    Chaque partition est un fichier Parquet `<jeu>/annee=<AAAA>/region=<RR>/<id>.parquet`
+    (la région vient d'un découpage spatial des parcelles, ou à défaut d'un hachage
+    de leur identifiant ; les jeux sans date ou sans parcelle ne sont partitionnés
+    que sur l'autre clé). Le manifeste recense, pour chaque jeu, le découpage et les
+    partitions avec leurs bornes de dates et leur nombre de lignes : une lecture ne
+    charge que les partitions qui recoupent la fenêtre temporelle et les parcelles
+    demandées, en parallèle, et rend les lignes dans l'ordre de la source. Les lignes
+    sans date vont dans `annee=unknown` : elles ne sont pas perdues et restent
+    visibles de la validation.
+
+    Une réécriture crée de nouveaux fichiers puis remplace atomiquement le manifeste ;
+    les anciens fichiers ne sont supprimés qu'ensuite.
+    """
+
+    def __init__(self, root, n_regions=N_REGIONS):
+        self.root = root
+        self.n_regions = n_regions
+
+    def manifest(self):
+        """
+        Contenu du manifeste (jeu -> description des partitions), vide s'il n'existe pas.
+        """
+        try:
+            with open(os.path.join(self.root, MANIFEST), encoding="utf-8") as source:
+                return json.load(source)
+        except FileNotFoundError:
+            return {}
+
+    def _write_manifest(self, manifest):
+        handle, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".", suffix=".tmp")
+        with os.fdopen(handle, "w", encoding="utf-8") as output:
+            json.dump(manifest, output, indent=1)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, os.path.join(self.root, MANIFEST))
+
+    def is_current(self, dataset, source=None):
+        """
+        Indique si le jeu est partitionné et, si `source` est donné, à jour par rapport à ce fichier.
+        """
+        entry = self.manifest().get(dataset)
+        if entry is None:
+            return False
+        return source is None or entry.get('source') == source_signature(source)
+
+    def write(self, dataset, frame, source=None, regions=None):
+        """
+        Partitionne `frame` par année de 'date' et région de 'parcelle_id' (d'après
+        le découpage `regions`, parcelle -> région) et remplace les partitions du
+        jeu `dataset`. `source` est le fichier d'origine dont la signature est
+        conservée dans le manifeste.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        has_dates = 'date' in frame.columns
+        has_parcels = 'parcelle_id' in frame.columns
+        keys = [key for key, present in (('parcelle_id', has_parcels), ('date', has_dates)) if present]
+        columns = list(frame.columns)
+        frame = frame.assign(**{ROW_COLUMN: np.arange(len(frame), dtype=np.int64)})
+        frame = frame.sort_values(by=keys, kind='mergesort').reset_index(drop=True)
+
+        # Année NaN pour les dates manquantes : groupe conservé (dropna=False)
+        years = frame['date'].dt.year.to_numpy(dtype='float64') if has_dates else np.zeros(len(frame))
+        regions = regions if has_parcels else None
+        partition_regions = parcel_region(frame['parcelle_id'].to_numpy(), regions, self.n_regions) if has_parcels else np.zeros(len(frame), dtype=np.int64)
+        generation = uuid.uuid4().hex[:12]
+
+        partitions = []
+        for (year, region), rows in frame.groupby([years, partition_regions], sort=True, dropna=False).indices.items():
+            part = frame.iloc[rows]
+            dated = has_dates and not np.isnan(year)
+            year_directory = f"annee={int(year)}" if dated else ("annee=unknown" if has_dates else "annee=all")
+            directory = os.path.join(dataset, year_directory, f"region={region:02d}" if has_parcels else "region=all")
+            os.makedirs(os.path.join(self.root, directory), exist_ok=True)
+            path = os.path.join(directory, f"{generation}.parquet")
+            pq.write_table(pa.Table.from_pandas(part, preserve_index=False), os.path.join(self.root, path))
+            partitions.append({
+                'path': path,
+                'year': int(year) if dated else None,
+                'region': int(region) if has_parcels else None,
+                'rows': int(len(part)),
+                'date_min': part['date'].min().isoformat() if dated else None,
+                'date_max': part['date'].max().isoformat() if dated else None,
+            })
+
+        manifest = self.manifest()
+        previous = manifest.get(dataset, {}).get('partitions', [])
+        manifest[dataset] = {
+            'columns': columns,
+            'n_regions': self.n_regions,
+            'regions': regions,
+            'source': source_signature(source) if source is not None else None,
+            'partitions': partitions,
+        }
+        self._write_manifest(manifest)
+
+        for partition in previous:
+            try:
+                os.remove(os.path.join(self.root, partition['path']))
+            except FileNotFoundError:
+                pass
+        return partitions
+
+    def partitions(self, dataset, start=None, end=None, parcels=None):
+        """
+        Partitions du jeu `dataset` qui recoupent [start, end] et contiennent
+        potentiellement les parcelles demandées (élagage sur le manifeste seul).
+        """
+        entry = self.manifest().get(dataset)
+        if entry is None:
+            raise KeyError(f"Dataset '{dataset}' is not partitioned.")
+
+        selected = entry['partitions']
+        if start is not None:
+            start = pd.Timestamp(start)
+            selected = [p for p in selected if p['date_max'] is None or pd.Timestamp(p['date_max']) >= start]
+        if end is not None:
+            end = pd.Timestamp(end)
+            selected = [p for p in selected if p['date_min'] is None or pd.Timestamp(p['date_min']) <= end]
+        if parcels is not None:
+            regions = set(parcel_region(parcels, entry.get('regions'), entry['n_regions']).tolist())
+            selected = [p for p in selected if p['region'] is None or p['region'] in regions]
+        return selected
+
+    def read(self, dataset, start=None, end=None, parcels=None, columns=None, max_workers=8):
+        """
+        Lit en parallèle les partitions retenues puis filtre exactement les lignes
+        sur la fenêtre [start, end] et les parcelles. Retourne un DataFrame dont les
+        lignes sont dans l'ordre du fichier source.
+        """
+        entry = self.manifest().get(dataset)
+        if entry is None:
+            raise KeyError(f"Dataset '{dataset}' is not partitioned.")
+        selected = self.partitions(dataset, start, end, parcels)
+
+        filters = []
+        if start is not None and 'date' in entry['columns']:
+            filters.append(('date', '>=', pd.Timestamp(start)))
+        if end is not None and 'date' in entry['columns']:
+            filters.append(('date', '<=', pd.Timestamp(end)))
+        if parcels is not None and 'parcelle_id' in entry['columns']:
+            filters.append(('parcelle_id', 'in', list(np.atleast_1d(parcels))))
+
+        read_columns = None if columns is None else list(columns) + [ROW_COLUMN]
+
+        def read_partition(partition):
+            # Pas de découverte des clés dans le chemin : elles ne sont pas des colonnes du jeu
+            return pq.read_table(
+                os.path.join(self.root, partition['path']), columns=read_columns, filters=filters or None, partitioning=None,
+            )
+
+        if not selected:
+            # Aucune partition retenue : table vide au schéma du jeu
+            schema = pq.read_schema(os.path.join(self.root, entry['partitions'][0]['path']))
+            empty = schema.empty_table()
+            return (empty.select(columns) if columns is not None else empty.drop_columns([ROW_COLUMN])).to_pandas()
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(selected)))) as executor:
+            tables = list(executor.map(read_partition, selected))
+        table = pa.concat_tables(tables)
+        return table.sort_by(ROW_COLUMN).drop_columns([ROW_COLUMN]).to_pandas()
@@ -0,0 +1,290 @@
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import pickle
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class Stage:
+    """
+    Étape du pipeline : une méthode du gestionnaire de données (ou une fonction
+    recevant le gestionnaire) avec ses entrées et sorties déclarées.
+
+    `inputs` associe un nom logique à l'attribut du gestionnaire à renseigner
+    avant l'appel ; `args` liste les entrées passées en argument positionnel.
+    `outputs` associe un nom logique à l'attribut lu après l'appel, ou à
+    RETURN_VALUE pour la valeur retournée. `state` fixe d'autres attributs,
+    `sources` liste les fichiers lus et `params` les arguments nommés, dont la
+    configuration lue par l'étape. `modules` nomme les modules auxiliaires
+    qu'elle appelle, dont le code entre dans l'empreinte du cache.
+    """
+
+    def __init__(self, name, method, inputs=None, outputs=None, args=None, params=None, state=None, sources=None,
+                 modules=None):
+        self.name = name
+        self.method = method
+        self.inputs = inputs or {}
+        self.outputs = outputs or {}
+        self.args = args or []
+        self.params = params or {}
+        self.state = state or {}
+        self.sources = sources or []
+        self.modules = modules or []
+
+    def function(self, manager):
+        return getattr(manager, self.method) if isinstance(self.method, str) else self.method
+
+    def code_hash(self, manager):
+        """
+        Empreinte du code exécuté : le module entier qui définit la méthode (avec sa
+        configuration) et les modules auxiliaires `modules`. Une modification de
+        l'un d'eux invalide le cache.
+        """
+        function = self.function(manager)
+        digest = hashlib.sha1()
+        for module in [inspect.getmodule(function)] + [importlib.import_module(name) for name in self.modules]:
+            try:
+                source = inspect.getsource(module)
+            except (OSError, TypeError):
+                source = getattr(function, '__qualname__', repr(function))
+            digest.update(source.encode())
+        return digest.hexdigest()
+
+
+# Sortie lue dans la valeur retournée par l'étape plutôt que dans un attribut
+RETURN_VALUE = '@return'
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """
+    Empreinte du contenu d'un fichier source.
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def value_hash(value):
+    """
+    Empreinte du contenu d'une sortie, utilisée comme entrée des étapes suivantes :
+    une étape dont la sortie ne change pas n'invalide pas la suite du pipeline.
+    """
+    return hashlib.sha1(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+
+class Pipeline:
+    """
+    Graphe d'étapes exécuté dans l'ordre des dépendances.
+
+    Le résultat de chaque étape est mis en cache dans `cache_dir` sous une
+    empreinte de son code, de ses paramètres, de ses fichiers sources et du
+    contenu de ses entrées : une nouvelle exécution ne relance que les étapes
+    affectées. Les étapes indépendantes s'exécutent en parallèle, chacune sur
+    un gestionnaire fourni par `factory`, qui doit lever les erreurs des étapes :
+    une étape en échec interrompt l'exécution et n'est jamais mise en cache.
+    Seules les `keep` entrées les plus récemment utilisées de chaque étape sont conservées.
+    """
+
+    def __init__(self, stages, cache_dir, factory, max_workers=4, keep=3):
+        self.stages = {stage.name: stage for stage in stages}
+        self.cache_dir = cache_dir
+        self.keep = keep
+        self.factory = factory
+        self.max_workers = max_workers
+        self.producers = {}
+        for stage in stages:
+            for output in stage.outputs:
+                if output in self.producers:
+                    raise ValueError(f"Output '{output}' is produced by both '{self.producers[output]}' and '{stage.name}'")
+                self.producers[output] = stage.name
+        self.last_run = {}
+
+    def dependencies(self, stage):
+        return {self.producers[name] for name in stage.inputs if name in self.producers}
+
+    def required_stages(self, targets=None):
+        """
+        Étapes nécessaires pour produire `targets` (noms de sorties), toutes par défaut.
+        """
+        if targets is None:
+            return set(self.stages)
+        missing = [target for target in targets if target not in self.producers]
+        if missing:
+            raise KeyError(f"Unknown pipeline outputs: {missing}")
+        required, pending = set(), [self.producers[target] for target in targets]
+        while pending:
+            name = pending.pop()
+            if name not in required:
+                required.add(name)
+                pending.extend(self.dependencies(self.stages[name]))
+        return required
+
+    def cache_key(self, stage, input_hashes):
+        manager = self.factory()
+        description = {
+            'stage': stage.name,
+            'code': stage.code_hash(manager),
+            'params': stage.params,
+            'state': stage.state,
+            'inputs': {name: input_hashes[name] for name in sorted(stage.inputs)},
+            'sources': [file_hash(path) for path in stage.sources],
+        }
+        return hashlib.sha1(json.dumps(description, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _cache_path(self, stage, key, extension):
+        return os.path.join(self.cache_dir, stage.name, f"{key}.{extension}")
+
+    def _cached_hashes(self, stage, key):
+        """
+        Empreintes des sorties d'une entrée de cache, sans charger les sorties.
+        """
+        try:
+            with open(self._cache_path(stage, key, 'json')) as cached:
+                return json.load(cached)
+        except FileNotFoundError:
+            return None
+
+    def _load_outputs(self, stage, key):
+        with open(self._cache_path(stage, key, 'pkl'), 'rb') as cached:
+            return pickle.load(cached)
+
+    def _write_atomic(self, path, write, mode):
+        """
+        Écrit sous un nom temporaire puis renomme : une entrée de cache n'est
+        jamais lue à moitié écrite.
+        """
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        handle, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        with os.fdopen(handle, mode) as output:
+            write(output)
+        os.replace(tmp_path, path)
+
+    def _store(self, stage, key, outputs, hashes):
+        # Les empreintes sont écrites en dernier : leur présence valide l'entrée
+        self._write_atomic(
+            self._cache_path(stage, key, 'pkl'),
+            lambda output: pickle.dump(outputs, output, protocol=pickle.HIGHEST_PROTOCOL), 'wb',
+        )
+        self._write_atomic(self._cache_path(stage, key, 'json'), lambda output: json.dump(hashes, output), 'w')
+        self._prune(stage)
+
+    def _prune(self, stage):
+        """
+        Supprime les entrées de l'étape au-delà des `keep` plus récemment utilisées
+        (date de modification de leurs empreintes, rafraîchie à chaque reprise du cache).
+        """
+        directory = os.path.join(self.cache_dir, stage.name)
+        entries = []
+        for name in os.listdir(directory):
+            key, extension = os.path.splitext(name)
+            if extension == '.json' and not name.startswith('.'):
+                try:
+                    entries.append((os.path.getmtime(os.path.join(directory, name)), key))
+                except FileNotFoundError:
+                    continue
+        for _, key in sorted(entries, reverse=True)[self.keep:]:
+            # Les empreintes d'abord : l'entrée cesse d'être valide avant que ses sorties disparaissent
+            for extension in ('json', 'pkl'):
+                try:
+                    os.remove(self._cache_path(stage, key, extension))
+                except FileNotFoundError:
+                    pass
+
+    def _execute(self, stage, values):
+        """
+        Exécute une étape sur un gestionnaire neuf renseigné avec ses entrées.
+        Les DataFrames sont passés en copie superficielle pour ne pas modifier les sorties partagées.
+        """
+        manager = self.factory()
+        for attribute, value in stage.state.items():
+            setattr(manager, attribute, value)
+
+        inputs = {
+            name: value.copy(deep=False) if hasattr(value, 'copy') and hasattr(value, 'columns') else value
+            for name, value in ((name, values[name]) for name in stage.inputs)
+        }
+        for name, attribute in stage.inputs.items():
+            if attribute is not None:
+                setattr(manager, attribute, inputs[name])
+
+        function = stage.function(manager)
+        arguments = [inputs[name] for name in stage.args]
+        result = function(*arguments, **stage.params) if isinstance(stage.method, str) else function(manager, *arguments, **stage.params)
+
+        outputs = {}
+        for name, attribute in stage.outputs.items():
+            outputs[name] = result if attribute == RETURN_VALUE else getattr(manager, attribute)
+            if outputs[name] is None:
+                raise RuntimeError(f"Stage '{stage.name}' did not produce '{name}'")
+        return outputs
+
+    def _value(self, name, values, keys):
+        """
+        Valeur d'une sortie, chargée depuis le cache à la première demande.
+        """
+        if name not in values:
+            producer = self.stages[self.producers[name]]
+            values.update(self._load_outputs(producer, keys[producer.name]))
+        return values[name]
+
+    def _run_stage(self, stage, values, hashes, keys):
+        key = self.cache_key(stage, hashes)
+        cached = self._cached_hashes(stage, key)
+        if cached is not None:
+            try:
+                os.utime(self._cache_path(stage, key, 'json'))
+            except FileNotFoundError:
+                pass
+            return stage.name, key, {}, cached, True
+
+        inputs = {name: self._value(name, values, keys) for name in stage.inputs}
+        outputs = self._execute(stage, inputs)
+        output_hashes = {name: value_hash(value) for name, value in outputs.items()}
+        self._store(stage, key, outputs, output_hashes)
+        return stage.name, key, outputs, output_hashes, False
+
+    def run(self, targets=None, fetch=None):
+        """
+        Exécute les étapes nécessaires à `targets` et retourne le dictionnaire
+        nom de sortie -> valeur pour `targets` (toutes les sorties par défaut) et
+        les sorties intermédiaires demandées dans `fetch`. Les résultats en cache
+        ne sont chargés que s'ils sont demandés ou nécessaires à une étape relancée.
+        `last_run` indique pour chaque étape si son résultat provient du cache.
+        """
+        required = self.required_stages(targets)
+        done, values, hashes, keys = set(), {}, {}, {}
+        self.last_run = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            while len(done) < len(required):
+                ready = [
+                    name for name in required
+                    if name not in done and name not in running.values()
+                    and self.dependencies(self.stages[name]) <= done
+                ]
+                for name in ready:
+                    future = executor.submit(self._run_stage, self.stages[name], values, hashes, keys)
+                    running[future] = name
+                if not running:
+                    raise RuntimeError(f"Pipeline has a cycle among stages {sorted(required - done)}")
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    del running[future]
+                    name, key, outputs, output_hashes, cached = future.result()
+                    keys[name] = key
+                    values.update(outputs)
+                    hashes.update(output_hashes)
+                    self.last_run[name] = 'cache' if cached else 'run'
+                    done.add(name)
+
+        names = list(targets) if targets is not None else list(hashes)
+        names += [name for name in fetch or [] if name in hashes and name not in names]
+        return {name: self._value(name, values, keys) for name in names}
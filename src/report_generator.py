@@ -0,0 +1,235 @@
+import argparse
+import glob
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import matplotlib
+matplotlib.use("Agg")  # rendu hors écran, sans serveur graphique
+import matplotlib.pyplot as plt
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from data_manager import AgriculturalDataManager
+from hashing import data_version
+
+
+# À incrémenter quand le rendu des graphiques change, pour invalider les images en cache
+CHART_VERSION = "1"
+
+# Gestionnaire de données du processus courant (renseigné dans chaque worker)
+_WORKER = {}
+
+
+def _write_atomic(path, write, mode="w"):
+    """
+    Écrit `path` via un fichier temporaire renommé : un rapport n'est jamais lu à moitié écrit.
+    """
+    handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+    with os.fdopen(handle, mode) as output:
+        write(output)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+
+def _init_worker(data_dir, snapshot_root, snapshot_version, template_dir):
+    """
+    Initialise un worker : attachement sans copie à l'instantané partagé des
+    données préparées et chargement des modèles de rapport.
+    """
+    manager = AgriculturalDataManager(data_dir=data_dir)
+    manager.attach_snapshot(root=snapshot_root, version=snapshot_version)
+    _init_templates(manager, template_dir)
+
+
+def _init_templates(manager, template_dir):
+    _WORKER['manager'] = manager
+    _WORKER['templates'] = Environment(
+        loader=FileSystemLoader(template_dir),
+        autoescape=select_autoescape(['html']),
+    )
+
+
+def _chart_key(parcelle_id, features, yields):
+    """
+    Empreinte des données tracées : l'image en cache est réutilisée tant qu'elles ne changent pas.
+    """
+    content = "|".join([
+        CHART_VERSION,
+        parcelle_id,
+        data_version(features, ['date', 'ndvi']),
+        data_version(yields, ['date', 'rendement_estime']),
+    ])
+    return hashlib.sha1(content.encode()).hexdigest()[:16]
+
+
+def _render_chart(path, features, yields, ndvi_history):
+    """
+    Trace en une figure le NDVI (avec moyenne mobile) et l'historique des rendements estimés.
+    """
+    figure, (ndvi_axis, yield_axis) = plt.subplots(2, 1, figsize=(10, 7), sharex=True)
+    ndvi_axis.plot(features['date'], features['ndvi'], color="green", linewidth=0.8, label="NDVI")
+    if ndvi_history is not None:
+        moving_average = ndvi_history['ndvi_moving_avg']
+        ndvi_axis.plot(moving_average.index, moving_average.values, color="darkgreen", linewidth=2, label="Moyenne mobile 30 j")
+    ndvi_axis.set_ylabel("NDVI")
+    ndvi_axis.legend(loc="upper left")
+    ndvi_axis.grid(alpha=0.3)
+
+    yield_axis.plot(yields['date'], yields['rendement_estime'], color="orange", marker="o", markersize=3)
+    yield_axis.set_ylabel("Rendement estimé (t/ha)")
+    yield_axis.grid(alpha=0.3)
+    figure.tight_layout()
+
+    _write_atomic(path, lambda output: figure.savefig(output, format="png", dpi=90), mode="wb")
+    plt.close(figure)
+
+
+def _to_pdf(html_path):
+    """
+    Conversion locale HTML -> PDF avec pandoc (xelatex). Retourne le chemin du PDF ou None.
+    """
+    if shutil.which("pandoc") is None:
+        return None
+    pdf_path = os.path.splitext(html_path)[0] + ".pdf"
+    result = subprocess.run(
+        ["pandoc", os.path.basename(html_path), "-o", os.path.basename(pdf_path), "--pdf-engine=xelatex"],
+        cwd=os.path.dirname(html_path), capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        print(f"Erreur pandoc pour {html_path} : {result.stderr.strip()}")
+        return None
+    return pdf_path
+
+
+def render_parcel_report(parcelle_id, output_dir, pdf=False):
+    """
+    Produit le rapport HTML d'une parcelle (et son PDF si demandé) à partir du
+    gestionnaire du processus. Retourne (parcelle, chemin du rapport, image reprise du cache).
+    """
+    manager = _WORKER['manager']
+    try:
+        features = manager.query(parcels=parcelle_id, columns=['date', 'ndvi'])
+        yields = manager.query(parcels=parcelle_id, columns=['date', 'rendement_estime'], dataset='yield')
+        if yields is None or yields.empty:
+            # Historique des rendements absent de l'instantané : celui des caractéristiques
+            yields = manager.query(parcels=parcelle_id, columns=['date', 'rendement_estime']).dropna()
+
+        summary = manager.get_parcel_summary(parcelle_id)
+        ndvi_history, ndvi_trend = manager.get_temporal_patterns(parcelle_id)
+        yield_analysis = manager.analyze_yield_patterns(parcelle_id)
+
+        chart_dir = os.path.join(output_dir, "charts")
+        chart_name = f"{parcelle_id}_{_chart_key(parcelle_id, features, yields)}.png"
+        chart_path = os.path.join(chart_dir, chart_name)
+        cached = os.path.exists(chart_path)
+        if not cached:
+            for stale in glob.glob(os.path.join(chart_dir, f"{parcelle_id}_*.png")):
+                os.remove(stale)
+            _render_chart(chart_path, features, yields, ndvi_history)
+
+        html = _WORKER['templates'].get_template("rapport_parcelle.html").render(
+            summary=summary,
+            chart=f"charts/{chart_name}",
+            ndvi_trend=ndvi_trend,
+            ndvi_stats=ndvi_history['summary_stats'] if ndvi_history else None,
+            yield_analysis=yield_analysis,
+            generated=datetime.now().strftime("%Y-%m-%d %H:%M"),
+        )
+        report_path = os.path.join(output_dir, f"rapport_{parcelle_id}.html")
+        _write_atomic(report_path, lambda output: output.write(html))
+        if pdf:
+            _to_pdf(report_path)
+        return parcelle_id, report_path, cached
+
+    except Exception as e:
+        print(f"Erreur lors de la génération du rapport de {parcelle_id} : {e}")
+        return parcelle_id, None, False
+
+
+class ReportGenerator:
+    """
+    Génération par lots des rapports d'analyse par parcelle.
+
+    Les données préparées sont publiées une fois dans un instantané partagé ;
+    chaque processus du pool s'y attache sans copie et rend les rapports d'un
+    sous-ensemble de parcelles. Les graphiques sont tracés hors écran et
+    réutilisés tant que les données de la parcelle ne changent pas.
+    """
+
+    def __init__(self, data_manager, output_dir="../reports/parcelles", template_dir="../reports/templates", workers=None):
+        self.data_manager = data_manager
+        self.output_dir = output_dir
+        self.template_dir = template_dir
+        self.workers = workers or os.cpu_count()
+
+    def _shared_snapshot(self):
+        """
+        Version de l'instantané partagé avec les workers, publiée si nécessaire.
+        """
+        if self.data_manager.features is None:
+            self.data_manager.run_pipeline(targets=['features'])
+        if self.data_manager.snapshot_version is None:
+            self.data_manager.publish_snapshot()
+        return self.data_manager.snapshot_version
+
+    def generate(self, parcels=None, pdf=False):
+        """
+        Produit un rapport par parcelle (toutes par défaut) et la page d'index.
+        Retourne la liste des (parcelle, chemin du rapport, image reprise du cache).
+        """
+        try:
+            os.makedirs(os.path.join(self.output_dir, "charts"), exist_ok=True)
+            version = self._shared_snapshot()
+            if parcels is None:
+                parcels = sorted(self.data_manager.features['parcelle_id'].unique())
+
+            if self.workers == 1:
+                # Exécution dans le processus courant, sans pool
+                _init_templates(self.data_manager, self.template_dir)
+                results = [render_parcel_report(parcelle_id, self.output_dir, pdf) for parcelle_id in parcels]
+            else:
+                initargs = (self.data_manager.data_dir, self.data_manager._snapshot_root(), version, self.template_dir)
+                with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=initargs) as executor:
+                    chunksize = max(1, len(parcels) // (4 * self.workers))
+                    results = list(executor.map(
+                        render_parcel_report, parcels,
+                        [self.output_dir] * len(parcels), [pdf] * len(parcels),
+                        chunksize=chunksize,
+                    ))
+
+            self._write_index(results)
+            return results
+
+        except Exception as e:
+            print(f"Erreur lors de la génération des rapports : {e}")
+            return None
+
+    def _write_index(self, results):
+        templates = Environment(loader=FileSystemLoader(self.template_dir), autoescape=select_autoescape(['html']))
+        html = templates.get_template("index.html").render(
+            reports=[(parcelle_id, os.path.basename(path)) for parcelle_id, path, _ in results if path],
+            generated=datetime.now().strftime("%Y-%m-%d %H:%M"),
+        )
+        _write_atomic(os.path.join(self.output_dir, "index.html"), lambda output: output.write(html))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génération des rapports d'analyse par parcelle.")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--pdf", action="store_true", help="Convertit aussi chaque rapport en PDF avec pandoc")
+    parser.add_argument("--parcels", nargs="*", help="Parcelles à traiter (toutes par défaut)")
+    args = parser.parse_args()
+
+    data_manager = AgriculturalDataManager()
+    if data_manager.attach_snapshot() is None:
+        data_manager.run_pipeline(targets=['features'])
+
+    results = ReportGenerator(data_manager, workers=args.workers).generate(parcels=args.parcels, pdf=args.pdf)
+    if results is not None:
+        generated = [result for result in results if result[1]]
+        reused = sum(1 for result in generated if result[2])
+        print(f"{len(generated)} rapports générés ({reused} graphiques repris du cache) dans ../reports/parcelles/")
@@ -0,0 +1,177 @@
+import os
+import numpy as np
+import pandas as pd
+
+
+TIMELINE_COLUMNS = ['parcelle_id', 'date', 'risk_index', 'risk_category']
+
+
+class RollingRiskIndex:
+    """
+    Indice de risque résolu dans le temps, par parcelle.
+
+    Chaque observation est normalisée par la moyenne et l'écart-type de la
+    variable sur toutes les parcelles dans la fenêtre glissante des
+    `window_days` derniers jours, puis pondérée comme dans
+    `calculate_risk_metrics`. L'état conservé (agrégats journaliers de la
+    fenêtre, dernier rendement connu par parcelle) permet de ne traiter que
+    les nouvelles lignes lors d'une mise à jour.
+    """
+
+    def __init__(self, features, weights, thresholds, labels, window_days=90):
+        self.features = list(features)
+        self.weights = np.asarray(weights, dtype=float)
+        self.thresholds = np.asarray(thresholds, dtype=float)
+        self.labels = list(labels)
+        self.window_days = window_days
+        self.reset()
+
+    def reset(self):
+        """
+        Réinitialise l'état de la fenêtre glissante.
+        """
+        n_features = len(self.features)
+        self.window_dates = np.array([], dtype='datetime64[ns]')
+        self.window_sums = np.zeros((0, n_features))
+        self.window_squares = np.zeros((0, n_features))
+        self.window_counts = np.zeros((0, n_features))
+        self.last_values = {}
+        self.last_date = None
+        # Parcelles déjà traitées à la dernière date : ses autres parcelles restent attendues
+        self.last_parcels = set()
+
+    def _forward_fill(self, rows):
+        """
+        Propage par parcelle la dernière valeur connue de chaque variable
+        (le rendement estimé n'est observé qu'une fois par mois), en repartant
+        des dernières valeurs mémorisées.
+        """
+        values = rows[self.features].copy()
+        for column in self.features:
+            carried = rows['parcelle_id'].map(
+                {parcel: last[column] for parcel, last in self.last_values.items()}
+            )
+            first_rows = ~rows['parcelle_id'].duplicated()
+            seeded = values[column].where(~(first_rows & values[column].isna()), carried)
+            values[column] = seeded.groupby(rows['parcelle_id'].to_numpy()).ffill()
+        return values.to_numpy(dtype=float)
+
+    def update(self, rows):
+        """
+        Calcule l'indice des lignes (parcelle, date) non encore traitées, datées
+        de la dernière date traitée ou après, et fait avancer la fenêtre glissante.
+        Les lignes d'une parcelle arrivées après les autres à la dernière date
+        enrichissent les agrégats de ce jour ; celles déjà produites pour ce jour
+        ne sont pas recalculées. Les lignes plus anciennes sont ignorées.
+        Retourne les nouvelles lignes.
+        """
+        if self.last_date is not None:
+            rows = rows[
+                (rows['date'] > self.last_date)
+                | ((rows['date'] == self.last_date) & ~rows['parcelle_id'].isin(self.last_parcels))
+            ]
+        if rows.empty:
+            return pd.DataFrame(columns=TIMELINE_COLUMNS)
+
+        rows = rows.drop_duplicates(subset=['parcelle_id', 'date'], keep='last').sort_values(by=['parcelle_id', 'date'], kind='mergesort')
+        values = self._forward_fill(rows)
+        valid = ~np.isnan(values)
+
+        # Agrégats journaliers (toutes parcelles) des nouvelles dates
+        dates = rows['date'].to_numpy(dtype='datetime64[ns]')
+        new_dates, date_ids = np.unique(dates, return_inverse=True)
+        filled = np.where(valid, values, 0.0)
+        sums = np.stack([np.bincount(date_ids, weights=filled[:, j], minlength=len(new_dates)) for j in range(values.shape[1])], axis=1)
+        squares = np.stack([np.bincount(date_ids, weights=filled[:, j] ** 2, minlength=len(new_dates)) for j in range(values.shape[1])], axis=1)
+        counts = np.stack([np.bincount(date_ids, weights=valid[:, j], minlength=len(new_dates)) for j in range(values.shape[1])], axis=1)
+
+        # Fenêtre et nouveaux jours réunis ; la dernière date traitée peut recevoir de nouvelles lignes
+        all_dates, positions = np.unique(np.concatenate([self.window_dates, new_dates]), return_inverse=True)
+
+        def merged(window, new):
+            total = np.zeros((len(all_dates), window.shape[1]))
+            np.add.at(total, positions, np.vstack([window, new]))
+            return total
+
+        all_sums = merged(self.window_sums, sums)
+        all_squares = merged(self.window_squares, squares)
+        all_counts = merged(self.window_counts, counts)
+
+        # Statistiques de fenêtre par différence de sommes cumulées
+        cumulative = lambda a: np.vstack([np.zeros((1, a.shape[1])), np.cumsum(a, axis=0)])
+        cum_sums, cum_squares, cum_counts = cumulative(all_sums), cumulative(all_squares), cumulative(all_counts)
+        ends = np.searchsorted(all_dates, new_dates, side='right')
+        starts = np.searchsorted(all_dates, new_dates - np.timedelta64(self.window_days - 1, 'D'), side='left')
+        window_counts = cum_counts[ends] - cum_counts[starts]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = (cum_sums[ends] - cum_sums[starts]) / window_counts
+            variances = (cum_squares[ends] - cum_squares[starts]) / window_counts - means ** 2
+        stds = np.sqrt(np.clip(variances, 0, None))
+        stds[~(stds > 1e-12)] = 1.0
+
+        normalized = (values - means[date_ids]) / stds[date_ids]
+        risk_index = normalized @ self.weights
+        codes = np.searchsorted(self.thresholds, risk_index, side='left')
+        categories = pd.Categorical.from_codes(
+            np.where(np.isnan(risk_index), -1, codes), categories=self.labels
+        )
+
+        timeline = pd.DataFrame({
+            'parcelle_id': rows['parcelle_id'].to_numpy(),
+            'date': dates,
+            'risk_index': risk_index,
+            'risk_category': categories,
+        })
+
+        # Conserver uniquement les jours encore couverts par la fenêtre
+        keep = all_dates > new_dates[-1] - np.timedelta64(self.window_days, 'D')
+        self.window_dates = all_dates[keep]
+        self.window_sums, self.window_squares, self.window_counts = all_sums[keep], all_squares[keep], all_counts[keep]
+        last_rows = ~rows['parcelle_id'].duplicated(keep='last').to_numpy()
+        for parcel, last in zip(rows['parcelle_id'].to_numpy()[last_rows], values[last_rows]):
+            self.last_values[parcel] = dict(zip(self.features, last))
+        last_day_parcels = set(rows['parcelle_id'].to_numpy()[dates == new_dates[-1]].tolist())
+        if self.last_date is not None and pd.Timestamp(new_dates[-1]) == self.last_date:
+            last_day_parcels |= self.last_parcels
+        self.last_parcels = last_day_parcels
+        self.last_date = pd.Timestamp(new_dates[-1])
+
+        return timeline
+
+    def save_state(self, path):
+        """
+        Enregistre l'état de la fenêtre glissante (fichier .npz).
+        """
+        parcels = np.array(sorted(self.last_values), dtype=str)
+        last_values = np.array([[self.last_values[p][c] for c in self.features] for p in parcels]).reshape(len(parcels), len(self.features))
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            window_dates=self.window_dates.astype('int64'),
+            window_sums=self.window_sums,
+            window_squares=self.window_squares,
+            window_counts=self.window_counts,
+            parcels=parcels,
+            last_values=last_values,
+            last_parcels=np.array(sorted(self.last_parcels), dtype=str),
+            last_date=np.int64(self.last_date.value if self.last_date is not None else -1),
+            window_days=np.int64(self.window_days),
+        )
+        os.replace(tmp_path, path)
+
+    def load_state(self, path):
+        """
+        Restaure l'état enregistré par `save_state`.
+        """
+        state = np.load(path, allow_pickle=False)
+        self.window_dates = state['window_dates'].astype('datetime64[ns]')
+        self.window_sums = state['window_sums']
+        self.window_squares = state['window_squares']
+        self.window_counts = state['window_counts']
+        self.last_values = {
+            parcel: dict(zip(self.features, values))
+            for parcel, values in zip(state['parcels'], state['last_values'])
+        }
+        self.last_date = pd.Timestamp(int(state['last_date'])) if int(state['last_date']) >= 0 else None
+        self.last_parcels = set(state['last_parcels'].tolist()) if 'last_parcels' in state.files else set()
+        self.window_days = int(state['window_days'])
@@ -0,0 +1,288 @@
+import numpy as np
+import pandas as pd
+
+
+RESOLUTIONS = ['day', 'week', 'month', 'season']
+
+# Variables agrégées par défaut (les absentes sont ignorées)
+ROLLUP_METRICS = [
+    'ndvi', 'lai', 'stress_hydrique', 'biomasse_estimee', 'temperature', 'precipitation',
+    'rendement_estime', 'risk_index',
+]
+
+ROLLUP_KEYS = ['parcelle_id', 'debut_periode']
+
+
+def partition_label(frame, resolution):
+    """
+    Partition de stockage de chaque période : le mois de son début pour les jours,
+    l'année pour les autres résolutions. Une mise à jour ne réécrit que les
+    partitions des périodes qu'elle touche.
+    """
+    starts = pd.DatetimeIndex(frame['debut_periode'])
+    return starts.strftime('%Y-%m' if resolution == 'day' else '%Y')
+
+
+def period_start(dates, resolution):
+    """
+    Début de la période calendaire (jour, semaine commençant le lundi, mois) de chaque date.
+    """
+    days = pd.DatetimeIndex(dates).normalize()
+    if resolution == 'day':
+        return days
+    if resolution == 'week':
+        return days - pd.to_timedelta(days.dayofweek, unit='D')
+    if resolution == 'month':
+        return pd.DatetimeIndex(days.to_numpy().astype('datetime64[M]').astype('datetime64[ns]'))
+    raise ValueError(f"Unknown calendar resolution: {resolution}")
+
+
+def resolution_for_span(start, end):
+    """
+    Résolution adaptée à la durée affichée : jours jusqu'à six mois,
+    semaines jusqu'à trois ans, mois au-delà.
+    """
+    span_days = (pd.Timestamp(end) - pd.Timestamp(start)).days
+    if span_days <= 183:
+        return 'day'
+    if span_days <= 3 * 366:
+        return 'week'
+    return 'month'
+
+
+def _as_partials(rows, metrics):
+    """
+    Transforme des lignes brutes en agrégats partiels fusionnables
+    (somme, nombre, min, max par variable).
+    """
+    partials = {'parcelle_id': rows['parcelle_id'].to_numpy(), 'date': rows['date'].to_numpy()}
+    partials['culture'] = rows['culture'].to_numpy() if 'culture' in rows.columns else None
+    for metric in metrics:
+        values = rows[metric].to_numpy(dtype=float)
+        observed = ~np.isnan(values)
+        partials[f"{metric}_sum"] = np.where(observed, values, 0.0)
+        partials[f"{metric}_count"] = observed.astype(np.int64)
+        partials[f"{metric}_min"] = values
+        partials[f"{metric}_max"] = values
+    partials['nb_lignes'] = np.ones(len(rows), dtype=np.int64)
+    return pd.DataFrame(partials)
+
+
+def combine(partials, keys, metrics):
+    """
+    Fusionne des agrégats partiels ayant les mêmes clés : les sommes et nombres
+    s'additionnent, les extrêmes se combinent et la culture retenue est la dernière observée.
+    """
+    aggregations = {'culture': 'last', 'nb_lignes': 'sum'}
+    if 'fin_periode' in partials.columns:
+        aggregations['fin_periode'] = 'max'
+    for metric in metrics:
+        aggregations.update({
+            f"{metric}_sum": 'sum', f"{metric}_count": 'sum', f"{metric}_min": 'min', f"{metric}_max": 'max',
+        })
+    return partials.groupby(keys, sort=True).agg(aggregations).reset_index()
+
+
+def summarize(rollup, by, metrics):
+    """
+    Regroupe des périodes agrégées (par exemple par parcelle sur une fenêtre,
+    ou par année) et calcule les moyennes à partir des sommes et nombres.
+    """
+    summary = combine(rollup, by, metrics)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for metric in metrics:
+            summary[metric] = summary[f"{metric}_sum"] / summary[f"{metric}_count"].replace(0, np.nan)
+    return summary
+
+
+def assign_seasons(daily):
+    """
+    Début de saison de chaque jour agrégé (trié par parcelle et date) : une saison
+    est une suite de jours d'une même culture sur une parcelle.
+    """
+    parcels = daily['parcelle_id'].to_numpy()
+    cultures = daily['culture'].to_numpy()
+    dates = daily['debut_periode'].to_numpy()
+
+    anchors = np.r_[True, parcels[1:] != parcels[:-1]] if len(daily) else np.zeros(0, dtype=bool)
+    anchors[1:] |= cultures[1:] != cultures[:-1]
+
+    # Chaque jour hérite du début de saison de la dernière rupture qui le précède
+    run_ids = np.cumsum(anchors) - 1
+    return pd.DatetimeIndex(dates[np.flatnonzero(anchors)][run_ids])
+
+
+class RollupStore:
+    """
+    Agrégats par parcelle des caractéristiques fusionnées, matérialisés aux
+    résolutions jour, semaine, mois et saison dans le stockage en colonnes.
+
+    Les tables conservent des agrégats partiels (somme, nombre, min, max) : les
+    nouvelles lignes sont agrégées puis fusionnées avec les seules périodes
+    qu'elles touchent, sans relire l'historique brut. Chaque table est partitionnée
+    par mois (jours) ou par année (autres résolutions) : seuls les fichiers des
+    partitions touchées sont réécrits.
+    """
+
+    def __init__(self, store, metrics=None):
+        self.store = store
+        self.metrics = list(ROLLUP_METRICS if metrics is None else metrics)
+        self.last_date = None
+
+    @staticmethod
+    def table_name(resolution):
+        return f"rollup_{resolution}"
+
+    @staticmethod
+    def _partition(resolution):
+        return lambda frame: partition_label(frame, resolution)
+
+    def _daily(self, rows):
+        """
+        Agrégats journaliers des lignes brutes, triés par parcelle et date.
+        """
+        partials = _as_partials(rows, self.metrics)
+        partials['debut_periode'] = period_start(partials.pop('date'), 'day')
+        return combine(partials, ROLLUP_KEYS, self.metrics)
+
+    def _rollup(self, daily, resolution):
+        """
+        Agrège les jours à une résolution plus grossière.
+        """
+        if resolution == 'day':
+            return daily
+        partials = daily.copy()
+        if resolution == 'season':
+            partials['debut_periode'] = assign_seasons(daily)
+            partials['fin_periode'] = daily['debut_periode'].to_numpy()
+        else:
+            partials['debut_periode'] = period_start(daily['debut_periode'], resolution)
+        return combine(partials, ROLLUP_KEYS, self.metrics)
+
+    def build(self, features):
+        """
+        Matérialise toutes les résolutions à partir des caractéristiques fusionnées,
+        en une seule passe sur les lignes brutes.
+        """
+        self.metrics = [metric for metric in self.metrics if metric in features.columns]
+        daily = self._daily(features)
+        for resolution in RESOLUTIONS:
+            self.store.write(self.table_name(resolution), self._rollup(daily, resolution), partition=self._partition(resolution))
+        self.last_date = daily['debut_periode'].max() if not daily.empty else None
+        return self
+
+    def load(self):
+        """
+        Reprend les variables et la dernière date agrégée des tables déjà stockées.
+        Retourne False si aucune table n'existe ou si elles sont d'un format
+        antérieur (non partitionnées, saisons sans fin de période) et doivent être recalculées.
+        """
+        name = self.table_name('day')
+        if not all(self.store.is_partitioned(self.table_name(resolution)) for resolution in RESOLUTIONS):
+            return False
+        if 'fin_periode' not in self.store.columns(self.table_name('season')):
+            return False
+        days = self.store.read(name, columns=['debut_periode'])['debut_periode']
+        self.metrics = [column[:-len('_sum')] for column in self.store.columns(name) if column.endswith('_sum')]
+        self.last_date = days.max() if not days.empty else None
+        return True
+
+    def update(self, new_rows):
+        """
+        Intègre de nouvelles lignes (une par parcelle et par jour). Les jours déjà
+        agrégés pour leur parcelle sont ignorés ; les autres, y compris ceux de la
+        dernière date agrégée ou antérieurs, sont fusionnés avec les périodes qu'ils
+        touchent, et les saisons qui les recoupent sont recalculées.
+        Retourne le nombre de lignes intégrées.
+        """
+        if new_rows.empty:
+            return 0
+
+        daily = self._daily(new_rows)
+        parcels = list(daily['parcelle_id'].unique())
+        stored = self.store.read(self.table_name('day'), columns=ROLLUP_KEYS + ['culture'], filters=[
+            ('parcelle_id', 'in', parcels), ('debut_periode', '>=', daily['debut_periode'].min()),
+        ])
+        known = pd.MultiIndex.from_frame(daily[ROLLUP_KEYS]).isin(pd.MultiIndex.from_frame(stored[ROLLUP_KEYS]))
+        daily = daily[~known].reset_index(drop=True)
+        if daily.empty:
+            return 0
+
+        # Jours stockés et nouveaux à partir du premier nouveau jour, pour la culture du dernier jour de chaque période
+        observed = pd.concat([stored, daily[ROLLUP_KEYS + ['culture']]], ignore_index=True)
+        observed = observed.sort_values(by=ROLLUP_KEYS, kind='mergesort')
+
+        parcels = list(daily['parcelle_id'].unique())
+        for resolution in ('day', 'week', 'month'):
+            name = self.table_name(resolution)
+            partials = self._rollup(daily, resolution)
+
+            # Fusion avec les seules périodes déjà stockées que les nouvelles lignes touchent
+            touched = self.store.read(name, filters=[
+                ('parcelle_id', 'in', parcels), ('debut_periode', '>=', partials['debut_periode'].min()),
+            ])
+            touched = touched.merge(partials[ROLLUP_KEYS], on=ROLLUP_KEYS, how='inner')
+            merged = combine(pd.concat([touched, partials], ignore_index=True), ROLLUP_KEYS, self.metrics)
+            if resolution != 'day':
+                # Un jour antérieur intégré en retard ne devient pas la dernière culture de sa période
+                periods = observed.assign(debut_periode=period_start(observed['debut_periode'], resolution))
+                cultures = periods.groupby(ROLLUP_KEYS, sort=False)['culture'].last()
+                merged['culture'] = cultures.reindex(pd.MultiIndex.from_frame(merged[ROLLUP_KEYS])).to_numpy()
+            self.store.upsert(name, merged, ROLLUP_KEYS, partition=self._partition(resolution))
+        self._update_seasons(daily)
+
+        last_date = daily['debut_periode'].max()
+        self.last_date = last_date if self.last_date is None else max(self.last_date, last_date)
+        return int(daily['nb_lignes'].sum())
+
+    def _update_seasons(self, daily):
+        """
+        Recalcule depuis les agrégats journaliers stockés les saisons des parcelles
+        de `daily`, à partir de celle qui contient leur premier nouveau jour.
+        """
+        name = self.table_name('season')
+        first_days = daily.groupby('parcelle_id')['debut_periode'].min()
+        parcels = list(first_days.index)
+        seasons = self.store.read(name, columns=ROLLUP_KEYS, filters=[('parcelle_id', 'in', parcels)])
+
+        # Début de la saison qui contient le premier nouveau jour (ou ce jour s'il précède toute saison)
+        previous = seasons[seasons['debut_periode'] <= seasons['parcelle_id'].map(first_days)]
+        starts = previous.groupby('parcelle_id')['debut_periode'].max().reindex(first_days.index).fillna(first_days)
+
+        days = self.store.read(self.table_name('day'), filters=[
+            ('parcelle_id', 'in', parcels), ('debut_periode', '>=', starts.min()),
+        ])
+        days = days[days['debut_periode'] >= days['parcelle_id'].map(starts)]
+        days = days.sort_values(by=ROLLUP_KEYS, kind='mergesort').reset_index(drop=True)
+        stale = seasons[seasons['debut_periode'] >= seasons['parcelle_id'].map(starts)]
+        self.store.upsert(name, self._rollup(days, 'season'), ROLLUP_KEYS, remove=stale, partition=self._partition('season'))
+
+    def get(self, resolution, parcels=None, start=None, end=None, metrics=None):
+        """
+        Agrégats d'une résolution pour les parcelles et la fenêtre demandées,
+        avec la moyenne de chaque variable sous son nom d'origine. Une période est
+        retenue si elle recoupe la fenêtre ; une saison, d'après ses premier et dernier jours.
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        metrics = self.metrics if metrics is None else [metric for metric in metrics if metric in self.metrics]
+
+        filters = []
+        if parcels is not None:
+            filters.append(('parcelle_id', 'in', list(np.atleast_1d(parcels))))
+        if start is not None and resolution == 'season':
+            filters.append(('fin_periode', '>=', pd.Timestamp(start)))
+        elif start is not None:
+            floor = pd.Timestamp(start) if resolution == 'day' else period_start([start], resolution)[0]
+            filters.append(('debut_periode', '>=', floor))
+        if end is not None:
+            filters.append(('debut_periode', '<=', pd.Timestamp(end)))
+
+        columns = ROLLUP_KEYS + (['fin_periode'] if resolution == 'season' else []) + ['culture', 'nb_lignes'] + [
+            f"{metric}_{part}" for metric in metrics for part in ('sum', 'count', 'min', 'max')
+        ]
+        rollup = self.store.read(self.table_name(resolution), columns=columns, filters=filters or None)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for metric in metrics:
+                rollup[metric] = rollup[f"{metric}_sum"] / rollup[f"{metric}_count"].replace(0, np.nan)
+        return rollup
@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+
+
+# Borne agronomique haute du rendement final (t/ha) pour contraindre les ajustements
+MAX_RENDEMENT = 20.0
+
+CURVE_COLUMNS = [
+    'parcelle_id', 'culture', 'saison_id', 'debut_saison', 'nb_mois', 'mois_observes',
+    'rendement_final_estime', 'taux_croissance', 'point_inflexion', 'rmse', 'converge',
+    'rendement_final',
+]
+
+
+def _logistic(params, t):
+    """
+    Courbe logistique K / (1 + exp(-r (t - t0))) et sa jacobienne par rapport
+    aux paramètres (log K, log r, t0). Formes : params (S, 3), t (S, L).
+    """
+    k, r, t0 = np.exp(params[:, 0:1]), np.exp(params[:, 1:2]), params[:, 2:3]
+    e = np.exp(np.clip(-r * (t - t0), -50, 50))
+    y = k / (1 + e)
+    dy = k * e / (1 + e) ** 2
+    jacobian = np.stack([y, dy * r * (t - t0), -dy * r], axis=2)
+    return y, jacobian
+
+
+def _gompertz(params, t):
+    """
+    Courbe de Gompertz K exp(-exp(-r (t - t0))) et sa jacobienne par rapport
+    aux paramètres (log K, log r, t0).
+    """
+    k, r, t0 = np.exp(params[:, 0:1]), np.exp(params[:, 1:2]), params[:, 2:3]
+    inner = np.exp(np.clip(-r * (t - t0), -50, 50))
+    y = k * np.exp(-inner)
+    dy = y * inner
+    jacobian = np.stack([y, dy * r * (t - t0), -dy * r], axis=2)
+    return y, jacobian
+
+
+CURVES = {'logistic': _logistic, 'gompertz': _gompertz}
+
+
+def stack_seasons(yield_history):
+    """
+    Découpe l'historique mensuel en saisons (suite de mois consécutifs d'une même
+    culture sur une parcelle ; une chute de `progression` ouvre aussi une nouvelle
+    saison) et les empile dans des tableaux (saisons, mois)
+    complétés par des NaN.
+    """
+    history = yield_history.sort_values(by=['parcelle_id', 'date'], kind='mergesort').reset_index(drop=True)
+    parcels = history['parcelle_id'].to_numpy()
+    cultures = history['culture'].to_numpy()
+
+    new_season = np.ones(len(history), dtype=bool)
+    new_season[1:] = (parcels[1:] != parcels[:-1]) | (cultures[1:] != cultures[:-1])
+    if 'progression' in history.columns:
+        progression = history['progression'].to_numpy(dtype=float)
+        new_season[1:] |= progression[1:] < progression[:-1]
+    season_ids = np.cumsum(new_season) - 1
+    starts = np.flatnonzero(new_season)
+    months = np.arange(len(history)) - starts[season_ids]
+
+    n_seasons, n_months = len(starts), int(months.max()) + 1 if len(history) else 0
+    values = np.full((n_seasons, n_months), np.nan)
+    values[season_ids, months] = history['rendement_estime'].to_numpy(dtype=float)
+
+    final = history['rendement_final'].to_numpy(dtype=float) if 'rendement_final' in history.columns else np.full(len(history), np.nan)
+    final_by_season = np.full(n_seasons, np.nan)
+    known = ~np.isnan(final)
+    final_by_season[season_ids[known]] = final[known]
+
+    seasons = pd.DataFrame({
+        'parcelle_id': parcels[starts],
+        'culture': cultures[starts],
+        'saison_id': np.arange(n_seasons),
+        'debut_saison': history['date'].to_numpy()[starts],
+        'nb_mois': np.bincount(season_ids, minlength=n_seasons),
+        'rendement_final': final_by_season,
+    })
+    return seasons, values
+
+
+def fit_growth_curves(values, model='logistic', max_iter=50, tol=1e-8):
+    """
+    Ajuste simultanément une courbe de croissance à chaque ligne de `values`
+    (saisons, mois ; NaN = non observé) par Gauss-Newton amorti
+    (Levenberg-Marquardt) sur les tableaux empilés.
+
+    Retourne les paramètres (K, r, t0), le RMSE et l'indicateur de convergence.
+    Un ajustement bloqué (amortissement au-delà de 1e8 sans amélioration), comme
+    une saison de moins de 3 observations, n'est pas convergé et ses paramètres
+    et son RMSE valent NaN.
+    """
+    curve = CURVES[model]
+    n_seasons, n_months = values.shape
+    t = np.broadcast_to(np.arange(n_months, dtype=float), values.shape)
+    mask = ~np.isnan(values)
+    y = np.where(mask, values, 0.0)
+    counts = mask.sum(axis=1)
+
+    # Initialisation : plateau au-dessus du maximum observé, inflexion à mi-hauteur
+    y_max = np.maximum(np.where(mask, values, -np.inf).max(axis=1, initial=-np.inf), 1e-3)
+    y_max[~np.isfinite(y_max)] = 1e-3
+    half = np.where(mask, np.abs(values - y_max[:, None] / 2), np.inf).argmin(axis=1).astype(float)
+    params = np.column_stack([np.log(y_max * 1.2), np.zeros(n_seasons), half])
+    upper_log_k = np.log(MAX_RENDEMENT)
+
+    def sse(p):
+        fitted, _ = curve(p, t)
+        residuals = np.where(mask, y - fitted, 0.0)
+        return (residuals ** 2).sum(axis=1)
+
+    damping = np.full(n_seasons, 1e-2)
+    current = sse(params)
+    converged = np.zeros(n_seasons, dtype=bool)
+    stalled = np.zeros(n_seasons, dtype=bool)
+    active = counts >= 3
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        p = params[active]
+        fitted, jacobian = curve(p, t[active])
+        residuals = np.where(mask[active], y[active] - fitted, 0.0)
+        jacobian = jacobian * mask[active][:, :, None]
+
+        jtj = np.einsum('slk,slm->skm', jacobian, jacobian)
+        jtr = np.einsum('slk,sl->sk', jacobian, residuals)
+        diagonal = np.einsum('skk->sk', jtj)
+        floor = 1e-6 * diagonal.max(axis=1, keepdims=True) + 1e-12
+        system = jtj + (damping[active][:, None] * diagonal + floor)[:, :, None] * np.eye(3)
+        step = np.linalg.solve(system, jtr[:, :, None])[:, :, 0]
+
+        candidate = p + step
+        candidate[:, 0] = np.clip(candidate[:, 0], np.log(1e-3), upper_log_k)
+        candidate[:, 1] = np.clip(candidate[:, 1], np.log(1e-2), np.log(20.0))
+        candidate[:, 2] = np.clip(candidate[:, 2], -n_months, 2 * n_months)
+
+        fitted_new, _ = curve(candidate, t[active])
+        candidate_sse = (np.where(mask[active], y[active] - fitted_new, 0.0) ** 2).sum(axis=1)
+
+        improved = candidate_sse < current[active]
+        index = np.flatnonzero(active)
+        params[index[improved]] = candidate[improved]
+        relative_change = np.abs(current[active] - candidate_sse) / np.maximum(current[active], 1e-12)
+        current[index[improved]] = candidate_sse[improved]
+        damping[index[improved]] /= 3
+        damping[index[~improved]] *= 4
+
+        done = (improved & (relative_change < tol)) | (np.abs(step).max(axis=1) < tol)
+        stuck = ~done & (damping[index] > 1e8)
+        converged[index[done]] = True
+        stalled[index[stuck]] = True
+        active[index[done | stuck]] = False
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rmse = np.sqrt(current / counts)
+    # Fits arrêtés, ou saisons trop courtes pour être ajustées : pas d'estimation
+    unfitted = stalled | (counts < 3)
+    params[unfitted] = np.nan
+    rmse[unfitted] = np.nan
+    return {
+        'K': np.exp(params[:, 0]),
+        'r': np.exp(params[:, 1]),
+        't0': params[:, 2],
+        'rmse': rmse,
+        'converged': converged & (counts >= 3),
+    }
+
+
+def fit_season_curves(yield_history, model='logistic', months_observed=None):
+    """
+    Ajuste une courbe de croissance à chaque (parcelle, saison) de l'historique
+    des rendements. Avec `months_observed`, seuls les premiers mois de chaque
+    saison sont utilisés : le plateau K est alors une estimation précoce du
+    rendement final.
+    """
+    seasons, values = stack_seasons(yield_history)
+    if months_observed is not None:
+        values = values[:, :months_observed]
+
+    fit = fit_growth_curves(values, model=model)
+    seasons['mois_observes'] = (~np.isnan(values)).sum(axis=1)
+    seasons['rendement_final_estime'] = fit['K']
+    seasons['taux_croissance'] = fit['r']
+    seasons['point_inflexion'] = fit['t0']
+    seasons['rmse'] = fit['rmse']
+    seasons['converge'] = fit['converged']
+    return seasons[CURVE_COLUMNS]
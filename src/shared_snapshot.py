@@ -0,0 +1,127 @@
+import json
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+# Fichier désignant la version courante ; remplacé atomiquement à chaque publication
+LATEST_POINTER = "LATEST"
+MANIFEST_FILE = "manifest.json"
+
+
+def _write_frame(frame, directory):
+    """
+    Écrit chaque colonne de `frame` dans un fichier .npy projetable en mémoire.
+    Les chaînes sont stockées sous forme de codes et de catégories.
+    Retourne la description des colonnes pour le manifeste.
+    """
+    os.makedirs(directory, exist_ok=True)
+    columns = []
+    for position, name in enumerate(frame.columns):
+        series = frame[name]
+        entry = {'name': name, 'file': f"{position}.npy"}
+
+        if isinstance(series.dtype, pd.CategoricalDtype) or series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+            categorical = series.astype('category') if not isinstance(series.dtype, pd.CategoricalDtype) else series
+            entry['kind'] = 'category' if isinstance(series.dtype, pd.CategoricalDtype) else 'string'
+            entry['categories'] = [str(category) for category in categorical.cat.categories]
+            entry['ordered'] = bool(categorical.cat.ordered)
+            values = categorical.cat.codes.to_numpy()
+        elif pd.api.types.is_datetime64_dtype(series.dtype):
+            entry['kind'] = 'datetime'
+            values = series.to_numpy(dtype='datetime64[ns]').view('int64')
+        else:
+            entry['kind'] = 'numeric'
+            values = series.to_numpy()
+
+        np.save(os.path.join(directory, entry['file']), np.ascontiguousarray(values))
+        columns.append(entry)
+    return {'rows': len(frame), 'columns': columns}
+
+
+def _attach_frame(description, directory, categorical=True):
+    """
+    Reconstruit un DataFrame en lecture seule dont les colonnes numériques et
+    temporelles pointent directement sur les fichiers projetés en mémoire.
+    """
+    columns = {}
+    for entry in description['columns']:
+        values = np.load(os.path.join(directory, entry['file']), mmap_mode='r')
+        if entry['kind'] == 'datetime':
+            columns[entry['name']] = values.view('datetime64[ns]')
+        elif entry['kind'] in ('string', 'category'):
+            codes = pd.Categorical.from_codes(
+                values, categories=entry['categories'], ordered=entry['ordered'], validate=False
+            )
+            # Hors mode catégoriel, les chaînes ne partagent que leurs catégories
+            columns[entry['name']] = codes if categorical or entry['kind'] == 'category' else np.asarray(codes, dtype=object)
+        else:
+            columns[entry['name']] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+def latest_version(root):
+    """
+    Version courante publiée dans `root`, ou None si aucune n'existe.
+    """
+    try:
+        with open(os.path.join(root, LATEST_POINTER)) as pointer:
+            return pointer.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def publish_snapshot(frames, root, keep=2):
+    """
+    Publie un instantané versionné des DataFrames `frames` (nom -> DataFrame).
+
+    La version est écrite dans un répertoire temporaire puis renommée, et le
+    pointeur LATEST est remplacé atomiquement : un lecteur voit toujours une
+    version complète. Les `keep` versions les plus récentes sont conservées ;
+    les processus encore attachés à une version supprimée gardent leur projection.
+    """
+    os.makedirs(root, exist_ok=True)
+    version = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    tmp_dir = os.path.join(root, f".{version}.tmp")
+
+    manifest = {'version': version, 'frames': {}}
+    for name, frame in frames.items():
+        manifest['frames'][name] = _write_frame(frame, os.path.join(tmp_dir, name))
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as output:
+        json.dump(manifest, output)
+
+    os.rename(tmp_dir, os.path.join(root, version))
+    pointer_tmp = os.path.join(root, f"{LATEST_POINTER}.tmp")
+    with open(pointer_tmp, "w") as pointer:
+        pointer.write(version)
+    os.replace(pointer_tmp, os.path.join(root, LATEST_POINTER))
+
+    # Nettoyage des anciennes versions
+    versions = sorted(entry for entry in os.listdir(root) if not entry.startswith('.') and entry != LATEST_POINTER and not entry.endswith('.tmp'))
+    for old in versions[:-keep] if keep else []:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return version
+
+
+def attach_snapshot(root, version=None, categorical=True):
+    """
+    S'attache sans copie à une version publiée (la plus récente par défaut).
+    Retourne la version et le dictionnaire nom -> DataFrame en lecture seule.
+    Les colonnes texte sont partagées sous forme de codes catégoriels, sauf avec
+    `categorical=False` qui les recopie en tableaux de chaînes dans chaque processus.
+    """
+    version = version or latest_version(root)
+    if version is None:
+        raise FileNotFoundError(f"No snapshot published in {root}")
+
+    directory = os.path.join(root, version)
+    with open(os.path.join(directory, MANIFEST_FILE)) as manifest_file:
+        manifest = json.load(manifest_file)
+    frames = {
+        name: _attach_frame(description, os.path.join(directory, name), categorical=categorical)
+        for name, description in manifest['frames'].items()
+    }
+    return version, frames
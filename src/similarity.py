@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import StandardScaler
+
+
+# Chimie du sol et résumés de rendement / NDVI décrivant chaque parcelle
+SOIL_PROFILE = ['ph', 'matiere_organique', 'azote', 'phosphore', 'potassium', 'capacite_retention_eau']
+TREND_PROFILE = ['rendement_moyen', 'pente_rendement', 'ndvi_moyen', 'pente_ndvi']
+
+
+def grouped_trends(frame, column, group='parcelle_id', time='date'):
+    """
+    Moyenne et pente (par jour) de `column` pour chaque groupe, par moindres
+    carrés calculés à partir de sommes groupées, sans boucle sur les groupes.
+    """
+    observed = frame[[group, time, column]].dropna()
+    days = (observed[time] - observed[time].min()).dt.total_seconds().to_numpy() / 86400.0
+    values = observed[column].to_numpy(dtype='float64')
+    sums = pd.DataFrame({
+        group: observed[group].to_numpy(), 'n': 1.0, 't': days, 'y': values, 'tt': days * days, 'ty': days * values,
+    }).groupby(group, sort=True).sum()
+    mean_t, mean_y = sums['t'] / sums['n'], sums['y'] / sums['n']
+    variance = sums['tt'] / sums['n'] - mean_t ** 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = ((sums['ty'] / sums['n'] - mean_t * mean_y) / variance).where(variance > 0, 0.0)
+    return pd.DataFrame({'moyenne': mean_y, 'pente': slope})
+
+
+def parcel_profiles(soil, features=None):
+    """
+    Vecteur descriptif de chaque parcelle : chimie du sol et, si les
+    caractéristiques sont fournies, moyennes et pentes du rendement et du NDVI.
+    """
+    profiles = soil.drop_duplicates('parcelle_id').set_index('parcelle_id')[SOIL_PROFILE]
+    if features is not None:
+        yields = grouped_trends(features, 'rendement_estime')
+        ndvi = grouped_trends(features, 'ndvi')
+        profiles = profiles.join(pd.DataFrame({
+            'rendement_moyen': yields['moyenne'], 'pente_rendement': yields['pente'],
+            'ndvi_moyen': ndvi['moyenne'], 'pente_ndvi': ndvi['pente'],
+        }), how='left')
+    return profiles
+
+
+class SimilarityIndex:
+    """
+    Index des k plus proches voisins sur les profils standardisés des parcelles.
+
+    Les profils sont centrés-réduits comme les variables de l'indice de risque
+    (StandardScaler) ; une valeur manquante prend la moyenne de sa colonne, soit 0
+    après standardisation. La recherche utilise un arbre (k-d tree / ball tree)
+    de scikit-learn, en lot pour plusieurs parcelles à la fois.
+    """
+
+    def __init__(self, profiles):
+        self.columns = list(profiles.columns)
+        self.parcels = profiles.index.to_numpy(dtype=object)
+        self.scaler = StandardScaler()
+        self.vectors = np.nan_to_num(self.scaler.fit_transform(profiles.to_numpy(dtype='float64')), nan=0.0)
+        self.positions = pd.Index(self.parcels)
+        self.model = NearestNeighbors().fit(self.vectors)
+
+    def __len__(self):
+        return len(self.parcels)
+
+    def similar(self, parcels, k=5):
+        """
+        Les `k` parcelles les plus proches de chacune de `parcels` (elle-même
+        exclue) : DataFrame (parcelle_id, voisin, rang, distance), distance
+        euclidienne entre profils standardisés.
+        """
+        parcels = np.atleast_1d(np.asarray(parcels, dtype=object))
+        positions = self.positions.get_indexer(parcels)
+        if (positions < 0).any():
+            raise KeyError(f"Unknown parcels: {', '.join(map(str, parcels[positions < 0]))}")
+        k = min(k, len(self) - 1)
+        if k <= 0 or len(parcels) == 0:
+            return pd.DataFrame(columns=['parcelle_id', 'voisin', 'rang', 'distance'])
+
+        distances, neighbours = self.model.kneighbors(self.vectors[positions], n_neighbors=k + 1)
+        # Retirer la parcelle elle-même (ou, à profils identiques, un voisin en trop)
+        is_self = neighbours == positions[:, None]
+        drop = np.where(is_self.any(axis=1), is_self.argmax(axis=1), k)
+        keep = np.ones_like(neighbours, dtype=bool)
+        keep[np.arange(len(parcels)), drop] = False
+        neighbours = neighbours[keep].reshape(len(parcels), k)
+        distances = distances[keep].reshape(len(parcels), k)
+
+        return pd.DataFrame({
+            'parcelle_id': np.repeat(parcels, k),
+            'voisin': self.parcels[neighbours.ravel()],
+            'rang': np.tile(np.arange(1, k + 1), len(parcels)),
+            'distance': distances.ravel(),
+        })
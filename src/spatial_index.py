@@ -0,0 +1,119 @@
+import math
+
+import numpy as np
+
+
+# Rayon terrestre moyen (km) et longueur d'un degré de latitude (km)
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """
+    Distance orthodromique (km) entre un point et des tableaux de points, en degrés.
+    """
+    lat1, lon1 = np.radians(latitude), np.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GridIndex:
+    """
+    Index spatial en grille régulière sur les coordonnées des parcelles.
+
+    Les points sont triés par cellule (ligne par ligne) et un tableau de bornes
+    donne la plage de chaque cellule : les cellules d'une même ligne de la
+    grille sont contiguës, si bien qu'une requête rectangulaire ne lit qu'une
+    tranche par ligne couverte avant le filtrage exact des candidats.
+    """
+
+    def __init__(self, ids, latitudes, longitudes, points_per_cell=16):
+        ids = np.asarray(ids, dtype=object)
+        latitudes = np.asarray(latitudes, dtype='float64')
+        longitudes = np.asarray(longitudes, dtype='float64')
+        valid = np.isfinite(latitudes) & np.isfinite(longitudes)
+        ids, latitudes, longitudes = ids[valid], latitudes[valid], longitudes[valid]
+
+        # Emprise et taille de cellule pour environ `points_per_cell` points par cellule
+        self.south, self.north = (latitudes.min(), latitudes.max()) if len(ids) else (0.0, 0.0)
+        self.west, self.east = (longitudes.min(), longitudes.max()) if len(ids) else (0.0, 0.0)
+        area = max(self.north - self.south, 1e-9) * max(self.east - self.west, 1e-9)
+        self.cell_size = math.sqrt(area * points_per_cell / max(len(ids), 1))
+        self.n_rows = int((self.north - self.south) / self.cell_size) + 1
+        self.n_cols = int((self.east - self.west) / self.cell_size) + 1
+
+        rows, cols = self._cell(latitudes, longitudes)
+        cells = rows * self.n_cols + cols
+        order = np.argsort(cells, kind='stable')
+        self.ids = ids[order]
+        self.latitudes = latitudes[order]
+        self.longitudes = longitudes[order]
+        self.bounds = np.searchsorted(cells[order], np.arange(self.n_rows * self.n_cols + 1))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _cell(self, latitudes, longitudes):
+        rows = np.clip(((latitudes - self.south) / self.cell_size).astype(np.int64), 0, self.n_rows - 1)
+        cols = np.clip(((longitudes - self.west) / self.cell_size).astype(np.int64), 0, self.n_cols - 1)
+        return rows, cols
+
+    def _candidates(self, south, west, north, east):
+        """
+        Positions des points des cellules recouvrant le rectangle.
+        """
+        if len(self) == 0 or south > self.north or north < self.south or west > self.east or east < self.west:
+            return np.empty(0, dtype=np.int64)
+        (row_low, row_high), (col_low, col_high) = self._cell(np.array([south, north]), np.array([west, east]))
+        rows = np.arange(row_low, row_high + 1) * self.n_cols
+        lows = self.bounds[rows + col_low]
+        highs = self.bounds[rows + col_high + 1]
+        if len(rows) == 1:
+            return np.arange(lows[0], highs[0])
+        # Concaténation vectorisée des plages [low, high) de chaque ligne
+        lengths = highs - lows
+        starts = np.repeat(lows - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+        return starts + np.arange(lengths.sum())
+
+    def query_bbox(self, south, west, north, east):
+        """
+        Identifiants des points du rectangle [south, north] x [west, east] (degrés).
+        """
+        candidates = self._candidates(south, west, north, east)
+        latitudes = self.latitudes[candidates]
+        longitudes = self.longitudes[candidates]
+        inside = (latitudes >= south) & (latitudes <= north) & (longitudes >= west) & (longitudes <= east)
+        return self.ids[candidates[inside]]
+
+    def query_radius(self, latitude, longitude, radius_km):
+        """
+        Identifiants et distances (km) des points à moins de `radius_km` du point
+        donné, du plus proche au plus éloigné. Le rectangle de recherche couvre le
+        cercle jusqu'aux pôles et est coupé en deux s'il franchit l'antiméridien.
+        """
+        delta_lat = radius_km / KM_PER_DEGREE
+        south, north = max(latitude - delta_lat, -90.0), min(latitude + delta_lat, 90.0)
+        # Demi-largeur en longitude à la latitude du cercle la plus éloignée de l'équateur
+        farthest = max(abs(south), abs(north))
+        if farthest >= 90.0:
+            delta_lon = 180.0
+        else:
+            delta_lon = min(radius_km / (KM_PER_DEGREE * math.cos(math.radians(farthest))), 180.0)
+
+        west, east = longitude - delta_lon, longitude + delta_lon
+        if delta_lon >= 180.0:
+            boxes = [(-180.0, 180.0)]
+        elif west < -180.0:
+            # Rectangle à cheval sur l'antiméridien : une partie de chaque côté
+            boxes = [(west + 360.0, 180.0), (-180.0, east)]
+        elif east > 180.0:
+            boxes = [(west, 180.0), (-180.0, east - 360.0)]
+        else:
+            boxes = [(west, east)]
+        candidates = np.unique(np.concatenate([self._candidates(south, low, north, high) for low, high in boxes]))
+        distances = haversine_km(latitude, longitude, self.latitudes[candidates], self.longitudes[candidates])
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        return self.ids[candidates[order]], distances[order]
@@ -0,0 +1,138 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+
+CULTURES = ['sol_nu', 'Ble', 'Mais', 'Tournesol']
+TYPES_SOL = ['argileux', 'limoneux', 'sableux']
+
+
+def generate_synthetic_dataset(output_dir, n_parcels=1000, start="2020-01-01", end="2024-12-31", seed=42):
+    """
+    Génère un jeu de données synthétique volumineux reprenant le schéma des quatre
+    sources (monitoring, météo horaire, sols, historique des rendements).
+    Utilisé pour les mesures de performance sur des volumes réalistes.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(output_dir, exist_ok=True)
+
+    parcels = np.array([f"P{i:05d}" for i in range(1, n_parcels + 1)])
+    latitudes = 33.85 + rng.normal(0, 0.05, n_parcels)
+    longitudes = -5.54 + rng.normal(0, 0.05, n_parcels)
+
+    # Sols
+    sols = pd.DataFrame({
+        'parcelle_id': parcels,
+        'latitude': latitudes.round(6),
+        'longitude': longitudes.round(6),
+        'type_sol': rng.choice(TYPES_SOL, n_parcels),
+        'surface_ha': rng.uniform(1, 20, n_parcels).round(2),
+        'capacite_retention_eau': rng.uniform(0.4, 0.95, n_parcels).round(2),
+        'ph': rng.uniform(5.5, 8.5, n_parcels).round(1),
+        'matiere_organique': rng.uniform(1, 5, n_parcels).round(2),
+        'azote': rng.uniform(0.1, 0.3, n_parcels).round(3),
+        'phosphore': rng.uniform(20, 60, n_parcels).round(1),
+        'potassium': rng.uniform(150, 350, n_parcels).round(1),
+    })
+    sols.to_csv(os.path.join(output_dir, "sols.csv"), index=False)
+
+    # Météo horaire
+    hours = pd.date_range(start, pd.Timestamp(end) + pd.Timedelta(hours=23), freq="h")
+    day_of_year = hours.dayofyear.values
+    hour_of_day = hours.hour.values
+    n_hours = len(hours)
+    meteo = pd.DataFrame({
+        'date': hours.strftime('%Y-%m-%d %H:%M:%S'),
+        'temperature': (18 + 8 * np.sin(2 * np.pi * (day_of_year - 110) / 365)
+                        + 5 * np.sin(2 * np.pi * (hour_of_day - 9) / 24)
+                        + rng.normal(0, 1.5, n_hours)).round(2),
+        'humidite': np.clip(60 + rng.normal(0, 15, n_hours), 10, 100).round(2),
+        'precipitation': np.where(rng.random(n_hours) < 0.05, rng.exponential(2, n_hours), 0).round(2),
+        'rayonnement_solaire': np.clip(800 * np.sin(np.pi * (hour_of_day - 6) / 12), 0, None).round(1),
+        'vitesse_vent': rng.gamma(2, 2, n_hours).round(1),
+        'direction_vent': rng.uniform(0, 360, n_hours).round(1),
+    })
+    meteo.to_csv(os.path.join(output_dir, "meteo_detaillee.csv"), index=False)
+
+    # Monitoring quotidien
+    days = pd.date_range(start, end, freq="D")
+    n_days = len(days)
+    season = (days.month.values - 1) // 3
+    seasonal_ndvi = 0.45 + 0.25 * np.sin(2 * np.pi * (days.dayofyear.values - 80) / 365)
+    ndvi = np.clip(seasonal_ndvi[None, :] + rng.normal(0, 0.03, (n_parcels, n_days)), 0.1, 1.0).round(3)
+    monitoring = pd.DataFrame({
+        'date': np.tile(days.strftime('%Y-%m-%d'), n_parcels),
+        'parcelle_id': np.repeat(parcels, n_days),
+        'latitude': np.repeat(latitudes.round(6), n_days),
+        'longitude': np.repeat(longitudes.round(6), n_days),
+        'culture': np.tile(np.array(CULTURES)[season], n_parcels),
+        'ndvi': ndvi.ravel(),
+        'lai': (ndvi * 4).round(2).ravel(),
+        'stress_hydrique': np.clip(rng.normal(0.08, 0.06, n_parcels * n_days), 0, 1).round(3),
+        'biomasse_estimee': (ndvi * 25).round(2).ravel(),
+    })
+    monitoring.to_csv(os.path.join(output_dir, "monitoring_cultures.csv"), index=False)
+
+    # Historique mensuel des rendements
+    months = pd.date_range(start, end, freq="ME")
+    n_months = len(months)
+    progression = ((months.month.values - 1) % 3 + 1) / 3 * 100
+    rendement = (progression[None, :] / 100 * rng.uniform(4, 10, (n_parcels, 1))
+                 + rng.normal(0, 0.2, (n_parcels, n_months))).clip(0).round(2)
+    historique = pd.DataFrame({
+        'parcelle_id': np.repeat(parcels, n_months),
+        'date': np.tile(months.strftime('%Y-%m-%d'), n_parcels),
+        'culture': np.tile(np.array(CULTURES[1:])[(months.month.values - 1) // 4], n_parcels),
+        'rendement_estime': rendement.ravel(),
+        'rendement_final': np.where(np.tile(progression, n_parcels) == 100, rendement.ravel(), np.nan),
+        'progression': np.tile(progression.round(1), n_parcels),
+    })
+    historique.to_csv(os.path.join(output_dir, "historique_rendements.csv"), index=False)
+
+    print(f"Jeu de données synthétique généré dans '{output_dir}' ({len(monitoring)} lignes de monitoring).")
+    return output_dir
+
+
+def generate_parcel_polygons(soil, path, vertices=200, seed=42):
+    """
+    Écrit un GeoJSON de contours de parcelles synthétiques : un quadrilatère
+    irrégulier de surface `surface_ha` autour de chaque position de `soil`,
+    densément échantillonné (`vertices` sommets) et bruité comme un relevé GPS.
+    """
+    rng = np.random.default_rng(seed)
+    metres_per_degree = 111320.0
+    features = []
+    for parcel in soil.itertuples(index=False):
+        side = np.sqrt(parcel.surface_ha * 1e4)
+        aspect = rng.uniform(0.5, 2.0)
+        corners = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]], dtype=float) * [side * aspect / 2, side / aspect / 2]
+        corners += rng.normal(0, side * 0.08, corners.shape)
+        angle = rng.uniform(0, np.pi)
+        rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+        corners = corners @ rotation.T
+
+        # Bords densifiés et bruités (précision métrique)
+        per_side = vertices // 4
+        steps = np.linspace(0, 1, per_side, endpoint=False)[:, None]
+        ring = np.vstack([corners[i] + steps * (corners[(i + 1) % 4] - corners[i]) for i in range(4)])
+        ring += rng.normal(0, 0.5, ring.shape)
+
+        longitudes = parcel.longitude + ring[:, 0] / (metres_per_degree * np.cos(np.radians(parcel.latitude)))
+        latitudes = parcel.latitude + ring[:, 1] / metres_per_degree
+        coordinates = np.column_stack([longitudes, latitudes]).round(8)
+        coordinates = np.vstack([coordinates, coordinates[:1]]).tolist()
+        features.append({
+            'type': 'Feature',
+            'properties': {'parcelle_id': parcel.parcelle_id},
+            'geometry': {'type': 'Polygon', 'coordinates': [coordinates]},
+        })
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as output:
+        json.dump({'type': 'FeatureCollection', 'features': features}, output)
+    return path
+
+
+if __name__ == "__main__":
+    generate_synthetic_dataset("../data/synthetic")
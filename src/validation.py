@@ -0,0 +1,204 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+
+REASON_COLUMN = 'motifs'
+
+
+def _checks(rules):
+    """
+    Liste ordonnée des contrôles déclarés pour un jeu : (nom du motif, type, paramètres).
+    """
+    checks = []
+    for column in rules.get('required', []):
+        checks.append((f"{column} manquant", 'required', column))
+    for column, dtype in rules.get('types', {}).items():
+        checks.append((f"{column} non {dtype}", 'type', (column, dtype)))
+    for column, (low, high) in rules.get('ranges', {}).items():
+        checks.append((f"{column} hors de [{low}, {high}]", 'range', (column, low, high)))
+    if rules.get('unique'):
+        checks.append((f"doublon ({', '.join(rules['unique'])})", 'unique', rules['unique']))
+    for column, (dataset, key) in rules.get('references', {}).items():
+        checks.append((f"{column} absent de {dataset}", 'reference', (column, dataset, key)))
+    return checks
+
+
+def _codes(frame, column, factorized):
+    """
+    Codes entiers de la colonne (factorisation), -1 pour les valeurs manquantes.
+    `factorized` mémorise le résultat pour les contrôles suivants du même jeu.
+    """
+    if column not in factorized:
+        codes, uniques = pd.factorize(frame[column], sort=False)
+        factorized[column] = (codes.astype(np.int64), uniques)
+    return factorized[column]
+
+
+def _duplicated(frame, columns, factorized):
+    """
+    Lignes dont la clé `columns` a déjà été vue plus haut. Des données triées
+    selon la clé (cas courant : sources triées par parcelle et date) sont
+    contrôlées par simple comparaison des voisins ; sinon, les codes des
+    colonnes sont combinés en un entier haché une seule fois.
+    """
+    if len(frame) < 2:
+        return np.zeros(len(frame), dtype=bool)
+    arrays = []
+    for column in columns:
+        values = frame[column]
+        if values.dtype.kind in ('i', 'u', 'f', 'M'):
+            arrays.append(values.to_numpy())
+        else:
+            arrays.append(_codes(frame, column, factorized)[0])
+
+    equal = np.ones(len(frame) - 1, dtype=bool)
+    ordered = np.zeros(len(frame) - 1, dtype=bool)
+    for values in arrays:
+        ordered |= equal & (values[1:] > values[:-1])
+        equal &= values[1:] == values[:-1]
+    if np.all(ordered | equal):
+        return np.r_[False, equal]
+
+    key = np.zeros(len(frame), dtype=np.int64)
+    span = 1
+    for column in columns:
+        codes, uniques = _codes(frame, column, factorized)
+        size = len(uniques) + 1
+        if span > np.iinfo(np.int64).max // size:
+            # Combinaison trop grande pour un entier : repli sur pandas
+            return frame.duplicated(subset=columns, keep='first').to_numpy()
+        key = key * size + codes + 1
+        span *= size
+    return pd.Series(key).duplicated(keep='first').to_numpy()
+
+
+def _validation_order(frames, rules):
+    """
+    Jeux dans un ordre où chaque jeu référencé est validé avant ceux qui le référencent.
+    """
+    order, visiting = [], set()
+
+    def visit(dataset):
+        if dataset in order or dataset not in frames:
+            return
+        if dataset in visiting:
+            raise ValueError(f"Circular references between datasets involving '{dataset}'")
+        visiting.add(dataset)
+        for reference, _ in rules.get(dataset, {}).get('references', {}).values():
+            visit(reference)
+        visiting.discard(dataset)
+        order.append(dataset)
+
+    for dataset in frames:
+        visit(dataset)
+    return order
+
+
+def validate(frames, rules):
+    """
+    Applique en une passe vectorisée les règles déclaratives `rules` (jeu -> règles)
+    aux DataFrames `frames` (jeu -> DataFrame) :
+
+    - 'required' : colonnes sans valeur manquante ;
+    - 'types' : colonnes convertibles en type numérique ('float64') ou date ('datetime64') ;
+    - 'ranges' : bornes inclusives (None pour une borne ouverte), valeurs manquantes ignorées ;
+    - 'unique' : colonnes formant une clé sans doublon (la première occurrence est gardée) ;
+    - 'references' : colonne dont les valeurs doivent exister dans la colonne d'un autre jeu.
+
+    Les jeux référencés sont validés en premier et les références contrôlées sur
+    leurs lignes valides : une ligne dont la parcelle a été rejetée des sols est
+    elle aussi mise en quarantaine. Les échecs de chaque ligne sont accumulés dans
+    un masque de bits ; seuls les motifs des lignes rejetées sont décodés. Retourne
+    (jeux valides, lignes mises en quarantaine avec leurs motifs, résumé des rejets
+    par jeu et motif).
+    """
+    valid, quarantined, summary = {}, {}, []
+    for dataset in _validation_order(frames, rules):
+        frame = frames[dataset]
+        dataset_rules = rules.get(dataset)
+        if frame is None or not dataset_rules:
+            valid[dataset] = frame
+            continue
+
+        checks = _checks(dataset_rules)
+        failures = np.zeros(len(frame), dtype=np.int64)
+        converted = {}
+        factorized = {}
+        for bit, (reason, kind, params) in enumerate(checks):
+            if kind == 'required':
+                # Colonnes d'objets : la factorisation, partagée avec les clés, repère les manquants
+                if frame[params].dtype == object:
+                    failed = _codes(frame, params, factorized)[0] < 0
+                else:
+                    failed = frame[params].isna().to_numpy()
+            elif kind == 'type':
+                column, dtype = params
+                values = frame[column]
+                if values.dtype.kind in ('f', 'i', 'u', 'M', 'b'):
+                    continue
+                # Colonne non typée (objets) : valeurs non convertibles rejetées
+                coerced = pd.to_datetime(values, errors='coerce') if dtype.startswith('datetime') else pd.to_numeric(values, errors='coerce')
+                failed = (coerced.isna() & values.notna()).to_numpy()
+                converted[column] = coerced
+            elif kind == 'range':
+                column, low, high = params
+                values = converted.get(column, frame[column]).to_numpy(dtype='float64')
+                failed = np.zeros(len(frame), dtype=bool)
+                with np.errstate(invalid='ignore'):
+                    if low is not None:
+                        failed |= values < low
+                    if high is not None:
+                        failed |= values > high
+                failed |= np.isinf(values)
+            elif kind == 'unique':
+                failed = _duplicated(frame, params, factorized)
+            else:
+                column, reference, key = params
+                known = valid.get(reference, frames.get(reference))
+                if known is None:
+                    continue
+                codes, uniques = _codes(frame, column, factorized)
+                present = pd.Index(uniques).isin(known[key].dropna().unique())
+                failed = (codes >= 0) & ~present[np.maximum(codes, 0)]
+            np.bitwise_or(failures, np.int64(1) << bit, out=failures, where=failed)
+
+        rejected = failures != 0
+        kept = frame.assign(**converted) if converted else frame
+        if rejected.any():
+            kept = kept[~rejected]
+            kept.index = pd.RangeIndex(len(kept))
+        valid[dataset] = kept
+
+        bad = frame[rejected].copy()
+        bad_failures = failures[rejected]
+        reasons = [reason for reason, _, _ in checks]
+        bad[REASON_COLUMN] = [
+            "; ".join(reason for bit, reason in enumerate(reasons) if mask >> bit & 1) for mask in bad_failures
+        ]
+        quarantined[dataset] = bad
+        for bit, reason in enumerate(reasons):
+            count = int(np.count_nonzero(bad_failures >> bit & 1))
+            if count:
+                summary.append({'jeu': dataset, 'motif': reason, 'lignes': count})
+
+    valid = {dataset: valid[dataset] for dataset in frames}
+    return valid, quarantined, pd.DataFrame(summary, columns=['jeu', 'motif', 'lignes'])
+
+
+def write_quarantine(quarantined, directory):
+    """
+    Écrit les lignes rejetées de chaque jeu dans `directory/<jeu>.csv` (colonnes
+    d'origine et motifs) ; le fichier d'un jeu sans rejet est supprimé.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for dataset, rows in quarantined.items():
+        path = os.path.join(directory, f"{dataset}.csv")
+        if rows is None or rows.empty:
+            if os.path.exists(path):
+                os.remove(path)
+            continue
+        tmp_path = f"{path}.tmp"
+        rows.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
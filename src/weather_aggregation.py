@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+
+HOURS_PER_DAY = 24
+HOUR = np.timedelta64(1, 'h')
+
+# Variables angulaires : seule une moyenne circulaire a un sens
+CIRCULAR_COLUMNS = ('direction_vent',)
+
+
+def is_regular_hourly(dates):
+    """
+    Indique si une série de dates triées suit une cadence horaire régulière
+    couvrant des journées complètes (de 00:00 à 23:00, sans trou).
+    """
+    if len(dates) == 0 or len(dates) % HOURS_PER_DAY != 0:
+        return False
+    if dates[0] != dates[0].astype('datetime64[D]'):
+        return False
+    return bool(np.all(np.diff(dates) == HOUR))
+
+
+def _circular_mean(sin_sum, cos_sum):
+    """
+    Moyenne circulaire (en degrés, dans [0, 360[) à partir des sommes des sinus et cosinus.
+    """
+    return np.mod(np.degrees(np.arctan2(sin_sum, cos_sum)), 360.0)
+
+
+def _reduce_blocks(values, days):
+    """
+    Agrégation rapide : les valeurs horaires (variables, heures) sont remodelées
+    en (variables, jours, 24) et réduites sur l'axe contigu des heures avec NumPy.
+    """
+    blocks = values.reshape(values.shape[0], days, HOURS_PER_DAY)
+    sums = blocks @ np.ones(HOURS_PER_DAY)
+    if not np.isnan(sums).any():
+        return {
+            'mean': sums / HOURS_PER_DAY,
+            'min': blocks.min(axis=2),
+            'max': blocks.max(axis=2),
+            'sum': sums,
+        }
+
+    valid = ~np.isnan(blocks)
+    counts = valid.sum(axis=2)
+    sums = np.where(valid, blocks, 0.0).sum(axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    return {
+        'mean': means,
+        'min': np.fmin.reduce(blocks, axis=2),
+        'max': np.fmax.reduce(blocks, axis=2),
+        'sum': np.where(counts > 0, sums, np.nan),
+    }
+
+
+def _reduce_groups(values, starts, inverse, days):
+    """
+    Agrégation générale pour les séries irrégulières (heures manquantes) :
+    les jours sont des segments contigus des données triées.
+    """
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    counts = np.stack([np.bincount(inverse, weights=row, minlength=days) for row in valid])
+    sums = np.stack([np.bincount(inverse, weights=row, minlength=days) for row in filled])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    return {
+        'mean': means,
+        'min': np.fmin.reduceat(values, starts, axis=1),
+        'max': np.fmax.reduceat(values, starts, axis=1),
+        'sum': np.where(counts > 0, sums, np.nan),
+    }
+
+
+def aggregate_hourly_to_daily(weather, date_column='date'):
+    """
+    Agrège les mesures météo horaires en valeurs journalières en une seule passe.
+
+    Pour chaque variable numérique, la colonne d'origine porte la moyenne
+    journalière et les colonnes `<variable>_min`, `<variable>_max` et
+    `<variable>_sum` les autres statistiques. `direction_vent` reçoit une
+    moyenne circulaire. `nb_heures` compte les heures observées par jour
+    (celles où au moins une variable est mesurée).
+
+    Si la cadence horaire est régulière, les tableaux sont remodelés en
+    (jours, 24) ; sinon les jours sont agrégés par segments.
+    """
+    if weather[date_column].isna().any():
+        weather = weather[weather[date_column].notna()]
+    if not weather[date_column].is_monotonic_increasing:
+        weather = weather.sort_values(by=date_column, kind='mergesort')
+
+    dates = weather[date_column].to_numpy(dtype='datetime64[ns]')
+    value_columns = [
+        column for column in weather.columns
+        if column != date_column and pd.api.types.is_numeric_dtype(weather[column])
+    ]
+    linear_columns = [column for column in value_columns if column not in CIRCULAR_COLUMNS]
+    circular_columns = [column for column in value_columns if column in CIRCULAR_COLUMNS]
+
+    # Toutes les variables sont réduites ensemble, une ligne par variable ;
+    # les angles le sont via leurs sinus et cosinus
+    values = np.empty((len(linear_columns) + 2 * len(circular_columns), len(dates)))
+    for j, column in enumerate(linear_columns):
+        values[j] = weather[column].to_numpy(dtype='float64')
+    for j, column in enumerate(circular_columns):
+        radians = np.radians(weather[column].to_numpy(dtype='float64'))
+        np.sin(radians, out=values[len(linear_columns) + j])
+        np.cos(radians, out=values[len(linear_columns) + len(circular_columns) + j])
+
+    # Heures où au moins une variable est mesurée
+    observed = ~np.isnan(values).all(axis=0) if len(values) else np.ones(len(dates), dtype=bool)
+
+    if is_regular_hourly(dates):
+        days = len(dates) // HOURS_PER_DAY
+        day_index = dates[::HOURS_PER_DAY].astype('datetime64[D]')
+        stats = _reduce_blocks(values, days)
+        hours = observed.reshape(days, HOURS_PER_DAY).sum(axis=1)
+    else:
+        day_of_row = dates.astype('datetime64[D]')
+        day_index, starts, inverse = np.unique(day_of_row, return_index=True, return_inverse=True)
+        days = len(day_index)
+        stats = _reduce_groups(values, starts, inverse, days)
+        hours = np.bincount(inverse[observed], minlength=days)
+
+    daily = {date_column: day_index.astype('datetime64[ns]')}
+    for j, column in enumerate(linear_columns):
+        daily[column] = stats['mean'][j]
+        for statistic in ('min', 'max', 'sum'):
+            daily[f"{column}_{statistic}"] = stats[statistic][j]
+
+    offset = len(linear_columns)
+    for j, column in enumerate(circular_columns):
+        sin_sum = stats['sum'][offset + j]
+        cos_sum = stats['sum'][offset + len(circular_columns) + j]
+        daily[column] = _circular_mean(sin_sum, cos_sum)
+
+    daily['nb_heures'] = hours
+    return pd.DataFrame(daily)
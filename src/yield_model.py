@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from hashing import data_version
+
+
+# Variables explicatives issues de prepare_features (les absentes sont ignorées)
+WEATHER_FEATURES = [
+    'temperature', 'temperature_min', 'temperature_max', 'humidite', 'precipitation_sum',
+    'rayonnement_solaire', 'vitesse_vent', 'gdd_cumul', 'pluie_cumulee', 'et0', 'stress_hydrique',
+]
+CROP_FEATURES = ['ndvi', 'lai', 'biomasse_estimee']
+SOIL_FEATURES = [
+    'ph', 'matiere_organique', 'azote', 'phosphore', 'potassium', 'capacite_retention_eau', 'surface_ha',
+]
+TARGET = 'rendement_estime'
+
+
+def training_columns(features):
+    """
+    Colonnes disponibles dont dépend l'entraînement du modèle.
+    """
+    candidates = WEATHER_FEATURES + CROP_FEATURES + SOIL_FEATURES + ['culture', TARGET]
+    return [column for column in candidates if column in features.columns]
+
+
+class YieldPredictor:
+    """
+    Modèle de prédiction du rendement entraîné sur l'ensemble des parcelles
+    (météo agrégée, NDVI et sol), appliqué en un seul lot vectorisé.
+    Les prédictions sont mises en cache par version des données.
+    """
+
+    def __init__(self, alpha=1.0):
+        self.alpha = alpha
+        self.model = None
+        self.feature_columns = None
+        self.cultures = None
+        self.trained_version = None
+        self._cache = {}
+
+    def _design_matrix(self, features):
+        """
+        Matrice des variables numériques et indicatrices de culture.
+        """
+        matrix = features[self.feature_columns].to_numpy(dtype=float)
+        if self.cultures:
+            cultures = features['culture'].to_numpy()
+            indicators = (cultures[:, None] == np.asarray(self.cultures, dtype=object)[None, :]).astype(float)
+            matrix = np.hstack([matrix, indicators])
+        return matrix
+
+    def fit(self, features):
+        """
+        Entraîne un modèle unique sur toutes les lignes dont le rendement est connu.
+        """
+        candidates = WEATHER_FEATURES + CROP_FEATURES + SOIL_FEATURES
+        self.feature_columns = [column for column in candidates if column in features.columns]
+        self.cultures = sorted(features['culture'].dropna().unique()) if 'culture' in features.columns else []
+
+        training = features[features[TARGET].notna()]
+        if training.empty:
+            raise ValueError("No rows with a known yield to train on.")
+
+        self.model = make_pipeline(SimpleImputer(strategy='mean'), StandardScaler(), Ridge(alpha=self.alpha))
+        self.model.fit(self._design_matrix(training), training[TARGET].to_numpy(dtype=float))
+        self.trained_version = data_version(features, training_columns(features))
+        self._cache = {}
+        return self
+
+    def predict(self, features):
+        """
+        Prédit le rendement de toutes les lignes en un seul appel vectorisé.
+        Retourne une Series alignée sur l'index de `features`.
+        """
+        if self.model is None:
+            raise ValueError("The model is not trained. Call fit first.")
+
+        version = data_version(features, self.feature_columns + (['culture'] if self.cultures else []))
+        if version not in self._cache:
+            predictions = np.clip(self.model.predict(self._design_matrix(features)), 0, None)
+            self._cache[version] = pd.Series(predictions, index=features.index, name='predicted_yield')
+        return self._cache[version]